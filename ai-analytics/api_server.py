@@ -6,6 +6,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from ml_engine import EcoVerseMlEngine
+from ingest_api import API_CAPABILITIES, IngestState, register_ingest_api
 from datetime import datetime, timedelta
 import threading
 import time
@@ -13,33 +14,72 @@ import time
 app = Flask(__name__)
 CORS(app)
 
-# Initialize ML Engine
-ml_engine = EcoVerseMlEngine()
+# Initialize ML Engine (ANOMALY_BACKEND: isolation_forest or seasonal_ewma)
+ml_engine = EcoVerseMlEngine(anomaly_backend=os.getenv('ANOMALY_BACKEND', 'isolation_forest'))
+
+# Model checkpoint written after each training and restored at startup; off unless ML_MODEL_PATH is set
+ML_MODEL_PATH = os.getenv('ML_MODEL_PATH', '')
+ML_MODEL_MMAP = os.getenv('ML_MODEL_MMAP', 'false').lower() == 'true'
+
+# Ingest history and retrains, checkpointed after each retrain; serves /api/data/add, /api/data/bulk and /api/forecast
+ingest = IngestState(ml_engine, on_retrained=lambda: save_checkpoint())
+register_ingest_api(app, ingest)
 
 # Global data storage (in production, use proper database)
-campus_data_history = []
-ml_models_trained = False
+campus_data_history = ingest.history
 
-def load_sample_data():
-    """Load sample data to train initial models"""
-    global campus_data_history, ml_models_trained
+def save_checkpoint():
+    """Save the trained models and the ingest history to ML_MODEL_PATH"""
+    if not ML_MODEL_PATH:
+        return
+    with ingest.lock:
+        metadata = {
+            'campus_data_history': list(campus_data_history),
+            'data_points_received': ingest.points_received
+        }
+    try:
+        # The server history above is what restore_checkpoint() needs; the engine's copy is not stored twice
+        path = ml_engine.save_checkpoint(ML_MODEL_PATH, metadata, include_history=False)
+        print(f"💾 ML models checkpointed to {path}")
+    except Exception as e:
+        print(f"❌ Error saving checkpoint: {e}")
+
+def restore_checkpoint():
+    """Warm-start the models and history from the checkpoint in ML_MODEL_PATH; returns True on success"""
+    if not ML_MODEL_PATH:
+        return False
+    metadata = ml_engine.load_checkpoint(ML_MODEL_PATH, mmap_mode='r' if ML_MODEL_MMAP else None)
+    if metadata is None:
+        return False
     
+    with ingest.lock:
+        campus_data_history[:] = metadata.get('campus_data_history', [])[-ingest.max_history:]
+        ingest.points_received = metadata.get('data_points_received', 0)
+    ingest.models_trained = True
+    return True
+
+def load_sample_data(seed=None, end=None):
+    """Load sample data to train initial models (reproducible for a given seed and end time)"""
     print("🔄 Loading sample data for ML training...")
     
+    import random
+    import numpy as np
+    
+    if seed is None and os.getenv('SAMPLE_DATA_SEED'):
+        seed = int(os.getenv('SAMPLE_DATA_SEED'))
+    rng = random.Random(seed)
+    end = end or datetime.now()
+    
     # Generate 7 days of sample data
     for hours_ago in range(168, 0, -1):  # 7 days * 24 hours
-        timestamp = (datetime.now() - timedelta(hours=hours_ago)).isoformat()
-        
-        # Generate realistic sample data
-        import random
-        import numpy as np
+        timestamp = (end - timedelta(hours=hours_ago)).isoformat()
         
-        hour = (datetime.now() - timedelta(hours=hours_ago)).hour
+        hour = (end - timedelta(hours=hours_ago)).hour
         
         # Base patterns with daily cycles
-        base_electricity = 2000 + 800 * np.sin(2 * np.pi * hour / 24) + random.uniform(-300, 300)
-        base_water = 8000 + 2000 * np.sin(2 * np.pi * hour / 24) + random.uniform(-800, 800)
-        base_waste = 300 + 100 * np.sin(2 * np.pi * hour / 24) + random.uniform(-50, 50)
+        base_electricity = 2000 + 800 * np.sin(2 * np.pi * hour / 24) + rng.uniform(-300, 300)
+        base_water = 8000 + 2000 * np.sin(2 * np.pi * hour / 24) + rng.uniform(-800, 800)
+        base_waste = 300 + 100 * np.sin(2 * np.pi * hour / 24) + rng.uniform(-50, 50)
         
         sample_point = {
             'timestamp': timestamp,
@@ -58,16 +98,18 @@ def load_sample_data():
         ml_engine.train_usage_forecasting_model(campus_data_history, metric)
         ml_engine.train_anomaly_detector(campus_data_history, metric)
     
-    ml_models_trained = True
+    ingest.models_trained = True
     print("✅ ML models trained successfully!")
+    save_checkpoint()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'ml_models_trained': ml_models_trained,
+        'ml_models_trained': ingest.models_trained,
         'data_points': len(campus_data_history),
+        'ingest': ingest.backpressure_signals(),
         'timestamp': datetime.now().isoformat()
     })
 
@@ -80,7 +122,7 @@ def predict_usage(metric):
         if not timestamp:
             timestamp = (datetime.now() + timedelta(hours=1)).isoformat()
         
-        if not ml_models_trained:
+        if not ingest.models_trained:
             return jsonify({'error': 'ML models not trained yet'}), 400
         
         prediction = ml_engine.predict_usage(timestamp, metric)
@@ -97,10 +139,33 @@ def predict_usage(metric):
 
 @app.route('/api/anomaly/check', methods=['POST'])
 def check_anomaly():
-    """Check if current usage is anomalous"""
+    """
+    Check if current usage is anomalous. Accepts one metric
+    ({"metric", "value", "timestamp"}) or several at once
+    ({"metrics": {metric: value}, "timestamp"}), answered under "results".
+    """
     try:
         data = request.get_json()
         
+        if data and isinstance(data.get('metrics'), dict):
+            timestamp = data.get('timestamp', datetime.now().isoformat())
+            
+            if not ingest.models_trained:
+                return jsonify({'error': 'ML models not trained yet'}), 400
+            
+            return jsonify({
+                'timestamp': timestamp,
+                'results': {
+                    metric: {
+                        'metric': metric,
+                        'value': value,
+                        'timestamp': timestamp,
+                        'anomaly_detection': ml_engine.detect_anomaly(timestamp, value, metric)
+                    }
+                    for metric, value in data['metrics'].items()
+                }
+            })
+        
         if not data or 'metric' not in data or 'value' not in data:
             return jsonify({'error': 'Missing required fields: metric, value'}), 400
         
@@ -108,7 +173,7 @@ def check_anomaly():
         value = data['value']
         timestamp = data.get('timestamp', datetime.now().isoformat())
         
-        if not ml_models_trained:
+        if not ingest.models_trained:
             return jsonify({'error': 'ML models not trained yet'}), 400
         
         anomaly_result = ml_engine.detect_anomaly(timestamp, value, metric)
@@ -195,12 +260,11 @@ def get_insights():
         
         insights = ml_engine.get_insights_summary(recent_data)
         
-        # Add predictions for next few hours
+        # Add predictions for the next hour (all metrics in one forecast)
         predictions = {}
-        for metric in ['electricity', 'water', 'waste']:
-            if ml_models_trained:
-                next_hour = (datetime.now() + timedelta(hours=1)).isoformat()
-                predictions[metric] = ml_engine.predict_usage(next_hour, metric)
+        if ingest.models_trained:
+            next_hour = ml_engine.forecast(horizon=1)
+            predictions = {metric: values[0] for metric, values in next_hour['forecasts'].items()}
         
         return jsonify({
             'insights': insights,
@@ -213,40 +277,6 @@ def get_insights():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/data/add', methods=['POST'])
-def add_data_point():
-    """Add new data point for model training"""
-    try:
-        data = request.get_json()
-        
-        if not data or 'total_metrics' not in data:
-            return jsonify({'error': 'Missing total_metrics'}), 400
-        
-        # Add timestamp if not provided
-        if 'timestamp' not in data:
-            data['timestamp'] = datetime.now().isoformat()
-        
-        # Add to history
-        campus_data_history.append(data)
-        
-        # Keep only recent data (last 1000 points)
-        if len(campus_data_history) > 1000:
-            campus_data_history[:] = campus_data_history[-1000:]
-        
-        # Update models periodically
-        if len(campus_data_history) % 50 == 0:
-            print("🔄 Updating ML models with new data...")
-            threading.Thread(target=ml_engine.update_models, args=(campus_data_history,)).start()
-        
-        return jsonify({
-            'status': 'success',
-            'data_points_total': len(campus_data_history),
-            'timestamp': data['timestamp']
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get system status and statistics"""
@@ -263,7 +293,7 @@ def get_status():
         
         return jsonify({
             'system_status': 'operational',
-            'ml_models_trained': ml_models_trained,
+            'ml_models_trained': ingest.models_trained,
             'total_data_points': len(campus_data_history),
             'recent_24h_averages': {
                 'electricity': round(avg_electricity, 2),
@@ -273,13 +303,16 @@ def get_status():
             'available_endpoints': [
                 '/api/health',
                 '/api/predict/<metric>',
+                '/api/forecast',
                 '/api/anomaly/check',
                 '/api/suggestions',
                 '/api/carbon-footprint',
                 '/api/insights',
                 '/api/data/add',
+                '/api/data/bulk',
                 '/api/status'
             ],
+            'capabilities': list(API_CAPABILITIES),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -287,8 +320,13 @@ def get_status():
         return jsonify({'error': str(e)}), 500
 
 def initialize_system():
-    """Initialize the ML system with sample data"""
-    load_sample_data()
+    """Initialize the ML system with sample data unless a checkpoint was restored"""
+    if not ingest.models_trained:
+        load_sample_data()
+
+# Warm-start from the last checkpoint on import, so requests are served right away
+# whether the app runs below or is imported by a WSGI/ASGI server
+restore_checkpoint()
 
 if __name__ == '__main__':
     print("🚀 Starting EcoVerse AI/ML Analytics API")
@@ -54,6 +54,13 @@ class Config:
     IOT_SIMULATION_URL = get_env_var('IOT_SIMULATION_URL', 'http://localhost:8000')
     ENABLE_REAL_TIME_STREAMING = get_env_var('ENABLE_REAL_TIME_STREAMING', 'true').lower() == 'true'
     
+    # ML API Client (shared keep-alive connection pool)
+    ML_API_URL = get_env_var('ML_API_URL', 'http://localhost:5000')
+    ML_API_TIMEOUT = float(get_env_var('ML_API_TIMEOUT', '10'))
+    ML_API_RETRIES = int(get_env_var('ML_API_RETRIES', '3'))
+    ML_API_RETRY_BACKOFF = float(get_env_var('ML_API_RETRY_BACKOFF', '0.5'))
+    ML_API_POOL_SIZE = int(get_env_var('ML_API_POOL_SIZE', '10'))
+    
     # Database Configuration
     DATABASE_URL = get_env_var('DATABASE_URL', 'sqlite:///ecoversa.db')
     
@@ -79,6 +86,7 @@ class Config:
         print(f"Debug Mode: {cls.API_DEBUG}")
         print(f"Data Stream Interval: {cls.DATA_STREAM_INTERVAL}s")
         print(f"ML Model Update Interval: {cls.ML_MODEL_UPDATE_INTERVAL}")
+        print(f"ML API: {cls.ML_API_URL} (timeout {cls.ML_API_TIMEOUT}s, {cls.ML_API_RETRIES} retries)")
         print(f"Log Level: {cls.LOG_LEVEL}")
         print(f"Firebase URL: {cls.FIREBASE_URL}")
         print(f"Database URL: {cls.DATABASE_URL}")
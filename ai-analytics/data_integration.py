@@ -2,31 +2,73 @@ import threading
 import time
 import json
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 import sys
 import random
 import math
+import queue
+
+from data_spool import DataSpool, SpoolDrainer
+from ml_api_client import IngestRejectedError, MLApiClient
+from inprocess_client import InProcessMLClient
+
+# Building registry shared with the IoT simulation (read as plain JSON to avoid import issues);
+# relative paths are taken from the iot-simulation directory, as the simulator does
+IOT_SIMULATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'iot-simulation')
+BUILDING_REGISTRY_PATH = os.path.join(IOT_SIMULATION_DIR,
+                                      os.path.expanduser(os.getenv('BUILDING_REGISTRY_PATH', 'buildings.json')))
+DEFAULT_BUILDINGS = ['Engineering', 'Science', 'Library', 'Dormitory_A', 'Dormitory_B', 'Admin', 'Cafeteria']
+
+# Client-side micro-batching of data points sent to the ML API (batch size 1 disables it)
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '50'))
+INGEST_BATCH_MAX_DELAY = float(os.getenv('INGEST_BATCH_MAX_DELAY', '1.0'))
+
+# Adaptive flow control: back off while the ML API reports saturation
+FLOW_LATENCY_TARGET_MS = float(os.getenv('FLOW_LATENCY_TARGET_MS', '500'))
+FLOW_QUEUE_TARGET = int(os.getenv('FLOW_QUEUE_TARGET', '4'))
+FLOW_MAX_SLOWDOWN = float(os.getenv('FLOW_MAX_SLOWDOWN', '8'))
+FLOW_MAX_ERROR_BACKOFF = float(os.getenv('FLOW_MAX_ERROR_BACKOFF', '300'))
+
+# How points reach the ML engine: 'http' (ML API server) or 'inprocess' (engine in this process)
+INGEST_TRANSPORTS = ('http', 'inprocess')
+INGEST_TRANSPORT = os.getenv('INGEST_TRANSPORT', 'http')
+
+# Durable spool for points the ML API could not accept (replayed once it is back)
+DATA_SPOOL_DIR = os.getenv('DATA_SPOOL_DIR', 'data_spool')
+DATA_SPOOL_FSYNC = os.getenv('DATA_SPOOL_FSYNC', 'interval')
+DATA_SPOOL_SEGMENT_BYTES = int(os.getenv('DATA_SPOOL_SEGMENT_BYTES', str(4 * 1024 * 1024)))
+DATA_SPOOL_MAX_BYTES = int(os.getenv('DATA_SPOOL_MAX_BYTES', str(256 * 1024 * 1024)))
+
+def load_building_names(path: str = BUILDING_REGISTRY_PATH):
+    """Load building names from the shared registry, falling back to the reference campus"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [building['name'] for building in json.load(f)['buildings']]
+    except (OSError, ValueError, KeyError, TypeError):
+        return list(DEFAULT_BUILDINGS)
 
 # Simple CampusDataSimulator class to avoid import issues
 class CampusDataSimulator:
     """Simplified campus data simulator for integration testing"""
     
-    def __init__(self):
-        self.buildings = ['Engineering', 'Science', 'Library', 'Dormitory_A', 'Dormitory_B', 'Admin', 'Cafeteria']
+    def __init__(self, buildings=None, seed=None):
+        self.buildings = buildings or load_building_names()
+        # Seedable generator so identical seeds reproduce identical data
+        self.random = random.Random(seed)
         
-    def generate_campus_data(self):
-        """Generate realistic campus usage data"""
-        now = datetime.now()
+    def generate_campus_data(self, now=None):
+        """Generate realistic campus usage data (for the current time unless `now` is given)"""
+        now = now or datetime.now()
         hour = now.hour
         
         # Time-based factors
         if 8 <= hour <= 18:
-            time_factor = random.uniform(0.8, 1.3)  # Peak usage
+            time_factor = self.random.uniform(0.8, 1.3)  # Peak usage
         elif 19 <= hour <= 21:
-            time_factor = random.uniform(0.6, 0.9)  # Evening
+            time_factor = self.random.uniform(0.6, 0.9)  # Evening
         else:
-            time_factor = random.uniform(0.3, 0.6)  # Night
+            time_factor = self.random.uniform(0.3, 0.6)  # Night
         
         # Base values with daily cycles
         base_electricity = 2000 + 800 * math.sin(2 * math.pi * hour / 24)
@@ -34,9 +76,9 @@ class CampusDataSimulator:
         base_waste = 300 + 100 * math.sin(2 * math.pi * hour / 24)
         
         # Apply time factor and add randomness
-        electricity = max(100, (base_electricity * time_factor) + random.uniform(-300, 300))
-        water = max(500, (base_water * time_factor) + random.uniform(-800, 800))
-        waste = max(10, (base_waste * time_factor) + random.uniform(-50, 50))
+        electricity = max(100, (base_electricity * time_factor) + self.random.uniform(-300, 300))
+        water = max(500, (base_water * time_factor) + self.random.uniform(-800, 800))
+        waste = max(10, (base_waste * time_factor) + self.random.uniform(-50, 50))
         
         return {
             'timestamp': now.isoformat(),
@@ -47,12 +89,17 @@ class CampusDataSimulator:
             },
             'building_data': self._generate_building_data(electricity, water, waste),
             'environmental': {
-                'temperature': round(random.uniform(18, 28), 1),
-                'humidity': round(random.uniform(40, 70), 1),
-                'air_quality': round(random.uniform(50, 200), 1)
+                'temperature': round(self.random.uniform(18, 28), 1),
+                'humidity': round(self.random.uniform(40, 70), 1),
+                'air_quality': round(self.random.uniform(50, 200), 1)
             }
         }
     
+    def generate_history(self, hours=168, end=None):
+        """Hourly data points for the `hours` before `end` (default: a week up to now)"""
+        end = end or datetime.now()
+        return [self.generate_campus_data(end - timedelta(hours=hours_ago)) for hours_ago in range(hours, 0, -1)]
+    
     def _generate_building_data(self, total_elec, total_water, total_waste):
         """Generate individual building data"""
         building_data = {}
@@ -64,7 +111,7 @@ class CampusDataSimulator:
         
         for building in self.buildings:
             # Add variation per building
-            variation = random.uniform(0.7, 1.3)
+            variation = self.random.uniform(0.7, 1.3)
             building_data[building] = {
                 'electricity': round(elec_per_building * variation, 2),
                 'water': round(water_per_building * variation, 2),
@@ -73,23 +120,225 @@ class CampusDataSimulator:
         
         return building_data
 
+class MicroBatcher:
+    """
+    Collects data points and hands them to `flush_fn` as one batch once
+    `max_batch_size` points are pending or the oldest pending point has
+    waited `max_delay` seconds.
+    """
+    
+    def __init__(self, flush_fn, max_batch_size=50, max_delay=1.0):
+        self.flush_fn = flush_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay = max_delay
+        self.pending = []
+        self.oldest_at = None
+        self.batches_flushed = 0
+        self.points_flushed = 0
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._age_loop, daemon=True)
+        self._thread.start()
+    
+    def add(self, point):
+        """Queue one point; flushes in the caller's thread when the batch is full"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self.pending.append(point)
+            if self.oldest_at is None:
+                self.oldest_at = time.monotonic()
+                self._condition.notify()
+            full = len(self.pending) >= self.max_batch_size
+        
+        if full:
+            self.flush()
+    
+    def flush(self):
+        """Send all pending points now"""
+        with self._flush_lock:
+            with self._condition:
+                batch, self.pending, self.oldest_at = self.pending, [], None
+            if not batch:
+                return
+            
+            try:
+                self.flush_fn(batch)
+            except Exception as e:
+                print(f"❌ Error flushing batch of {len(batch)} points: {e}")
+            self.batches_flushed += 1
+            self.points_flushed += len(batch)
+    
+    def _age_loop(self):
+        """Flush batches whose oldest point has waited max_delay"""
+        while True:
+            with self._condition:
+                while not self._closed and self.oldest_at is None:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                remaining = self.oldest_at + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+            self.flush()
+    
+    @property
+    def closed(self):
+        return self._closed
+    
+    def close(self):
+        """Flush what is pending and stop the age timer"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
+
+class FlowController:
+    """
+    Paces the data stream from the ML API's backpressure signals.
+    
+    While the API reports saturation (ingest latency above target, too many
+    queued requests, or a retrain in progress) the slowdown factor doubles,
+    up to max_slowdown; the stream interval and micro-batch size and delay
+    are scaled by it. Each healthy response halves it again, so the stream
+    returns to its normal pace within a few batches. Consecutive errors back
+    off exponentially.
+    """
+    
+    def __init__(self, latency_target_ms=FLOW_LATENCY_TARGET_MS, queue_target=FLOW_QUEUE_TARGET,
+                 max_slowdown=FLOW_MAX_SLOWDOWN, error_backoff=5.0, max_error_backoff=FLOW_MAX_ERROR_BACKOFF):
+        self.latency_target_ms = latency_target_ms
+        self.queue_target = queue_target
+        self.max_slowdown = max(1.0, max_slowdown)
+        self.base_error_backoff = error_backoff
+        self.max_error_backoff = max_error_backoff
+        self.slowdown = 1.0
+        self.consecutive_errors = 0
+        self.throttle_events = 0
+        self.saturated_responses = 0
+        self.errors = 0
+        self.last_latency_ms = 0.0
+        self.last_signals = {}
+        self._throttled_since = None
+        self.throttled_seconds = 0.0
+        self._lock = threading.Lock()
+    
+    def record_response(self, round_trip_ms, signals):
+        """Adjust the pace from one successful send"""
+        latency_ms = max(round_trip_ms, signals.get('ingest_latency_ms', 0))
+        saturated = (latency_ms > self.latency_target_ms
+                     or signals.get('queue_depth', 0) > self.queue_target
+                     or signals.get('retraining', False))
+        
+        with self._lock:
+            self.last_latency_ms = latency_ms
+            self.last_signals = signals
+            self.consecutive_errors = 0
+            if saturated:
+                self.saturated_responses += 1
+                if self.slowdown < self.max_slowdown:
+                    self.throttle_events += 1
+                self.slowdown = min(self.slowdown * 2, self.max_slowdown)
+            else:
+                self.slowdown = max(1.0, self.slowdown / 2)
+            self._track_throttling()
+    
+    def record_error(self):
+        """Count a failed send; returns how long to back off"""
+        with self._lock:
+            self.errors += 1
+            self.consecutive_errors += 1
+            return self.error_backoff()
+    
+    def error_backoff(self):
+        """Seconds to wait after the current run of consecutive errors"""
+        if self.consecutive_errors == 0:
+            return 0.0
+        return min(self.base_error_backoff * 2 ** (self.consecutive_errors - 1), self.max_error_backoff)
+    
+    def _track_throttling(self):
+        now = time.monotonic()
+        if self.slowdown > 1.0 and self._throttled_since is None:
+            self._throttled_since = now
+        elif self.slowdown == 1.0 and self._throttled_since is not None:
+            self.throttled_seconds += now - self._throttled_since
+            self._throttled_since = None
+    
+    def stats(self):
+        """Throttling metrics"""
+        with self._lock:
+            throttled = self.throttled_seconds
+            if self._throttled_since is not None:
+                throttled += time.monotonic() - self._throttled_since
+            return {
+                'slowdown': self.slowdown,
+                'throttled': self.slowdown > 1.0,
+                'throttle_events': self.throttle_events,
+                'saturated_responses': self.saturated_responses,
+                'throttled_seconds': round(throttled, 1),
+                'last_latency_ms': round(self.last_latency_ms, 1),
+                'last_signals': self.last_signals,
+                'errors': self.errors,
+                'consecutive_errors': self.consecutive_errors,
+                'error_backoff_seconds': self.error_backoff()
+            }
+
 class DataStreamManager:
     """Manages the continuous data stream between IoT simulation and ML analytics"""
     
-    def __init__(self, ml_api_url="http://localhost:5000"):
+    def __init__(self, ml_api_url="http://localhost:5000", seed=None,
+                 batch_size=INGEST_BATCH_SIZE, batch_max_delay=INGEST_BATCH_MAX_DELAY,
+                 spool_dir=DATA_SPOOL_DIR, transport=INGEST_TRANSPORT, engine=None):
+        if transport not in INGEST_TRANSPORTS:
+            raise ValueError(f"Unknown transport '{transport}', use one of {list(INGEST_TRANSPORTS)}")
+        
         self.ml_api_url = ml_api_url
-        self.simulator = CampusDataSimulator()
+        self.transport = transport
+        # In-process mode hands points to `engine` (or a default engine) without HTTP or JSON
+        self.client = InProcessMLClient(engine) if transport == 'inprocess' else MLApiClient(ml_api_url)
+        self.simulator = CampusDataSimulator(seed=seed)
+        if transport == 'inprocess' and not self.client.models_trained:
+            # No API server trains the engine at startup: train it on a week of simulated history
+            print("🤖 Training in-process ML models on simulated history...")
+            self.client.train(self.simulator.generate_history())
         self.running = False
         self.stream_interval = 30  # Send data every 30 seconds
+        self.points_dropped = 0  # points lost to errors (refused points are counted by the client)
+        
+        # Points are sent in bulk requests, flushed by size or age
+        self.batcher = MicroBatcher(self._send_batch_to_ml_api, batch_size, batch_max_delay) if batch_size > 1 else None
+        self.batch_size = batch_size
+        self.batch_max_delay = batch_max_delay
+        self.flow = FlowController()
+        
+        # Spooled points from an earlier run are replayed right away
+        self.spool_dir = spool_dir
+        self.spool = None
+        self.drainer = None
+        if os.path.isdir(spool_dir):
+            self._open_spool()
         
     def start_data_stream(self):
         """Start the continuous data streaming"""
         self.running = True
         
+        # stop_data_stream closed the batcher and spool of an earlier run
+        if self.batcher is not None and self.batcher.closed:
+            self.batcher = MicroBatcher(self._send_batch_to_ml_api, self.batch_size, self.batch_max_delay)
+            self._apply_flow()
+        if self.spool is None and os.path.isdir(self.spool_dir):
+            self._open_spool()
+        
         print("🔄 Starting EcoVerse Data Stream Manager")
         print("======================================")
         print(f"📡 Streaming data every {self.stream_interval} seconds")
-        print(f"🎯 Target ML API: {self.ml_api_url}")
+        if self.transport == 'inprocess':
+            print(f"🎯 Target ML engine: {type(self.client.engine).__name__} (in-process)")
+        else:
+            print(f"🎯 Target ML API: {self.ml_api_url}")
         
         # Start streaming in separate thread
         stream_thread = threading.Thread(target=self._stream_loop)
@@ -101,6 +350,12 @@ class DataStreamManager:
     def stop_data_stream(self):
         """Stop the data streaming"""
         self.running = False
+        if self.batcher:
+            self.batcher.close()
+        if self.drainer:
+            self.drainer.stop()
+            self.spool.close()
+            self.spool = self.drainer = None
         print("⏹️ Data stream stopped")
     
     def _stream_loop(self):
@@ -111,111 +366,138 @@ class DataStreamManager:
                 campus_data = self.simulator.generate_campus_data()
                 
                 # Send to ML API
-                self._send_to_ml_api(campus_data)
+                self.ingest(campus_data)
                 
-                # Wait for next interval
-                time.sleep(self.stream_interval)
+                # Wait for next interval (stretched while the ML API is saturated)
+                time.sleep(self.stream_interval * self.flow.slowdown)
                 
             except Exception as e:
                 print(f"❌ Error in data stream: {e}")
-                time.sleep(5)  # Wait before retrying
+                time.sleep(self.flow.record_error())  # Back off before retrying
     
-    def _send_to_ml_api(self, data):
-        """Send data to ML API"""
+    def ingest(self, data):
+        """
+        Send a data point (generated, or e.g. a replayed snapshot) to the ML API
+        
+        Raises RuntimeError when the point cannot be accepted. Micro-batched
+        points are sent after this returns; the ones lost on the way are
+        counted in points_failed.
+        """
+        if self.batcher:
+            self.batcher.add(data)
+        elif not self._send_to_ml_api(data):
+            raise RuntimeError("Data point was neither delivered nor spooled")
+    
+    @property
+    def points_failed(self):
+        """Points refused by the ML engine or lost to errors (spooled points are not failed)"""
+        return self.points_dropped + self.client.points_rejected
+    
+    def flush(self):
+        """Send any micro-batched points immediately"""
+        if self.batcher:
+            self.batcher.flush()
+    
+    def _send_batch_to_ml_api(self, batch):
+        """
+        Send a batch of data points, spooling it when the ML API is unavailable.
+        Returns False if the points were refused or lost.
+        """
+        if self.spool is not None and self.spool.pending():
+            # Earlier points are still waiting in the spool - keep them in order
+            return self._spool_points(batch)
+        
         try:
-            response = requests.post(
-                f"{self.ml_api_url}/api/data/add",
-                json=data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ Data sent successfully at {data['timestamp']}")
-                self._log_metrics(data)
-            else:
-                print(f"⚠️ API responded with status {response.status_code}")
-                
-        except requests.exceptions.ConnectionError:
-            print("🔌 ML API not available - data cached locally")
-            self._cache_data_locally(data)
+            started = time.perf_counter()
+            signals = self.client.send_points(batch)
+            self.flow.record_response((time.perf_counter() - started) * 1000, signals or {})
+            self._apply_flow()
+            print(f"✅ Sent {len(batch)} point(s), latest at {batch[-1].get('timestamp')}")
+            self._log_metrics(batch[-1])
+            return True
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.HTTPError, queue.Full) as e:
+            self.flow.record_error()
+            self._apply_flow()
+            # Points sent one by one before the failure were delivered already
+            unsent = batch[getattr(e, 'points_sent', 0):]
+            print(f"🔌 ML API not available ({e.__class__.__name__}) - {len(unsent)} point(s) spooled")
+            return self._spool_points(unsent)
+        except IngestRejectedError as e:
+            print(f"⚠️ {e} - points dropped")
+            return False
         except Exception as e:
-            print(f"❌ Error sending data: {e}")
+            self.points_dropped += len(batch)
+            print(f"❌ Error sending batch: {e}")
+            return False
+    
+    def _apply_flow(self):
+        """Batch more while the ML API is saturated (pending points stay bounded by the batch size)"""
+        if self.batcher:
+            self.batcher.max_batch_size = int(self.batch_size * self.flow.slowdown)
+            self.batcher.max_delay = self.batch_max_delay * self.flow.slowdown
+    
+    def get_flow_stats(self):
+        """Throttling metrics of the adaptive flow control"""
+        stats = self.flow.stats()
+        stats['stream_interval_seconds'] = self.stream_interval * self.flow.slowdown
+        if self.batcher:
+            stats['batch_size'] = self.batcher.max_batch_size
+            stats['batch_max_delay'] = self.batcher.max_delay
+        if self.spool is not None:
+            stats['spool'] = self.spool.stats()
+        return stats
+    
+    def _send_to_ml_api(self, data):
+        """Send data to ML API; returns False if the point was refused or lost"""
+        return self._send_batch_to_ml_api([data])
     
     def _log_metrics(self, data):
         """Log key metrics for monitoring"""
         metrics = data['total_metrics']
         print(f"📊 Campus Metrics - E: {metrics['electricity']:.0f}kWh | W: {metrics['water']:.0f}L | Waste: {metrics['waste']:.1f}kg")
     
-    def _cache_data_locally(self, data):
-        """Cache data locally when API is unavailable"""
-        cache_file = "data_cache.json"
-        
+    def _open_spool(self):
+        """Open the on-disk spool and start replaying it in the background"""
+        if self.spool is None:
+            self.spool = DataSpool(self.spool_dir, DATA_SPOOL_SEGMENT_BYTES, DATA_SPOOL_FSYNC,
+                                   max_total_bytes=DATA_SPOOL_MAX_BYTES)
+            # Outages are retried until the ML API is back; only refused batches are dead-lettered
+            self.drainer = SpoolDrainer(self.spool, self.client.send_points, permanent_errors=(IngestRejectedError,))
+            self.drainer.start()
+        return self.spool
+    
+    def _spool_points(self, points):
+        """Keep points on disk until the spool drainer can deliver them; returns False if that failed"""
         try:
-            # Load existing cache
-            if os.path.exists(cache_file):
-                with open(cache_file, 'r') as f:
-                    cache = json.load(f)
-            else:
-                cache = []
-            
-            # Add new data
-            cache.append(data)
-            
-            # Keep only recent data (last 100 points)
-            if len(cache) > 100:
-                cache = cache[-100:]
-            
-            # Save back to file
-            with open(cache_file, 'w') as f:
-                json.dump(cache, f, indent=2)
-                
-            print(f"💾 Data cached locally ({len(cache)} points)")
-            
+            self._open_spool().append_many(points)
+            self.drainer.wake()
+            return True
         except Exception as e:
-            print(f"❌ Error caching data: {e}")
+            self.points_dropped += len(points)
+            print(f"❌ Error spooling data: {e}")
+            return False
     
     def get_real_time_predictions(self):
-        """Get real-time predictions from ML API"""
+        """Get real-time predictions from ML API (all metrics requested concurrently)"""
         try:
-            predictions = {}
-            
-            for metric in ['electricity', 'water', 'waste']:
-                response = requests.get(
-                    f"{self.ml_api_url}/api/predict/{metric}",
-                    timeout=5
-                )
-                
-                if response.status_code == 200:
-                    predictions[metric] = response.json()
-            
-            return predictions
+            return self.client.predict_all()
             
         except Exception as e:
             print(f"❌ Error getting predictions: {e}")
             return {}
     
     def check_for_anomalies(self, current_data):
-        """Check current data for anomalies"""
+        """Check current data for anomalies (all metrics in one request)"""
         try:
             anomalies = {}
             metrics = current_data['total_metrics']
+            results = self.client.check_anomalies(metrics, current_data['timestamp'])
             
-            for metric, value in metrics.items():
-                response = requests.post(
-                    f"{self.ml_api_url}/api/anomaly/check",
-                    json={
-                        'metric': metric,
-                        'value': value,
-                        'timestamp': current_data['timestamp']
-                    },
-                    timeout=5
-                )
-                
-                if response.status_code == 200:
-                    anomaly_result = response.json()
-                    if anomaly_result['anomaly_detection']['is_anomaly']:
-                        anomalies[metric] = anomaly_result
-                        print(f"🚨 ANOMALY DETECTED in {metric}: {value} (confidence: {anomaly_result['anomaly_detection']['confidence']:.2f})")
+            for metric, anomaly_result in results.items():
+                if anomaly_result['anomaly_detection']['is_anomaly']:
+                    anomalies[metric] = anomaly_result
+                    print(f"🚨 ANOMALY DETECTED in {metric}: {metrics[metric]} (confidence: {anomaly_result['anomaly_detection']['confidence']:.2f})")
             
             return anomalies
             
@@ -226,13 +508,9 @@ class DataStreamManager:
     def get_system_insights(self):
         """Get comprehensive system insights"""
         try:
-            response = requests.get(
-                f"{self.ml_api_url}/api/insights",
-                timeout=10
-            )
+            insights = self.client.get_insights()
             
-            if response.status_code == 200:
-                insights = response.json()
+            if insights is not None:
                 self._display_insights(insights)
                 return insights
             
@@ -309,15 +587,17 @@ def main():
                         print()
                 elif command == 'status':
                     try:
-                        response = requests.get(f"{stream_manager.ml_api_url}/api/status", timeout=5)
-                        if response.status_code == 200:
-                            status = response.json()
+                        status = stream_manager.client.get_status()
+                        if status is not None:
                             print(f"\n🟢 System Status: {status['system_status']}")
                             print(f"🤖 ML Models: {'Trained' if status['ml_models_trained'] else 'Training'}")
                             print(f"📊 Data Points: {status['total_data_points']}")
                             print()
                     except:
                         print("❌ Cannot connect to ML API")
+                    flow = stream_manager.get_flow_stats()
+                    print(f"🚦 Flow: {flow['slowdown']:.0f}x slowdown, {flow['throttle_events']} throttle events, "
+                          f"{flow['throttled_seconds']}s throttled, last latency {flow['last_latency_ms']}ms\n")
                 elif command == 'help':
                     print("\n📋 Available Commands:")
                     print("  'insights' - Get system insights")
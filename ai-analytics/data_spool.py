@@ -0,0 +1,385 @@
+"""
+EcoVerse Data Spool
+Durable, segmented append-only spool for data points the ML API could not
+accept, replayed in order once it is reachable again
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+SEGMENT_SUFFIX = '.ndjson'
+CURSOR_FILE = 'cursor.json'
+DEAD_LETTER_FILE = 'dead_letter.ndjson'
+
+# Spool position: (segment sequence number, byte offset within that segment)
+Position = Tuple[int, int]
+
+
+class DataSpool:
+    """
+    Append-only spool of data points on disk.
+    
+    Points are stored one compact JSON record per line in numbered segment
+    files; a new segment is started once the current one reaches
+    `max_segment_bytes`. A cursor file (replaced atomically) records how far
+    the spool has been replayed, and fully replayed segments are deleted.
+    
+    fsync policy:
+        always   - fsync after every append (survives power loss)
+        interval - fsync at most every `fsync_interval` seconds
+        never    - leave flushing to the OS (survives process crashes only)
+    
+    On open, a torn record at the end of the newest segment (a write cut off
+    by a crash) is truncated away. When the spool grows beyond
+    `max_total_bytes`, the oldest segments are dropped. Batches that cannot
+    be refused are moved to a dead-letter file (see dead_letter()), and so
+    are records that cannot be decoded.
+    """
+    
+    def __init__(self, directory: str = 'data_spool', max_segment_bytes: int = 4 * 1024 * 1024,
+                 fsync: str = 'interval', fsync_interval: float = 1.0,
+                 max_total_bytes: int = 256 * 1024 * 1024):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', use one of {list(FSYNC_POLICIES)}")
+        
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_total_bytes = max_total_bytes
+        self.cursor_path = os.path.join(directory, CURSOR_FILE)
+        self.dead_letter_path = os.path.join(directory, DEAD_LETTER_FILE)
+        
+        self.records_appended = 0
+        self.records_committed = 0
+        self.corrupt_records = 0
+        self.torn_bytes_recovered = 0
+        self.segments_dropped = 0
+        self.dead_letter_batches = 0
+        self.dead_letter_points = 0
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        
+        os.makedirs(directory, exist_ok=True)
+        self.cursor = self._load_cursor()
+        self._corrupt_through = self.cursor  # undecodable records up to here were dead-lettered
+        self._segments = [seq for seq in self._list_segments() if seq >= self.cursor[0]]
+        for seq in self._list_segments():
+            if seq < self.cursor[0]:
+                os.remove(self._segment_path(seq))
+        if not self._segments:
+            self._segments = [self.cursor[0]]
+        
+        self._recover_tail(self._segments[-1])
+        self._total_bytes = sum(self._segment_size(seq) for seq in self._segments)
+        self._file = open(self._segment_path(self._segments[-1]), 'ab')
+    
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{SEGMENT_SUFFIX}")
+    
+    def _segment_size(self, seq: int) -> int:
+        try:
+            return os.path.getsize(self._segment_path(seq))
+        except OSError:
+            return 0
+    
+    def _list_segments(self) -> List[int]:
+        segments = []
+        for name in os.listdir(self.directory):
+            stem = name[:-len(SEGMENT_SUFFIX)]
+            if name.endswith(SEGMENT_SUFFIX) and stem.isdigit():
+                segments.append(int(stem))
+        return sorted(segments)
+    
+    def _load_cursor(self) -> Position:
+        try:
+            with open(self.cursor_path, 'r') as f:
+                cursor = json.load(f)
+            return int(cursor['segment']), int(cursor['offset'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return 1, 0
+    
+    def _save_cursor(self):
+        """Write the cursor to a temporary file and atomically replace the old one"""
+        tmp_path = self.cursor_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'segment': self.cursor[0], 'offset': self.cursor[1]}, f)
+            if self.fsync != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.cursor_path)
+    
+    def _recover_tail(self, seq: int):
+        """Truncate a partially written last record left behind by a crash"""
+        path = self._segment_path(seq)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            # Scan backwards for the last complete line
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                chunk = f.read(end - start)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                f.truncate(end)
+                self.torn_bytes_recovered += size - end
+                print(f"⚠️ Spool recovered from a torn write ({size - end} bytes discarded)")
+    
+    def _sync(self, force: bool = False):
+        self._file.flush()
+        if self.fsync == 'never':
+            return
+        now = time.monotonic()
+        if force or self.fsync == 'always' or now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+    
+    def _rotate(self):
+        """Close the current segment and start the next one"""
+        self._sync(force=True)
+        self._file.close()
+        self._segments.append(self._segments[-1] + 1)
+        self._file = open(self._segment_path(self._segments[-1]), 'ab')
+    
+    def _enforce_limit(self):
+        """Drop the oldest segments while the spool is over max_total_bytes"""
+        while self.max_total_bytes and self._total_bytes > self.max_total_bytes and len(self._segments) > 1:
+            seq = self._segments.pop(0)
+            self._total_bytes -= self._segment_size(seq)
+            os.remove(self._segment_path(seq))
+            self.segments_dropped += 1
+            print(f"⚠️ Spool over {self.max_total_bytes} bytes - dropped oldest segment {seq}")
+            if self.cursor[0] <= seq:
+                self.cursor = (self._segments[0], 0)
+                self._save_cursor()
+    
+    def append(self, point: Dict):
+        """Append one data point"""
+        self.append_many([point])
+    
+    def append_many(self, points: List[Dict]):
+        """Append data points in order"""
+        if not points:
+            return
+        data = ''.join(json.dumps(point, separators=(',', ':')) + '\n' for point in points).encode('utf-8')
+        
+        with self._lock:
+            if self._file.tell() > 0 and self._file.tell() + len(data) > self.max_segment_bytes:
+                self._rotate()
+            self._file.write(data)
+            self._sync()
+            self._total_bytes += len(data)
+            self.records_appended += len(points)
+            self._enforce_limit()
+    
+    def read_batch(self, max_points: int = 500) -> Tuple[List[Dict], Position]:
+        """
+        Read up to `max_points` unreplayed points, oldest first.
+        
+        Returns the points and the position just after them; pass that
+        position to commit() once the points have been delivered.
+        """
+        points = []
+        with self._lock:
+            self._file.flush()
+            seq, offset = self.cursor
+            for index, segment in enumerate(self._segments):
+                if segment < seq:
+                    continue
+                if segment > seq:
+                    seq, offset = segment, 0
+                with open(self._segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    while len(points) < max_points:
+                        line = f.readline()
+                        if not line.endswith(b'\n'):
+                            break
+                        offset += len(line)
+                        try:
+                            points.append(json.loads(line))
+                        except ValueError:
+                            # Re-reads of an uncommitted batch must not dead-letter the same record twice
+                            if (seq, offset) > self._corrupt_through:
+                                self._corrupt_through = (seq, offset)
+                                self.corrupt_records += 1
+                                self._write_dead_letter([{'reason': 'undecodable record',
+                                                          'raw': line.decode('utf-8', 'replace')}])
+                if len(points) >= max_points or index == len(self._segments) - 1:
+                    break
+        return points, (seq, offset)
+    
+    def commit(self, position: Position, records: int = 0):
+        """
+        Mark everything before `position` (`records` points read by
+        read_batch) as replayed and delete finished segments
+        """
+        with self._lock:
+            self._commit(position, records)
+    
+    def _commit(self, position: Position, records: int):
+        if position <= self.cursor:
+            return
+        self.cursor = position
+        self.records_committed += records
+        self._save_cursor()
+        while len(self._segments) > 1 and self._segments[0] < position[0]:
+            seq = self._segments.pop(0)
+            self._total_bytes -= self._segment_size(seq)
+            os.remove(self._segment_path(seq))
+    
+    def dead_letter(self, points: List[Dict], position: Position, reason: str):
+        """
+        Move a batch read by read_batch that was refused to the dead-letter
+        file and commit past it, so later points are not held up
+        """
+        with self._lock:
+            self._write_dead_letter([{'reason': reason, 'point': point} for point in points])
+            self.dead_letter_batches += 1
+            self.dead_letter_points += len(points)
+            self._commit(position, 0)
+    
+    def _write_dead_letter(self, records: List[Dict]):
+        failed_at = datetime.now().isoformat()
+        data = ''.join(json.dumps({'failed_at': failed_at, **record}, separators=(',', ':')) + '\n'
+                       for record in records).encode('utf-8')
+        with open(self.dead_letter_path, 'ab') as f:
+            f.write(data)
+            if self.fsync != 'never':
+                f.flush()
+                os.fsync(f.fileno())
+    
+    def pending_bytes(self) -> int:
+        """Bytes appended but not yet replayed"""
+        with self._lock:
+            return max(0, self._total_bytes - self.cursor[1]) if self._segments else 0
+    
+    def pending(self) -> bool:
+        return self.pending_bytes() > 0
+    
+    def stats(self) -> Dict:
+        """Spool counters"""
+        with self._lock:
+            segments = len(self._segments)
+        return {
+            'directory': self.directory,
+            'segments': segments,
+            'pending_bytes': self.pending_bytes(),
+            'records_appended': self.records_appended,
+            'records_committed': self.records_committed,
+            'corrupt_records': self.corrupt_records,
+            'torn_bytes_recovered': self.torn_bytes_recovered,
+            'segments_dropped': self.segments_dropped,
+            'dead_letter_batches': self.dead_letter_batches,
+            'dead_letter_points': self.dead_letter_points,
+            'fsync': self.fsync
+        }
+    
+    def close(self):
+        """Flush, sync and close the current segment"""
+        with self._lock:
+            if not self._file.closed:
+                self._sync(force=True)
+                self._file.close()
+
+
+class SpoolDrainer:
+    """
+    Background thread replaying a DataSpool in order.
+    
+    `send_batch(points)` must raise when the points were not delivered; the
+    batch is then retried with exponential backoff (starting at
+    `retry_interval`, capped at `max_retry_interval`) for as long as the
+    outage lasts. When the exception carries `points_sent` (a batch sent
+    point by point failed partway through), only the unsent rest is retried.
+    The cursor only advances after a batch was sent, so a crash replays at
+    most one batch.
+    
+    A batch refused outright (send_batch raises one of `permanent_errors`,
+    e.g. the ML API's IngestRejectedError) would fail the same way on every
+    retry, so it is moved to the spool's dead-letter file instead of
+    blocking everything spooled after it.
+    """
+    
+    def __init__(self, spool: DataSpool, send_batch: Callable[[List[Dict]], object],
+                 batch_size: int = 500, retry_interval: float = 5.0, max_retry_interval: float = 60.0,
+                 permanent_errors: Tuple[type, ...] = (ValueError,)):
+        self.spool = spool
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.permanent_errors = permanent_errors
+        self.points_replayed = 0
+        self.send_failures = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='spool-drainer', daemon=True)
+            self._thread.start()
+    
+    def wake(self):
+        """Check the spool now instead of at the next retry interval"""
+        self._wake.set()
+    
+    def _run(self):
+        delay = self.retry_interval
+        retry = None  # (unsent points, position, records) of a batch that failed partway
+        while not self._stop.is_set():
+            if retry is not None:
+                points, position, records = retry
+            else:
+                points, position = self.spool.read_batch(self.batch_size)
+                records = len(points)
+            if not points:
+                self.spool.commit(position)
+                self._wake.wait(self.retry_interval)
+                self._wake.clear()
+                continue
+            
+            try:
+                self.send_batch(points)
+            except Exception as e:
+                self.send_failures += 1
+                if isinstance(e, self.permanent_errors):
+                    self.spool.dead_letter(points, position, str(e))
+                    print(f"☠️ {len(points)} spooled points refused - moved to {self.spool.dead_letter_path}: {e}")
+                    retry = None
+                    delay = self.retry_interval
+                    continue
+                sent = getattr(e, 'points_sent', 0)
+                self.points_replayed += sent
+                retry = (points[sent:], position, records)
+                print(f"🔌 Spool replay failed ({e}) - retrying in {delay:.0f}s")
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_retry_interval)
+                continue
+            
+            self.spool.commit(position, records)
+            self.points_replayed += len(points)
+            retry = None
+            delay = self.retry_interval
+            print(f"📤 Replayed {len(points)} spooled points")
+    
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
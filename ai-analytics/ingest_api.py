@@ -0,0 +1,283 @@
+"""
+EcoVerse Ingest API
+Training history, retrain scheduling, backpressure signals and the ingest and
+forecast endpoints shared by api_server.py and simple_api_server.py
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import g, jsonify, request
+
+# Ingest limits: history kept for training, retrain interval, points per bulk request
+MAX_HISTORY_POINTS = 1000
+RETRAIN_EVERY_POINTS = 50
+BULK_MAX_POINTS = int(os.getenv('BULK_MAX_POINTS', '10000'))
+FORECAST_MAX_HORIZON = int(os.getenv('FORECAST_MAX_HORIZON', '2016'))  # 2 weeks of 10-minute steps
+
+INGEST_PATHS = ('/api/data/add', '/api/data/bulk')
+
+# Optional features listed under `capabilities` in /api/status, so clients need not probe for them
+API_CAPABILITIES = ('bulk_ingest', 'multi_metric_anomaly', 'forecast', 'backpressure')
+
+
+def metric_unit(metric):
+    """Unit of a usage metric"""
+    return 'kWh' if metric == 'electricity' else 'L' if metric == 'water' else 'kg'
+
+
+def validate_data_point(data):
+    """Return the data point with a timestamp filled in, or None if it lacks total_metrics"""
+    if not isinstance(data, dict) or not isinstance(data.get('total_metrics'), dict):
+        return None
+    
+    # Add timestamp if not provided
+    if 'timestamp' not in data:
+        data['timestamp'] = datetime.now().isoformat()
+    return data
+
+
+def parse_bulk_points(body, mimetype):
+    """Data points of a bulk request body: a JSON array, {"data": [...]} or NDJSON"""
+    if mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = None
+        else:
+            if isinstance(payload, dict):
+                payload = payload.get('data', [payload])
+            if not isinstance(payload, list):
+                raise ValueError('Expected a JSON array of data points')
+            return payload
+    
+    points = []
+    for line_number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            points.append(json.loads(line))
+        except ValueError:
+            raise ValueError(f'Invalid JSON on line {line_number}')
+    return points
+
+
+class IngestState:
+    """
+    Training history of an API server and the retrains its ingest triggers.
+    
+    Points are appended to `history` (the newest `max_history` are kept) and
+    the models are retrained in the background whenever the running count of
+    received points crosses a multiple of `retrain_every`. A boundary crossed
+    while a retrain is running is remembered, and the models are retrained on
+    the newer history as soon as that retrain finishes. `on_retrained` is
+    called after every retrain (e.g. to checkpoint the models).
+    """
+    
+    def __init__(self, ml_engine, max_history=MAX_HISTORY_POINTS, retrain_every=RETRAIN_EVERY_POINTS,
+                 on_retrained=None):
+        self.ml_engine = ml_engine
+        self.max_history = max_history
+        self.retrain_every = retrain_every
+        self.on_retrained = on_retrained
+        self.history = []
+        self.points_received = 0
+        self.models_trained = False
+        self.retrains = 0
+        self.retrain_pending = False
+        self.lock = threading.Lock()
+        self._retraining = False
+        
+        # Engines with online forecasters are kept current between retrains
+        self._partial_update = getattr(ml_engine, 'partial_update', None)
+        
+        # Backpressure signals reported to ingest clients
+        self.in_flight = 0
+        self.latency_ms = 0.0  # moving average of ingest request handling time
+    
+    def ingest(self, points):
+        """Append data points to the history; returns True if a retrain was started"""
+        with self.lock:
+            before = self.points_received
+            self.history.extend(points)
+            
+            # Keep only recent data
+            if len(self.history) > self.max_history:
+                self.history[:] = self.history[-self.max_history:]
+            
+            self.points_received += len(points)
+            boundary = self.points_received // self.retrain_every > before // self.retrain_every
+            retrain = boundary and not self._retraining
+            if boundary and not retrain:
+                # The running retrain starts another one on the newer history when it finishes
+                self.retrain_pending = True
+            if retrain:
+                self._retraining = True
+                training_data = list(self.history)
+        
+        if self._partial_update is not None:
+            for point in points:
+                self._partial_update(point)
+        
+        if retrain:
+            print("🔄 Updating ML models with new data...")
+            threading.Thread(target=self._retrain_loop, args=(training_data,), daemon=True).start()
+        return retrain
+    
+    def _retrain_loop(self, training_data):
+        """Retrain, then once more for every boundary crossed in the meantime"""
+        while True:
+            try:
+                self.ml_engine.update_models(training_data)
+                self.retrains += 1
+                if self.on_retrained is not None:
+                    self.on_retrained()
+            except Exception as e:
+                print(f"❌ Error retraining ML models: {e}")
+            
+            with self.lock:
+                if not self.retrain_pending:
+                    self._retraining = False
+                    return
+                self.retrain_pending = False
+                training_data = list(self.history)
+            print("🔄 Updating ML models with data received during the last retrain...")
+    
+    def retraining(self):
+        """Whether a model retrain triggered by ingest is running"""
+        return self._retraining
+    
+    def begin_request(self):
+        """Count an ingest request in flight; returns its start time for end_request()"""
+        with self.lock:
+            self.in_flight += 1
+        return time.perf_counter()
+    
+    def end_request(self, started):
+        """Finish an ingest request and fold its handling time into the latency average"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.in_flight -= 1
+            self.latency_ms = 0.8 * self.latency_ms + 0.2 * elapsed_ms
+    
+    def backpressure_signals(self):
+        """Load signals clients use to pace their ingest"""
+        return {
+            'ingest_latency_ms': round(self.latency_ms, 2),
+            'queue_depth': self.in_flight,
+            'retraining': self.retraining()
+        }
+
+
+def register_ingest_api(app, state):
+    """Add the ingest request hooks and the /api/data/add, /api/data/bulk and /api/forecast endpoints to `app`"""
+    
+    @app.before_request
+    def begin_ingest():
+        """Count ingest requests in flight"""
+        if request.path in INGEST_PATHS:
+            g.ingest_started = state.begin_request()
+    
+    @app.teardown_request
+    def end_ingest(exc):
+        """Finish an ingest request"""
+        started = g.pop('ingest_started', None)
+        if started is not None:
+            state.end_request(started)
+    
+    @app.route('/api/forecast', methods=['GET'])
+    def forecast_usage():
+        """
+        Forecast usage for several metrics over a horizon in one request.
+        Query params: metrics (comma-separated, default all), start (ISO
+        timestamp, default one step from now), horizon (points, default 24),
+        step (minutes between points, default 60).
+        """
+        try:
+            metrics = [m for m in request.args.get('metrics', 'electricity,water,waste').split(',') if m]
+            start = request.args.get('start')
+            horizon = int(request.args.get('horizon', 24))
+            step = int(request.args.get('step', 60))
+            
+            if not 1 <= horizon <= FORECAST_MAX_HORIZON or step < 1:
+                return jsonify({'error': f'horizon must be 1-{FORECAST_MAX_HORIZON} and step at least 1 minute'}), 400
+            
+            if not state.models_trained:
+                return jsonify({'error': 'ML models not trained yet'}), 400
+            
+            result = state.ml_engine.forecast(metrics, start, horizon, step)
+            result['units'] = {metric: metric_unit(metric) for metric in metrics}
+            return jsonify(result)
+        
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/data/add', methods=['POST'])
+    def add_data_point():
+        """Add new data point for model training"""
+        try:
+            data = validate_data_point(request.get_json(silent=True))
+            
+            if data is None:
+                return jsonify({'error': 'Missing total_metrics'}), 400
+            
+            # Add to history, updating models periodically
+            state.ingest([data])
+            
+            return jsonify({
+                'status': 'success',
+                'data_points_total': len(state.history),
+                'timestamp': data['timestamp'],
+                'backpressure': state.backpressure_signals()
+            })
+        
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/api/data/bulk', methods=['POST'])
+    def add_data_points_bulk():
+        """
+        Add many data points in one request. The body is a JSON array, an object
+        with a "data" array, or NDJSON (one data point per line). Points without
+        total_metrics are skipped and reported by index in `rejected`.
+        """
+        try:
+            try:
+                points = parse_bulk_points(request.get_data(as_text=True), request.mimetype)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            if len(points) > BULK_MAX_POINTS:
+                return jsonify({'error': f'At most {BULK_MAX_POINTS} data points per request'}), 413
+            
+            accepted = []
+            rejected = []
+            for index, point in enumerate(points):
+                data = validate_data_point(point)
+                if data is None:
+                    rejected.append(index)
+                else:
+                    accepted.append(data)
+            
+            if rejected and not accepted:
+                return jsonify({'error': 'Missing total_metrics', 'rejected': rejected}), 400
+            
+            retrain_started = state.ingest(accepted) if accepted else False
+            
+            return jsonify({
+                'status': 'success',
+                'accepted': len(accepted),
+                'rejected': rejected,
+                'retraining': retrain_started,
+                'data_points_total': len(state.history),
+                'timestamp': datetime.now().isoformat(),
+                'backpressure': state.backpressure_signals()
+            })
+        
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
@@ -0,0 +1,242 @@
+"""
+EcoVerse In-Process ML Client
+Same surface as MLApiClient, but hands data points straight to an ML engine
+running in this process - no HTTP, no JSON
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from ml_api_client import METRICS
+
+# EcoVerseMlEngine needs scikit-learn and pandas; fall back to the lightweight engine
+try:
+    from ml_engine import EcoVerseMlEngine as DefaultEngine
+except ImportError:
+    from simple_ml_engine import SimpleMLEngine as DefaultEngine
+
+UNITS = {'electricity': 'kWh', 'water': 'L', 'waste': 'kg'}
+
+
+class InProcessMLClient:
+    """
+    In-process transport between the data stream and an ML engine.
+    
+    Ingested points go through a bounded queue to one worker thread that
+    keeps the training history and retrains the engine (on its own thread,
+    one retrain at a time) whenever the number of received points crosses a
+    multiple of `retrain_every` - the same policy as the API servers. A
+    boundary crossed during a retrain starts another one on the newer
+    history as soon as that retrain finishes. When
+    the queue is full, send_points() raises queue.Full so the caller can
+    spool or drop the points. Queries call the engine directly and return
+    the same dictionaries as the API's JSON responses.
+    """
+    
+    def __init__(self, engine=None, max_queue: int = 1000, history_size: int = 1000,
+                 retrain_every: int = 50, put_timeout: float = 1.0):
+        self.engine = engine if engine is not None else DefaultEngine()
+        self.history = deque(maxlen=history_size)
+        self.retrain_every = retrain_every
+        self.put_timeout = put_timeout
+        self.models_trained = bool(getattr(self.engine, 'models', None))  # engines passed in may be trained
+        self.points_received = 0
+        self.points_rejected = 0  # points without total_metrics
+        self.retrains = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._retrain_thread = None
+        self._retraining = False
+        self._retrain_pending = False
+        self._worker = threading.Thread(target=self._ingest_loop, name='inprocess-ingest', daemon=True)
+        self._worker.start()
+    
+    def send_points(self, points: list):
+        """
+        Queue data points for training; raises queue.Full when the engine
+        falls behind. Returns backpressure signals like the API servers.
+        """
+        started = time.perf_counter()
+        self._queue.put(list(points), timeout=self.put_timeout)
+        return {
+            'ingest_latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'queue_depth': self.queue_depth(),
+            'retraining': self.retraining
+        }
+    
+    def add_data(self, data: dict):
+        return self.send_points([data])
+    
+    def add_data_bulk(self, points: list):
+        return self.send_points(points)
+    
+    def _ingest_loop(self):
+        while True:
+            points = self._queue.get()
+            if points is None:
+                return
+            
+            # An engine error loses this batch, not the worker
+            try:
+                self._ingest(points)
+            except Exception as e:
+                print(f"❌ Error ingesting {len(points)} point(s) in-process: {e}")
+    
+    def _ingest(self, points: list):
+        valid = [point for point in points if isinstance(point, dict) and 'total_metrics' in point]
+        self.points_rejected += len(points) - len(valid)
+        for point in valid:
+            point.setdefault('timestamp', datetime.now().isoformat())
+        
+        with self._lock:
+            before = self.points_received
+            self.history.extend(valid)
+            self.points_received += len(valid)
+            crossed = self.points_received // self.retrain_every > before // self.retrain_every
+        
+        # Engines with online models learn from every point between retrains
+        if hasattr(self.engine, 'partial_update'):
+            for point in valid:
+                self.engine.partial_update(point)
+        if crossed:
+            self._start_retrain()
+    
+    def _start_retrain(self):
+        """Retrain on a copy of the history, or once the running retrain finishes"""
+        with self._lock:
+            if self._retraining:
+                self._retrain_pending = True
+                return
+            self._retraining = True
+            training_data = list(self.history)
+            self._retrain_thread = threading.Thread(target=self._retrain_loop, args=(training_data,),
+                                                    name='inprocess-retrain', daemon=True)
+            self._retrain_thread.start()
+    
+    def _retrain_loop(self, training_data):
+        """Retrain, then once more for every boundary crossed in the meantime"""
+        while True:
+            try:
+                self._retrain(training_data)
+            except Exception as e:
+                print(f"❌ Error retraining in-process ML models: {e}")
+            
+            with self._lock:
+                if not self._retrain_pending:
+                    self._retraining = False
+                    return
+                self._retrain_pending = False
+                training_data = list(self.history)
+    
+    def _retrain(self, training_data):
+        self.engine.update_models(training_data)
+        self.models_trained = True
+        self.retrains += 1
+    
+    def train(self, data: list):
+        """Train the engine now on `data` (e.g. sample data at startup) and add it to the history"""
+        with self._lock:
+            self.history.extend(data)
+        self._retrain(list(self.history))
+    
+    @property
+    def retraining(self) -> bool:
+        return self._retraining
+    
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+    
+    def predict(self, metric: str, timestamp: str = None):
+        """Prediction for one metric, or None before the models are trained"""
+        if not self.models_trained:
+            return None
+        timestamp = timestamp or (datetime.now() + timedelta(hours=1)).isoformat()
+        return {
+            'metric': metric,
+            'timestamp': timestamp,
+            'predicted_value': round(float(self.engine.predict_usage(timestamp, metric)), 2),
+            'unit': UNITS.get(metric, 'kg')
+        }
+    
+    def predict_all(self, metrics=METRICS, timestamp: str = None) -> dict:
+        """Predictions for several metrics"""
+        predictions = {}
+        for metric in metrics:
+            result = self.predict(metric, timestamp)
+            if result is not None:
+                predictions[metric] = result
+        return predictions
+    
+    def forecast(self, metrics=METRICS, start: str = None, horizon: int = 24, step: int = 60):
+        """Forecast arrays for several metrics over a horizon, or None before the models are trained"""
+        if not self.models_trained:
+            return None
+        result = self.engine.forecast(list(metrics), start, horizon, step)
+        result['units'] = {metric: UNITS.get(metric, 'kg') for metric in metrics}
+        return result
+    
+    def check_anomaly(self, metric: str, value: float, timestamp: str):
+        """Anomaly check for one metric, or None before the models are trained"""
+        if not self.models_trained:
+            return None
+        return {
+            'metric': metric,
+            'value': value,
+            'timestamp': timestamp,
+            'anomaly_detection': self.engine.detect_anomaly(timestamp, value, metric)
+        }
+    
+    def check_anomalies(self, metrics: dict, timestamp: str) -> dict:
+        """Anomaly checks by metric for a {metric: value} mapping"""
+        results = {}
+        for metric, value in metrics.items():
+            result = self.check_anomaly(metric, value, timestamp)
+            if result is not None:
+                results[metric] = result
+        return results
+    
+    def get_insights(self, hours: int = None):
+        """Sustainability insights over the most recent `hours` points"""
+        hours = hours or 24
+        with self._lock:
+            recent_data = list(self.history)[-hours:]
+        predictions = {}
+        if self.models_trained:
+            next_hour = self.engine.forecast(list(METRICS), horizon=1)
+            predictions = {metric: values[0] for metric, values in next_hour['forecasts'].items()}
+        return {
+            'insights': self.engine.get_insights_summary(recent_data),
+            'predictions_next_hour': predictions,
+            'data_period_hours': hours,
+            'total_data_points': len(self.history),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def get_status(self):
+        """System status in the shape of the API's /api/status"""
+        with self._lock:
+            recent_24h = list(self.history)[-24:]
+        averages = {
+            metric: round(sum(d['total_metrics'][metric] for d in recent_24h) / len(recent_24h), 2) if recent_24h else 0
+            for metric in METRICS
+        }
+        return {
+            'system_status': 'operational',
+            'ml_engine': type(self.engine).__name__,
+            'transport': 'inprocess',
+            'ml_models_trained': self.models_trained,
+            'total_data_points': len(self.history),
+            'points_received': self.points_received,
+            'queue_depth': self.queue_depth(),
+            'retraining': self.retraining,
+            'recent_24h_averages': averages,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def close(self):
+        """Stop the ingest worker once queued points are handled"""
+        self._queue.put(None)
+        self._worker.join()
@@ -0,0 +1,215 @@
+"""
+EcoVerse ML API Client
+Shared keep-alive connection pool for calls to the AI/ML analytics API, with
+configurable timeouts and retries and concurrent per-metric requests
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+METRICS = ('electricity', 'water', 'waste')
+
+# Capabilities of ML API servers whose /api/status predates the `capabilities` list
+LEGACY_CAPABILITIES = {'/api/data/bulk': 'bulk_ingest', '/api/forecast': 'forecast'}
+
+
+class IngestRejectedError(ValueError):
+    """The ML API refused data points outright; sending them again will not help"""
+
+
+class MLApiClient:
+    """
+    Thin client over one pooled requests.Session.
+    
+    Connections are kept alive and reused across calls and threads. Failed
+    connections are retried with exponential backoff; idempotent GETs are
+    also retried on 502/503/504. POSTs are never resent once the server may
+    have received them, so ingest does not duplicate points.
+    
+    Optional server features (bulk ingest, multi-metric anomaly checks) are
+    read from the `capabilities` of /api/status on first use; servers
+    without that list get the single-point and single-metric requests.
+    """
+    
+    def __init__(self, base_url: str = Config.ML_API_URL, timeout: float = Config.ML_API_TIMEOUT,
+                 retries: int = Config.ML_API_RETRIES, backoff: float = Config.ML_API_RETRY_BACKOFF,
+                 pool_size: int = Config.ML_API_POOL_SIZE):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(502, 503, 504),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='ml-api')
+        self._capabilities = None
+        self.points_rejected = 0  # points the API refused as invalid
+    
+    def get(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(f"{self.base_url}{path}", **kwargs)
+    
+    def post(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.post(f"{self.base_url}{path}", **kwargs)
+    
+    def _json_or_none(self, response: requests.Response):
+        return response.json() if response.status_code == 200 else None
+    
+    def capabilities(self) -> frozenset:
+        """
+        Optional features of the ML API, from its /api/status (fetched once).
+        Raises requests exceptions while the API is unreachable.
+        """
+        if self._capabilities is None:
+            response = self.get('/api/status')
+            if response.status_code >= 500:
+                response.raise_for_status()
+            status = self._json_or_none(response) or {}
+            if 'capabilities' in status:
+                capabilities = frozenset(status['capabilities'])
+            else:
+                endpoints = status.get('available_endpoints', [])
+                capabilities = frozenset(name for path, name in LEGACY_CAPABILITIES.items() if path in endpoints)
+            self._capabilities = capabilities
+        return self._capabilities
+    
+    @property
+    def bulk_supported(self) -> bool:
+        return 'bulk_ingest' in self.capabilities()
+    
+    @property
+    def multi_metric_anomaly(self) -> bool:
+        return 'multi_metric_anomaly' in self.capabilities()
+    
+    def add_data(self, data: dict) -> requests.Response:
+        """Send one data point for model training"""
+        return self.post('/api/data/add', json=data)
+    
+    def add_data_bulk(self, points: list) -> requests.Response:
+        """Send many data points in one request"""
+        return self.post('/api/data/bulk', json=points)
+    
+    def send_points(self, points: list):
+        """
+        Deliver data points for training (one /api/data/bulk request, or one
+        /api/data/add request per point on servers without bulk ingest).
+        Raises requests exceptions when the API is unreachable or overloaded
+        so the points can be retried, and IngestRejectedError when the API
+        refused the whole batch. Individually rejected points are counted in
+        points_rejected. Returns the server's backpressure signals ({} from
+        servers that send none).
+        
+        When the per-point requests fail partway through, the exception's
+        `points_sent` is the number of leading points the API already
+        handled, so only the rest need to be retried.
+        """
+        if self.bulk_supported:
+            return self._check_ingest_response(self.add_data_bulk(points), len(points))
+        
+        # Older ML API without bulk ingest
+        signals = {}
+        accepted = 0
+        for index, data in enumerate(points):
+            try:
+                signals = self._check_ingest_response(self.add_data(data))
+                accepted += 1
+            except IngestRejectedError:
+                pass
+            except requests.exceptions.RequestException as e:
+                e.points_sent = index
+                raise
+        if points and not accepted:
+            raise IngestRejectedError(f"ML API rejected all {len(points)} point(s)")
+        return signals
+    
+    def _check_ingest_response(self, response: requests.Response, points: int = 1):
+        """
+        Raise for responses worth retrying (server errors, throttling) and
+        IngestRejectedError for refused points; returns backpressure signals
+        """
+        if response.status_code >= 500 or response.status_code == 429:
+            response.raise_for_status()
+        if response.status_code != 200:
+            self.points_rejected += points
+            raise IngestRejectedError(f"ML API responded with status {response.status_code}")
+        body = response.json()
+        self.points_rejected += len(body.get('rejected', []))
+        return body.get('backpressure', {})
+    
+    def predict(self, metric: str, timestamp: str = None):
+        """Prediction response for one metric, or None if the API could not answer"""
+        params = {'timestamp': timestamp} if timestamp else None
+        return self._json_or_none(self.get(f"/api/predict/{metric}", params=params))
+    
+    def predict_all(self, metrics=METRICS, timestamp: str = None) -> dict:
+        """Predictions for several metrics, requested concurrently"""
+        futures = {metric: self.executor.submit(self.predict, metric, timestamp) for metric in metrics}
+        predictions = {}
+        for metric, future in futures.items():
+            try:
+                result = future.result()
+            except requests.exceptions.RequestException as e:
+                print(f"❌ Error predicting {metric}: {e}")
+                continue
+            if result is not None:
+                predictions[metric] = result
+        return predictions
+    
+    def forecast(self, metrics=METRICS, start: str = None, horizon: int = 24, step: int = 60):
+        """Forecast arrays for several metrics over a horizon, or None if the API could not answer"""
+        params = {'metrics': ','.join(metrics), 'horizon': horizon, 'step': step}
+        if start:
+            params['start'] = start
+        return self._json_or_none(self.get('/api/forecast', params=params))
+    
+    def check_anomaly(self, metric: str, value: float, timestamp: str):
+        """Anomaly check response for one metric, or None if the API could not answer"""
+        response = self.post('/api/anomaly/check', json={'metric': metric, 'value': value, 'timestamp': timestamp})
+        return self._json_or_none(response)
+    
+    def check_anomalies(self, metrics: dict, timestamp: str) -> dict:
+        """
+        Anomaly check responses by metric for a {metric: value} mapping, in one
+        multi-metric request (concurrent single-metric requests against older
+        API servers)
+        """
+        if self.multi_metric_anomaly:
+            response = self.post('/api/anomaly/check', json={'metrics': metrics, 'timestamp': timestamp})
+            result = self._json_or_none(response)
+            return result['results'] if result is not None and 'results' in result else {}
+        
+        # Server predates multi-metric checks
+        futures = {metric: self.executor.submit(self.check_anomaly, metric, value, timestamp)
+                   for metric, value in metrics.items()}
+        results = {}
+        for metric, future in futures.items():
+            try:
+                result = future.result()
+            except requests.exceptions.RequestException as e:
+                print(f"❌ Error checking {metric}: {e}")
+                continue
+            if result is not None:
+                results[metric] = result
+        return results
+    
+    def get_insights(self, hours: int = None):
+        """Sustainability insights, or None if the API could not answer"""
+        params = {'hours': hours} if hours else None
+        return self._json_or_none(self.get('/api/insights', params=params))
+    
+    def get_status(self):
+        """System status, or None if the API could not answer"""
+        return self._json_or_none(self.get('/api/status'))
+    
+    def close(self):
+        """Release pooled connections and worker threads"""
+        self.executor.shutdown(wait=False)
+        self.session.close()
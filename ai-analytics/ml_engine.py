@@ -7,24 +7,68 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error
 import joblib
 from datetime import datetime, timedelta
+import copy
 import json
+import os
 import random
+import re
 from typing import Dict, List, Tuple
+import threading
 import warnings
+from collections import OrderedDict, deque
+
+from online_models import OnlineLinearForecaster, SeasonalEwmaDetector
 warnings.filterwarnings('ignore')
 
+# Time-feature matrices cached per history window (windows shorter than the minimum are not cached)
+FEATURE_CACHE_SIZE = 8
+FEATURE_CACHE_MIN_ROWS = 32
+
+# UTC offset or Z at the end of the time part of an ISO timestamp
+UTC_OFFSET = re.compile(r'(?:Z|[+-]\d{2}(?::?\d{2})?)$')
+
+FORECAST_METRICS = ('electricity', 'water', 'waste')
+
+# Online forecasting: forgetting factor of the per-point updates, and how many
+# updates an online model absorbs before the next retrain refits it from scratch
+ONLINE_FORGETTING = 0.999
+ONLINE_REFIT_POINTS = 1000
+
+# Anomaly detectors: batch Isolation Forest, or streaming seasonal EWMA residuals
+ANOMALY_BACKENDS = ('isolation_forest', 'seasonal_ewma')
+
+# Checkpoint layout version; checkpoints written with another version are not loaded
+CHECKPOINT_VERSION = 1
+CHECKPOINT_FILE = 'ecoverse_models.joblib'
+
 class EcoVerseMlEngine:
     """
     AI/ML Analytics Engine for EcoVerse
     Provides usage forecasting, anomaly detection, and personalized eco-suggestions
     """
     
-    def __init__(self):
+    def __init__(self, online: bool = True, anomaly_backend: str = 'isolation_forest'):
+        if anomaly_backend not in ANOMALY_BACKENDS:
+            raise ValueError(f"Unknown anomaly backend '{anomaly_backend}', use one of {list(ANOMALY_BACKENDS)}")
+        
         self.models = {}
         self.scalers = {}
         self.anomaly_detectors = {}
         self.historical_data = []
         
+        # Forecasters updated per ingested point between batch retrains
+        self.online = online
+        self.online_models = {}
+        self._online_lock = threading.Lock()
+        self._checkpoint_lock = threading.Lock()  # one save at a time per temporary file
+        # Recent points passed to partial_update, replayed into forecasters refit on an older snapshot
+        self._recent_points = deque(maxlen=ONLINE_REFIT_POINTS)
+        self._points_seen = 0
+        self.anomaly_backend = anomaly_backend
+        self.training_metadata = {}
+        self._feature_cache = OrderedDict()
+        self._feature_cache_lock = threading.Lock()
+        
         # Eco-friendly suggestions database
         self.eco_suggestions = {
             'high_electricity': [
@@ -57,31 +101,64 @@ class EcoVerseMlEngine:
         }
     
     def prepare_time_features(self, timestamps: List[str]) -> np.ndarray:
-        """Extract time-based features from timestamps"""
-        features = []
+        """
+        Extract time-based features from timestamps
         
-        for ts in timestamps:
-            dt = datetime.fromisoformat(ts.replace('Z', '+00:00'))
-            
-            # Extract temporal features
-            hour = dt.hour
-            day_of_week = dt.weekday()
-            month = dt.month
-            
-            # Cyclical encoding for time features
-            hour_sin = np.sin(2 * np.pi * hour / 24)
-            hour_cos = np.cos(2 * np.pi * hour / 24)
-            
-            day_sin = np.sin(2 * np.pi * day_of_week / 7)
-            day_cos = np.cos(2 * np.pi * day_of_week / 7)
-            
-            month_sin = np.sin(2 * np.pi * month / 12)
-            month_cos = np.cos(2 * np.pi * month / 12)
-            
-            features.append([hour, day_of_week, month, hour_sin, hour_cos, 
-                           day_sin, day_cos, month_sin, month_cos])
+        Timestamps are parsed in one pass as datetime64 (wall-clock time, any
+        UTC offset or fractional seconds ignored, as datetime.hour does) and
+        the cyclical encodings are computed array-wide. Feature matrices for
+        history windows are cached and shared by every metric and model
+        trained on the same window; cached matrices are read-only.
+        """
+        cache_key = None
+        if len(timestamps) >= FEATURE_CACHE_MIN_ROWS:
+            # Keyed on the timestamps themselves: a hash match is confirmed by comparing them
+            cache_key = tuple(timestamps)
+            with self._feature_cache_lock:
+                cached = self._feature_cache.get(cache_key)
+                if cached is not None:
+                    self._feature_cache.move_to_end(cache_key)
+                    return cached
         
-        return np.array(features)
+        features = self._datetime_features(self._parse_timestamps(timestamps))
+        
+        if cache_key is not None:
+            features.setflags(write=False)
+            with self._feature_cache_lock:
+                self._feature_cache[cache_key] = features
+                while len(self._feature_cache) > FEATURE_CACHE_SIZE:
+                    self._feature_cache.popitem(last=False)
+        return features
+    
+    def _parse_timestamps(self, timestamps: List[str]) -> np.ndarray:
+        """ISO timestamps as wall-clock datetime64[s]"""
+        # numpy would apply an offset (and truncation can cut one in half, e.g. '05:06+05:30'
+        # to '05:06+05'), so strip it from the time part before dropping fractional seconds
+        local = [ts[:10] + UTC_OFFSET.sub('', ts[10:]) for ts in timestamps]
+        try:
+            return np.array(local, dtype='U19').astype('datetime64[s]')
+        except ValueError:
+            # Formats numpy cannot parse (e.g. compact ISO dates)
+            return np.array([datetime.fromisoformat(ts.replace('Z', '+00:00')).replace(tzinfo=None)
+                             for ts in timestamps], dtype='datetime64[s]')
+    
+    def _datetime_features(self, moments: np.ndarray) -> np.ndarray:
+        """Feature matrix (see prepare_time_features) for datetime64 values"""
+        # Extract temporal features
+        days = moments.astype('datetime64[D]')
+        hour = (moments - days).astype('timedelta64[h]').astype(np.int64)
+        day_of_week = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        month = moments.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        
+        # Cyclical encoding for time features
+        hour_angle = 2 * np.pi * hour / 24
+        day_angle = 2 * np.pi * day_of_week / 7
+        month_angle = 2 * np.pi * month / 12
+        
+        return np.column_stack([hour, day_of_week, month,
+                                np.sin(hour_angle), np.cos(hour_angle),
+                                np.sin(day_angle), np.cos(day_angle),
+                                np.sin(month_angle), np.cos(month_angle)]).astype(np.float64)
     
     def train_usage_forecasting_model(self, data: List[Dict], metric: str = 'electricity'):
         """Train a forecasting model for resource usage prediction"""
@@ -90,6 +167,8 @@ class EcoVerseMlEngine:
             return False
         
         try:
+            points_seen = self._points_seen
+            
             # Prepare data
             timestamps = [item['timestamp'] for item in data]
             values = [item['total_metrics'][metric] for item in data]
@@ -115,9 +194,32 @@ class EcoVerseMlEngine:
             mae = mean_absolute_error(y_test, y_pred)
             rmse = np.sqrt(mean_squared_error(y_test, y_pred))
             
-            # Store model and scaler
-            self.models[metric] = model
-            self.scalers[metric] = scaler
+            # Warm-start the online forecaster on the full window
+            online_model = None
+            if self.online:
+                online_model = OnlineLinearForecaster.from_batch(scaler.transform(X), y, ONLINE_FORGETTING)
+            
+            # Swap model, scaler and online model together, so predictions and online updates
+            # never pair the new scaler with the old models
+            with self._online_lock:
+                # Fold in the points ingested since `data` was taken so the swap does not drop them
+                if online_model is not None:
+                    for point in self._points_after(data, points_seen):
+                        if metric in point['total_metrics']:
+                            x = self.prepare_time_features([point['timestamp']])[0]
+                            online_model.partial_update((x - scaler.mean_) / scaler.scale_,
+                                                        float(point['total_metrics'][metric]))
+                    self.online_models[metric] = online_model
+                
+                # Store model and scaler
+                self.models[metric] = model
+                self.scalers[metric] = scaler
+                self.training_metadata.setdefault(metric, {})['forecaster'] = {
+                    'trained_at': datetime.now().isoformat(),
+                    'samples': len(data),
+                    'mae': round(float(mae), 2),
+                    'rmse': round(float(rmse), 2)
+                }
             
             print(f"✅ {metric.title()} forecasting model trained successfully")
             print(f"📊 MAE: {mae:.2f}, RMSE: {rmse:.2f}")
@@ -137,10 +239,9 @@ class EcoVerseMlEngine:
             
             # Prepare features
             X = self.prepare_time_features([timestamp])
-            X_scaled = self.scalers[metric].transform(X)
             
             # Make prediction
-            prediction = self.models[metric].predict(X_scaled)[0]
+            prediction = self._predict_scaled(metric, X)[0]
             
             return max(0, prediction)  # Ensure non-negative prediction
             
@@ -148,6 +249,93 @@ class EcoVerseMlEngine:
             print(f"❌ Error predicting {metric} usage: {e}")
             return 0.0
     
+    def _points_after(self, data: List[Dict], points_seen: int) -> List[Dict]:
+        """
+        Points passed to partial_update that the training snapshot `data` does
+        not include: those after the newest point of `data` (the same objects
+        are ingested and trained on), or, when `data` has none of the recent
+        points, those seen after `points_seen`. Call with _online_lock held.
+        """
+        in_data = {id(point) for point in data}
+        recent = list(self._recent_points)
+        for index in range(len(recent) - 1, -1, -1):
+            if id(recent[index][1]) in in_data:
+                return [point for _, point in recent[index + 1:]]
+        return [point for seen, point in recent if seen > points_seen]
+    
+    def _predict_scaled(self, metric: str, X: np.ndarray) -> np.ndarray:
+        """Predict with the online forecaster when there is one, else the batch model"""
+        # Take the scaler and models trained together (retrains swap them under the lock)
+        with self._online_lock:
+            scaler = self.scalers[metric]
+            online_model = self.online_models.get(metric)
+            model = self.models[metric]
+        X_scaled = scaler.transform(X)
+        if online_model is not None:
+            return online_model.predict(X_scaled)
+        return model.predict(X_scaled)
+    
+    def partial_update(self, data_point: Dict):
+        """Update the online forecasters and streaming anomaly detectors with one ingested data point"""
+        streaming = self.anomaly_backend == 'seasonal_ewma' and self.anomaly_detectors
+        if not self.online and not streaming:
+            return
+        try:
+            metrics = data_point['total_metrics']
+            with self._online_lock:
+                if self.online:
+                    self._points_seen += 1
+                    self._recent_points.append((self._points_seen, data_point))
+                
+                if self.online_models:
+                    x = self.prepare_time_features([data_point['timestamp']])[0]
+                    for metric, online_model in self.online_models.items():
+                        if metric in metrics:
+                            scaler = self.scalers[metric]
+                            online_model.partial_update((x - scaler.mean_) / scaler.scale_, float(metrics[metric]))
+                
+                if streaming:
+                    slot = SeasonalEwmaDetector.slot_of(data_point['timestamp'])
+                    for metric, detector in self.anomaly_detectors.items():
+                        if metric in metrics:
+                            detector.update(float(metrics[metric]), slot)
+            
+        except Exception as e:
+            print(f"❌ Error updating online models: {e}")
+    
+    def forecast(self, metrics: List[str] = None, start: str = None, horizon: int = 24, step: int = 60) -> Dict:
+        """
+        Forecast several metrics over a whole horizon
+        
+        Scores `horizon` timestamps spaced `step` minutes apart, starting at
+        `start` (default: one step from now), with one model call per
+        metric. Metrics without a trained model forecast 0.0, as in
+        predict_usage.
+        """
+        metrics = list(metrics or FORECAST_METRICS)
+        if start is None:
+            first = np.datetime64(datetime.now().replace(microsecond=0)) + np.timedelta64(step, 'm')
+        else:
+            first = self._parse_timestamps([start])[0]
+        moments = first + np.arange(horizon) * np.timedelta64(step, 'm')
+        features = self._datetime_features(moments)
+        
+        forecasts = {}
+        for metric in metrics:
+            if metric not in self.models:
+                print(f"⚠️ No trained model for {metric}")
+                forecasts[metric] = [0.0] * horizon
+                continue
+            
+            predictions = np.maximum(self._predict_scaled(metric, features), 0)  # Ensure non-negative predictions
+            forecasts[metric] = np.round(predictions, 2).tolist()
+        
+        return {
+            'timestamps': np.datetime_as_string(moments, unit='s').tolist(),
+            'step_minutes': step,
+            'forecasts': forecasts
+        }
+    
     def train_anomaly_detector(self, data: List[Dict], metric: str = 'electricity'):
         """Train anomaly detection model for unusual consumption patterns"""
         if len(data) < 20:
@@ -161,13 +349,24 @@ class EcoVerseMlEngine:
             
             # Create features (include value and time features)
             time_features = self.prepare_time_features(timestamps)
-            X = np.column_stack([np.array(values).reshape(-1, 1), time_features])
             
-            # Train isolation forest
-            detector = IsolationForest(contamination=0.1, random_state=42)
-            detector.fit(X)
-            
-            self.anomaly_detectors[metric] = detector
+            if self.anomaly_backend == 'seasonal_ewma':
+                # Hour-of-week slots from the hour and day-of-week columns
+                slots = time_features[:, 1].astype(np.int64) * 24 + time_features[:, 0].astype(np.int64)
+                detector = SeasonalEwmaDetector.fit(np.array(values, dtype=np.float64), slots)
+            else:
+                # Train isolation forest
+                X = np.column_stack([np.array(values).reshape(-1, 1), time_features])
+                detector = IsolationForest(contamination=0.1, random_state=42)
+                detector.fit(X)
+            
+            with self._online_lock:
+                self.anomaly_detectors[metric] = detector
+            self.training_metadata.setdefault(metric, {})['anomaly_detector'] = {
+                'trained_at': datetime.now().isoformat(),
+                'samples': len(data),
+                'backend': self.anomaly_backend
+            }
             
             print(f"✅ {metric.title()} anomaly detector trained successfully")
             return True
@@ -182,16 +381,20 @@ class EcoVerseMlEngine:
             if metric not in self.anomaly_detectors:
                 return {'is_anomaly': False, 'confidence': 0.0}
             
+            detector = self.anomaly_detectors[metric]
+            if isinstance(detector, SeasonalEwmaDetector):
+                return detector.detect(float(value), SeasonalEwmaDetector.slot_of(timestamp))
+            
             # Prepare features
             time_features = self.prepare_time_features([timestamp])
             X = np.column_stack([np.array([value]).reshape(-1, 1), time_features])
             
             # Predict anomaly
-            prediction = self.anomaly_detectors[metric].predict(X)[0]
-            score = self.anomaly_detectors[metric].score_samples(X)[0]
+            prediction = detector.predict(X)[0]
+            score = detector.score_samples(X)[0]
             
-            is_anomaly = prediction == -1
-            confidence = abs(score)
+            is_anomaly = bool(prediction == -1)
+            confidence = float(abs(score))
             
             return {
                 'is_anomaly': is_anomaly,
@@ -282,14 +485,105 @@ class EcoVerseMlEngine:
                 print("🔄 Updating ML models with new data...")
                 
                 for metric in ['electricity', 'water', 'waste']:
-                    self.train_usage_forecasting_model(self.historical_data, metric)
-                    self.train_anomaly_detector(self.historical_data, metric)
+                    # Online forecasters already absorbed every ingested point, so a retrain keeps
+                    # them until they have taken ONLINE_REFIT_POINTS updates since their last batch
+                    # fit (about one history window); the refit then starts them afresh from the
+                    # current window and scaler, bounding drift from forgetting and rounding
+                    online_model = self.online_models.get(metric)
+                    if online_model is None or online_model.n_updates >= ONLINE_REFIT_POINTS:
+                        self.train_usage_forecasting_model(self.historical_data, metric)
+                    # Streaming detectors keep learning per point once trained
+                    if self.anomaly_backend != 'seasonal_ewma' or metric not in self.anomaly_detectors:
+                        self.train_anomaly_detector(self.historical_data, metric)
                 
                 print("✅ Model update completed")
             
         except Exception as e:
             print(f"❌ Error updating models: {e}")
     
+    def save_checkpoint(self, path: str, metadata: Dict = None, include_history: bool = True) -> str:
+        """
+        Save the trained state to a versioned joblib checkpoint
+        
+        Stores models, scalers, anomaly detectors, online models and their
+        training metadata, plus the caller's `metadata`. The engine's
+        historical data is stored too unless `include_history` is False (for
+        callers that keep their own history in `metadata`). `path` may be a
+        directory (the file is then CHECKPOINT_FILE inside it). The file is
+        written under a temporary name, fsynced and atomically renamed, so
+        readers never see a partial checkpoint. Returns the file path.
+        """
+        if os.path.isdir(path) or path.endswith(('/', os.sep)):
+            os.makedirs(path, exist_ok=True)
+            path = os.path.join(path, CHECKPOINT_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        
+        # Snapshot under the online lock and dump outside it, so per-point updates only wait for
+        # the copy. Retrains replace batch models rather than change them; online forecasters
+        # and streaming detectors are updated in place, so those are copied
+        with self._online_lock:
+            streaming = self.anomaly_backend == 'seasonal_ewma'
+            state = {
+                'format_version': CHECKPOINT_VERSION,
+                'saved_at': datetime.now().isoformat(),
+                'anomaly_backend': self.anomaly_backend,
+                'models': dict(self.models),
+                'scalers': dict(self.scalers),
+                'anomaly_detectors': copy.deepcopy(self.anomaly_detectors) if streaming else dict(self.anomaly_detectors),
+                'online_models': copy.deepcopy(self.online_models),
+                'training_metadata': {metric: dict(entries) for metric, entries in self.training_metadata.items()},
+                'historical_data': list(self.historical_data) if include_history else [],
+                'metadata': metadata or {}
+            }
+        
+        with self._checkpoint_lock:
+            # Uncompressed, so numpy arrays can be memory-mapped on load
+            joblib.dump(state, tmp_path)
+            
+            with open(tmp_path, 'rb') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        return path
+    
+    def load_checkpoint(self, path: str, mmap_mode: str = None):
+        """
+        Restore the trained state from a checkpoint written by save_checkpoint
+        
+        Returns the checkpoint's caller metadata, or None (state unchanged)
+        when there is no checkpoint or it has another format version or
+        anomaly backend. With mmap_mode='r', model arrays are memory-mapped
+        read-only instead of read into memory. Only load checkpoints from
+        trusted locations: joblib files are pickles.
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            state = joblib.load(path, mmap_mode=mmap_mode)
+        except Exception as e:
+            print(f"❌ Error loading checkpoint {path}: {e}")
+            return None
+        
+        if not isinstance(state, dict) or state.get('format_version') != CHECKPOINT_VERSION:
+            print(f"⚠️ Checkpoint {path} has an unsupported format version - ignoring it")
+            return None
+        if state['anomaly_backend'] != self.anomaly_backend:
+            print(f"⚠️ Checkpoint {path} uses the {state['anomaly_backend']} anomaly backend - ignoring it")
+            return None
+        
+        with self._online_lock:
+            self.models = state['models']
+            self.scalers = state['scalers']
+            self.anomaly_detectors = state['anomaly_detectors']
+            self.online_models = state['online_models'] if self.online else {}
+            self.training_metadata = state['training_metadata']
+            self.historical_data = state['historical_data']
+        
+        print(f"✅ ML models restored from checkpoint saved at {state['saved_at']}")
+        return state['metadata']
+    
     def get_insights_summary(self, recent_data: List[Dict]) -> Dict:
         """Generate comprehensive insights from recent data"""
         try:
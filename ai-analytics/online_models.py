@@ -0,0 +1,157 @@
+"""
+EcoVerse Online Models
+Incremental learners updated one data point at a time, warm-started from the
+batch-trained models in ml_engine.py
+"""
+
+import math
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+
+
+class OnlineLinearForecaster:
+    """
+    Recursive least squares linear regression.
+    
+    Holds the coefficients (intercept first) and the inverse regularized
+    Gram matrix P, so each new observation updates the fit in O(d^2) with no
+    refit. With forgetting=1.0 the coefficients equal a ridge fit on every
+    observation seen; forgetting < 1 discounts old observations
+    geometrically (0.999 keeps an effective memory of ~1000 points, like the
+    batch model's history window).
+    
+    Features are expected already standardized with the batch model's
+    scaler; least-squares predictions do not depend on that scaling, it
+    only keeps P well conditioned.
+    """
+    
+    def __init__(self, n_features: int, forgetting: float = 0.999, regularization: float = 1e-3):
+        if not 0 < forgetting <= 1:
+            raise ValueError("forgetting must be in (0, 1]")
+        self.forgetting = forgetting
+        self.theta = np.zeros(n_features + 1)
+        self.P = np.eye(n_features + 1) / regularization
+        self.n_updates = 0
+    
+    @classmethod
+    def from_batch(cls, X: np.ndarray, y: np.ndarray, forgetting: float = 0.999,
+                   regularization: float = 1e-3) -> 'OnlineLinearForecaster':
+        """Warm start from a batch of (standardized) features and targets"""
+        model = cls(X.shape[1], forgetting, regularization)
+        Z = np.column_stack([np.ones(len(X)), X])
+        model.P = np.linalg.inv(Z.T @ Z + regularization * np.eye(Z.shape[1]))
+        model.theta = model.P @ (Z.T @ y)
+        return model
+    
+    def partial_update(self, x: np.ndarray, y: float):
+        """Fold one observation into the fit"""
+        z = np.concatenate(([1.0], x))
+        Pz = self.P @ z
+        gain = Pz / (self.forgetting + z @ Pz)
+        self.theta = self.theta + gain * (y - z @ self.theta)
+        P = (self.P - np.outer(gain, Pz)) / self.forgetting
+        self.P = (P + P.T) / 2  # keep P symmetric against rounding drift
+        self.n_updates += 1
+    
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predictions for rows of (standardized) features"""
+        return self.theta[0] + X @ self.theta[1:]
+
+
+HOURS_PER_WEEK = 168
+
+
+class SeasonalEwmaDetector:
+    """
+    Streaming anomaly detector on seasonal EWMA residuals.
+    
+    Keeps an EWMA of the expected value for each of the 168 hour-of-week
+    slots and an EWMA of the squared residual around those expectations. A
+    point is anomalous when its residual exceeds `threshold` residual
+    standard deviations. Updates clip residuals at `clip` standard
+    deviations, so a fault does not drag the expectations along with it
+    (clipping well above the threshold keeps the variance estimate from
+    shrinking on ordinary noise). Scoring and updating are O(1) with plain
+    Python floats.
+    """
+    
+    def __init__(self, threshold: float = 2.0, clip: float = 4.0, slot_alpha: float = 0.3,
+                 variance_alpha: float = 0.02):
+        self.threshold = threshold
+        self.clip = clip
+        self.slot_alpha = slot_alpha
+        self.variance_alpha = variance_alpha
+        self.slot_mean = [0.0] * HOURS_PER_WEEK
+        self.slot_count = [0] * HOURS_PER_WEEK
+        self.global_mean = 0.0
+        self.residual_var = 0.0
+        self.n_updates = 0
+    
+    @staticmethod
+    def slot_of(timestamp: str) -> int:
+        """Hour-of-week slot (Monday 00:00 is 0) of an ISO timestamp's wall-clock time"""
+        moment = datetime.fromisoformat(timestamp[:19])
+        return moment.weekday() * 24 + moment.hour
+    
+    @classmethod
+    def fit(cls, values: np.ndarray, slots: np.ndarray, **params) -> 'SeasonalEwmaDetector':
+        """Warm start from a batch: per-slot means and the pooled within-slot variance"""
+        detector = cls(**params)
+        values = np.asarray(values, dtype=np.float64)
+        slots = np.asarray(slots, dtype=np.int64)
+        counts = np.bincount(slots, minlength=HOURS_PER_WEEK)
+        sums = np.bincount(slots, weights=values, minlength=HOURS_PER_WEEK)
+        means = np.divide(sums, counts, out=np.zeros(HOURS_PER_WEEK), where=counts > 0)
+        
+        residuals = values - means[slots]
+        degrees = int(np.sum(np.maximum(counts - 1, 0)))
+        if degrees > 0:
+            detector.residual_var = float(np.sum(residuals ** 2) / degrees)
+        else:
+            detector.residual_var = float(np.var(values))
+        
+        detector.slot_mean = means.tolist()
+        detector.slot_count = counts.tolist()
+        detector.global_mean = float(values.mean()) if len(values) else 0.0
+        return detector
+    
+    def expected(self, slot: int) -> float:
+        """Expected value for a slot (the overall mean for slots not seen yet)"""
+        return self.slot_mean[slot] if self.slot_count[slot] else self.global_mean
+    
+    def score(self, value: float, slot: int) -> float:
+        """Residual of `value` in residual standard deviations"""
+        if self.residual_var <= 0:
+            return 0.0
+        return abs(value - self.expected(slot)) / math.sqrt(self.residual_var)
+    
+    def update(self, value: float, slot: int):
+        """Fold one observation into the slot expectation and residual variance"""
+        expected = self.expected(slot)
+        residual = value - expected
+        if self.residual_var > 0:
+            limit = self.clip * math.sqrt(self.residual_var)
+            residual = max(-limit, min(limit, residual))
+        clipped = expected + residual
+        
+        if self.slot_count[slot]:
+            self.slot_mean[slot] += self.slot_alpha * (clipped - self.slot_mean[slot])
+        else:
+            self.slot_mean[slot] = clipped
+        self.slot_count[slot] += 1
+        self.global_mean += self.variance_alpha * (clipped - self.global_mean)
+        self.residual_var = (1 - self.variance_alpha) * self.residual_var + self.variance_alpha * residual * residual
+        self.n_updates += 1
+    
+    def detect(self, value: float, slot: int) -> Dict:
+        """Anomaly verdict in the EcoVerseMlEngine.detect_anomaly format"""
+        z_score = self.score(value, slot)
+        confidence = min(1.0, z_score / (2 * self.threshold))
+        return {
+            'is_anomaly': z_score > self.threshold,
+            'confidence': round(confidence, 3),
+            'severity': 'High' if confidence > 0.5 else 'Medium' if confidence > 0.2 else 'Low',
+            'z_score': round(z_score, 2)
+        }
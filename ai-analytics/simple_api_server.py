@@ -6,6 +6,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from simple_ml_engine import SimpleMLEngine
+from ingest_api import API_CAPABILITIES, IngestState, register_ingest_api
 from datetime import datetime, timedelta
 import threading
 import time
@@ -18,22 +19,29 @@ CORS(app)
 # Initialize ML Engine
 ml_engine = SimpleMLEngine()
 
+# Ingest history and retrains; serves /api/data/add, /api/data/bulk and /api/forecast
+ingest = IngestState(ml_engine)
+register_ingest_api(app, ingest)
+
 # Global data storage (in production, use proper database)
-campus_data_history = []
-ml_models_trained = False
+campus_data_history = ingest.history
 
-def generate_sample_data():
-    """Generate realistic sample data for demonstration"""
+def generate_sample_data(seed=None, end=None):
+    """Generate realistic sample data for demonstration (reproducible for a given seed and end time)"""
+    if seed is None and os.getenv('SAMPLE_DATA_SEED'):
+        seed = int(os.getenv('SAMPLE_DATA_SEED'))
+    rng = random.Random(seed)
+    end = end or datetime.now()
     sample_data = []
     
     for hours_ago in range(168, 0, -1):  # 7 days * 24 hours
-        timestamp = (datetime.now() - timedelta(hours=hours_ago)).isoformat()
-        hour = (datetime.now() - timedelta(hours=hours_ago)).hour
+        timestamp = (end - timedelta(hours=hours_ago)).isoformat()
+        hour = (end - timedelta(hours=hours_ago)).hour
         
         # Generate realistic patterns with daily cycles
-        base_electricity = 2000 + 800 * math.sin(2 * math.pi * hour / 24) + random.uniform(-300, 300)
-        base_water = 8000 + 2000 * math.sin(2 * math.pi * hour / 24) + random.uniform(-800, 800)
-        base_waste = 300 + 100 * math.sin(2 * math.pi * hour / 24) + random.uniform(-50, 50)
+        base_electricity = 2000 + 800 * math.sin(2 * math.pi * hour / 24) + rng.uniform(-300, 300)
+        base_water = 8000 + 2000 * math.sin(2 * math.pi * hour / 24) + rng.uniform(-800, 800)
+        base_waste = 300 + 100 * math.sin(2 * math.pi * hour / 24) + rng.uniform(-50, 50)
         
         sample_point = {
             'timestamp': timestamp,
@@ -50,12 +58,11 @@ def generate_sample_data():
 
 def load_sample_data():
     """Load sample data to train initial models"""
-    global campus_data_history, ml_models_trained
-    
     print("🔄 Loading sample data for ML training...")
     
     # Generate sample data
-    campus_data_history = generate_sample_data()
+    with ingest.lock:
+        campus_data_history[:] = generate_sample_data()
     
     # Train models
     print("🤖 Training initial ML models...")
@@ -63,7 +70,7 @@ def load_sample_data():
         ml_engine.train_usage_forecasting_model(campus_data_history, metric)
         ml_engine.train_anomaly_detector(campus_data_history, metric)
     
-    ml_models_trained = True
+    ingest.models_trained = True
     print("✅ ML models trained successfully!")
 
 @app.route('/', methods=['GET'])
@@ -77,7 +84,10 @@ def root():
         'endpoints': {
             'health': '/api/health',
             'predictions': '/api/predict/<metric>',
+            'forecast': '/api/forecast',
             'anomaly_detection': '/api/anomaly/check',
+            'add_data': '/api/data/add',
+            'bulk_ingest': '/api/data/bulk',
             'sustainability_insights': '/api/insights',
             'carbon_footprint': '/api/carbon-footprint',
             'suggestions': '/api/suggestions',
@@ -92,8 +102,9 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'ml_models_trained': ml_models_trained,
+        'ml_models_trained': ingest.models_trained,
         'data_points': len(campus_data_history),
+        'ingest': ingest.backpressure_signals(),
         'timestamp': datetime.now().isoformat(),
         'engine': 'SimpleMLEngine',
         'version': '1.0.0'
@@ -108,7 +119,7 @@ def predict_usage(metric):
         if not timestamp:
             timestamp = (datetime.now() + timedelta(hours=1)).isoformat()
         
-        if not ml_models_trained:
+        if not ingest.models_trained:
             return jsonify({'error': 'ML models not trained yet'}), 400
         
         prediction = ml_engine.predict_usage(timestamp, metric)
@@ -126,10 +137,33 @@ def predict_usage(metric):
 
 @app.route('/api/anomaly/check', methods=['POST'])
 def check_anomaly():
-    """Check if current usage is anomalous"""
+    """
+    Check if current usage is anomalous. Accepts one metric
+    ({"metric", "value", "timestamp"}) or several at once
+    ({"metrics": {metric: value}, "timestamp"}), answered under "results".
+    """
     try:
         data = request.get_json()
         
+        if data and isinstance(data.get('metrics'), dict):
+            timestamp = data.get('timestamp', datetime.now().isoformat())
+            
+            if not ingest.models_trained:
+                return jsonify({'error': 'ML models not trained yet'}), 400
+            
+            return jsonify({
+                'timestamp': timestamp,
+                'results': {
+                    metric: {
+                        'metric': metric,
+                        'value': value,
+                        'timestamp': timestamp,
+                        'anomaly_detection': ml_engine.detect_anomaly(timestamp, value, metric)
+                    }
+                    for metric, value in data['metrics'].items()
+                }
+            })
+        
         if not data or 'metric' not in data or 'value' not in data:
             return jsonify({'error': 'Missing required fields: metric, value'}), 400
         
@@ -137,7 +171,7 @@ def check_anomaly():
         value = data['value']
         timestamp = data.get('timestamp', datetime.now().isoformat())
         
-        if not ml_models_trained:
+        if not ingest.models_trained:
             return jsonify({'error': 'ML models not trained yet'}), 400
         
         anomaly_result = ml_engine.detect_anomaly(timestamp, value, metric)
@@ -224,12 +258,11 @@ def get_insights():
         
         insights = ml_engine.get_insights_summary(recent_data)
         
-        # Add predictions for next few hours
+        # Add predictions for the next hour (all metrics in one forecast)
         predictions = {}
-        for metric in ['electricity', 'water', 'waste']:
-            if ml_models_trained:
-                next_hour = (datetime.now() + timedelta(hours=1)).isoformat()
-                predictions[metric] = ml_engine.predict_usage(next_hour, metric)
+        if ingest.models_trained:
+            next_hour = ml_engine.forecast(horizon=1)
+            predictions = {metric: values[0] for metric, values in next_hour['forecasts'].items()}
         
         return jsonify({
             'insights': insights,
@@ -242,40 +275,6 @@ def get_insights():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/data/add', methods=['POST'])
-def add_data_point():
-    """Add new data point for model training"""
-    try:
-        data = request.get_json()
-        
-        if not data or 'total_metrics' not in data:
-            return jsonify({'error': 'Missing total_metrics'}), 400
-        
-        # Add timestamp if not provided
-        if 'timestamp' not in data:
-            data['timestamp'] = datetime.now().isoformat()
-        
-        # Add to history
-        campus_data_history.append(data)
-        
-        # Keep only recent data (last 1000 points)
-        if len(campus_data_history) > 1000:
-            campus_data_history[:] = campus_data_history[-1000:]
-        
-        # Update models periodically
-        if len(campus_data_history) % 50 == 0:
-            print("🔄 Updating ML models with new data...")
-            threading.Thread(target=ml_engine.update_models, args=(campus_data_history,)).start()
-        
-        return jsonify({
-            'status': 'success',
-            'data_points_total': len(campus_data_history),
-            'timestamp': data['timestamp']
-        })
-        
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get system status and statistics"""
@@ -293,7 +292,7 @@ def get_status():
         return jsonify({
             'system_status': 'operational',
             'ml_engine': 'SimpleMLEngine',
-            'ml_models_trained': ml_models_trained,
+            'ml_models_trained': ingest.models_trained,
             'total_data_points': len(campus_data_history),
             'recent_24h_averages': {
                 'electricity': round(avg_electricity, 2),
@@ -303,13 +302,16 @@ def get_status():
             'available_endpoints': [
                 '/api/health',
                 '/api/predict/<metric>',
+                '/api/forecast',
                 '/api/anomaly/check',
                 '/api/suggestions',
                 '/api/carbon-footprint',
                 '/api/insights',
                 '/api/data/add',
+                '/api/data/bulk',
                 '/api/status'
             ],
+            'capabilities': list(API_CAPABILITIES),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -81,6 +81,36 @@ class SimpleMLEngine:
             print(f"❌ Error predicting usage: {e}")
             return self._get_default_prediction(metric)
     
+    def forecast(self, metrics=None, start=None, horizon=24, step=60):
+        """Forecast several metrics over `horizon` timestamps `step` minutes apart in one pass"""
+        metrics = list(metrics or ['electricity', 'water', 'waste'])
+        if start is None:
+            first = np.datetime64(datetime.now().replace(microsecond=0)) + np.timedelta64(step, 'm')
+        else:
+            first = np.datetime64(datetime.fromisoformat(start.replace('Z', '+00:00')).replace(tzinfo=None), 's')
+        moments = first + np.arange(horizon) * np.timedelta64(step, 'm')
+        hours = (moments - moments.astype('datetime64[D]')).astype('timedelta64[h]').astype(np.int64)
+        
+        forecasts = {}
+        for metric in metrics:
+            model = self.models.get(f'{metric}_forecast')
+            if model is None:
+                forecasts[metric] = [float(self._get_default_prediction(metric))] * horizon
+                continue
+            
+            # Same daily cycle, trend and noise as predict_usage
+            base_value = model['mean']
+            daily_variation = base_value * 0.3 * np.sin(2 * np.pi * hours / 24)
+            noise = np.random.default_rng(random.getrandbits(32)).uniform(-0.1, 0.1, horizon) * model['std']
+            prediction = base_value + daily_variation + model['trend'] * 24 + noise
+            forecasts[metric] = np.round(np.maximum(prediction, 0), 2).tolist()
+        
+        return {
+            'timestamps': np.datetime_as_string(moments, unit='s').tolist(),
+            'step_minutes': step,
+            'forecasts': forecasts
+        }
+    
     def detect_anomaly(self, timestamp, value, metric):
         """Detect anomalies using statistical thresholds"""
         try:
@@ -93,7 +123,7 @@ class SimpleMLEngine:
             # Calculate z-score
             z_score = abs(value - model['mean']) / model['std'] if model['std'] > 0 else 0
             
-            is_anomaly = z_score > model['threshold']
+            is_anomaly = bool(z_score > model['threshold'])
             confidence = min(z_score / model['threshold'], 1.0) if is_anomaly else 0.0
             
             reason = f"Value {value:.1f} is {z_score:.2f} standard deviations from mean {model['mean']:.1f}"
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Data spool crash recovery: torn writes, uncommitted batches and the
+dead-letter path of the spool drainer
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_spool import DataSpool, SpoolDrainer
+
+
+def make_points(n, start=0):
+    return [{'timestamp': f'2024-01-01T00:{i % 60:02d}:00', 'total_metrics': {'electricity': float(i)}}
+            for i in range(start, start + n)]
+
+
+def values(points):
+    return [point['total_metrics']['electricity'] for point in points]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    return str(tmp_path / 'spool')
+
+
+def test_torn_tail_is_truncated_on_reopen(spool_dir):
+    spool = DataSpool(spool_dir, fsync='never')
+    spool.append_many(make_points(5))
+    spool.close()
+    
+    # A crash in the middle of a write leaves half a record behind
+    segment = os.path.join(spool_dir, sorted(name for name in os.listdir(spool_dir) if name[0].isdigit())[-1])
+    with open(segment, 'ab') as f:
+        f.write(b'{"timestamp":"2024-01-01T00:05:00","total_')
+    
+    reopened = DataSpool(spool_dir, fsync='never')
+    assert reopened.torn_bytes_recovered > 0
+    points, _ = reopened.read_batch()
+    assert values(points) == values(make_points(5))
+    assert reopened.corrupt_records == 0
+    
+    # Appends after recovery start on a clean line
+    reopened.append_many(make_points(2, start=5))
+    points, _ = reopened.read_batch()
+    assert values(points) == values(make_points(7))
+    reopened.close()
+
+
+def test_uncommitted_batch_is_replayed_after_crash(spool_dir):
+    spool = DataSpool(spool_dir, fsync='always')
+    spool.append_many(make_points(10))
+    points, position = spool.read_batch(4)
+    spool.commit(position, len(points))
+    assert spool.records_committed == 4
+    
+    # Read but not committed when the process dies: replayed on restart
+    spool.read_batch(4)
+    restarted = DataSpool(spool_dir, fsync='always')
+    points, position = restarted.read_batch()
+    assert values(points) == values(make_points(6, start=4))
+    
+    restarted.commit(position, len(points))
+    assert not restarted.pending()
+    assert DataSpool(spool_dir).read_batch()[0] == []
+
+
+def test_replayed_segments_are_deleted(spool_dir):
+    spool = DataSpool(spool_dir, max_segment_bytes=200, fsync='never')
+    for i in range(10):
+        spool.append_many(make_points(1, start=i))
+    assert spool.stats()['segments'] > 2
+    
+    points, position = spool.read_batch()
+    assert values(points) == values(make_points(10))
+    spool.commit(position, len(points))
+    assert spool.stats()['segments'] == 1
+    spool.close()
+
+
+def test_rejected_batch_moves_to_dead_letter(spool_dir):
+    spool = DataSpool(spool_dir, fsync='never')
+    spool.append_many(make_points(3))
+    spool.append_many(make_points(3, start=3))
+    delivered = []
+    
+    def send_batch(points):
+        if values(points)[0] == 0:
+            raise ValueError('ML API refused 3 point(s)')
+        delivered.extend(points)
+    
+    drainer = SpoolDrainer(spool, send_batch, batch_size=3, retry_interval=0.01)
+    drainer.start()
+    try:
+        assert wait_for(lambda: len(delivered) == 3)
+    finally:
+        drainer.stop(timeout=5)
+    
+    assert values(delivered) == values(make_points(3, start=3))
+    assert spool.stats()['dead_letter_batches'] == 1
+    assert spool.stats()['dead_letter_points'] == 3
+    assert spool.records_committed == 3
+    with open(spool.dead_letter_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['point'] for record in records] == make_points(3)
+    assert records[0]['reason'] == 'ML API refused 3 point(s)'
+
+
+def test_outage_keeps_batches_until_the_api_is_back(spool_dir):
+    spool = DataSpool(spool_dir, fsync='never')
+    spool.append_many(make_points(2))
+    spool.append_many(make_points(2, start=2))
+    attempts = []
+    delivered = []
+    
+    def send_batch(points):
+        attempts.append(len(points))
+        if len(attempts) <= 20:
+            raise ConnectionError('ML API unavailable')
+        if values(points)[0] == 2:
+            raise ValueError('ML API refused 2 point(s)')
+        delivered.extend(points)
+    
+    drainer = SpoolDrainer(spool, send_batch, batch_size=2, retry_interval=0.01, max_retry_interval=0.01)
+    drainer.start()
+    try:
+        assert wait_for(lambda: not spool.pending())
+    finally:
+        drainer.stop(timeout=5)
+    
+    # Twenty failed sends lose nothing; only the refused batch is dead-lettered
+    assert values(delivered) == values(make_points(2))
+    assert drainer.send_failures == 21
+    assert spool.stats()['dead_letter_batches'] == 1
+    with open(spool.dead_letter_path) as f:
+        assert [json.loads(line)['point'] for line in f] == make_points(2, start=2)
+
+
+def test_undecodable_record_is_dead_lettered_once(spool_dir):
+    spool = DataSpool(spool_dir, fsync='never')
+    spool.append_many(make_points(1))
+    spool._file.write(b'{"timestamp": not json}\n')
+    spool.append_many(make_points(1, start=1))
+    
+    # Re-reading the uncommitted batch (as a retry does) does not record the record again
+    for _ in range(3):
+        points, position = spool.read_batch()
+    assert values(points) == values(make_points(2))
+    assert spool.corrupt_records == 1
+    with open(spool.dead_letter_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [record['raw'] for record in records] == ['{"timestamp": not json}\n']
+    spool.close()
+
+
+def test_batch_sent_partway_retries_only_the_rest(spool_dir):
+    spool = DataSpool(spool_dir, fsync='never')
+    spool.append_many(make_points(5))
+    delivered = []
+    failures = []
+    
+    def send_batch(points):
+        # Legacy servers take one point per request; the third request fails once
+        for index, point in enumerate(points):
+            if values([point])[0] == 2 and not failures:
+                failures.append(index)
+                error = ConnectionError('ML API unavailable')
+                error.points_sent = index
+                raise error
+            delivered.append(point)
+    
+    drainer = SpoolDrainer(spool, send_batch, retry_interval=0.01, max_retry_interval=0.01)
+    drainer.start()
+    try:
+        assert wait_for(lambda: not spool.pending())
+    finally:
+        drainer.stop(timeout=5)
+    
+    assert values(delivered) == values(make_points(5))
+    assert drainer.points_replayed == 5
+    assert spool.records_committed == 5
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+In-process ML client: retrain boundaries crossed while a retrain is running
+start another retrain on the newer history, as the API servers do
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from inprocess_client import InProcessMLClient
+
+
+class BlockingEngine:
+    """Engine stub whose retrains wait until released"""
+    
+    def __init__(self):
+        self.trained_on = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+    
+    def update_models(self, data):
+        self.started.set()
+        self.release.wait(5)
+        self.trained_on.append(len(data))
+
+
+def make_points(n):
+    return [{'timestamp': f'2024-01-01T00:{i % 60:02d}:00', 'total_metrics': {'electricity': float(i)}}
+            for i in range(n)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_boundary_crossed_during_a_retrain_is_kept():
+    engine = BlockingEngine()
+    client = InProcessMLClient(engine, retrain_every=10)
+    try:
+        client.send_points(make_points(10))
+        assert engine.started.wait(5)
+        
+        # Two more boundaries while the first retrain runs: one more retrain on the newest history
+        client.send_points(make_points(10))
+        client.send_points(make_points(10))
+        assert wait_for(lambda: client.points_received == 30)
+        assert client.retraining
+        engine.release.set()
+        
+        assert wait_for(lambda: not client.retraining)
+        assert engine.trained_on == [10, 30]
+        assert client.retrains == 2
+    finally:
+        engine.release.set()
+        client.close()
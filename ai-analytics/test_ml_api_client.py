@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+ML API client ingest against servers without bulk ingest: a connection error
+partway through a batch reports how many points were already sent
+"""
+
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ml_api_client import MLApiClient
+
+
+class Response:
+    status_code = 200
+    
+    def json(self):
+        return {'status': 'success'}
+
+
+@pytest.fixture
+def client():
+    client = MLApiClient('http://ml-api.invalid')
+    client._capabilities = frozenset()  # a server from before bulk ingest
+    yield client
+    client.executor.shutdown()
+
+
+def test_connection_error_partway_reports_points_sent(client, monkeypatch):
+    sent = []
+    
+    def add_data(data):
+        if len(sent) == 3:
+            raise requests.exceptions.ConnectionError('ML API unavailable')
+        sent.append(data)
+        return Response()
+    
+    monkeypatch.setattr(client, 'add_data', add_data)
+    points = [{'total_metrics': {'electricity': float(i)}} for i in range(5)]
+    with pytest.raises(requests.exceptions.ConnectionError) as error:
+        client.send_points(points)
+    assert error.value.points_sent == 3
+    assert sent == points[:3]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Model checkpoints: a saved engine restores with the same predictions, with
+and without memory-mapped arrays, and the API server warm-starts on import
+"""
+
+import importlib.util
+import os
+import sys
+
+import joblib
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ml_engine
+from ml_engine import CHECKPOINT_FILE, EcoVerseMlEngine
+from test_online_forecaster import make_history
+
+METRICS = ('electricity', 'water', 'waste')
+START = '2024-03-01T00:00:00'
+
+
+@pytest.fixture(scope='module')
+def trained_engine():
+    engine = EcoVerseMlEngine()
+    history = make_history(300)
+    for metric in METRICS:
+        engine.train_usage_forecasting_model(history[:250], metric)
+        engine.train_anomaly_detector(history[:250], metric)
+    for point in history[250:]:
+        engine.partial_update(point)
+    return engine
+
+
+def load_api_server(monkeypatch, model_path=None):
+    """A fresh api_server module, imported the way a WSGI server would"""
+    if model_path is None:
+        monkeypatch.delenv('ML_MODEL_PATH', raising=False)
+    else:
+        monkeypatch.setenv('ML_MODEL_PATH', model_path)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_server.py')
+    spec = importlib.util.spec_from_file_location('api_server_under_test', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('mmap_mode', [None, 'r'])
+def test_checkpoint_round_trip(tmp_path, trained_engine, mmap_mode):
+    path = trained_engine.save_checkpoint(str(tmp_path) + '/', {'note': 'round trip'})
+    assert path == os.path.join(str(tmp_path), CHECKPOINT_FILE)
+    
+    restored = EcoVerseMlEngine()
+    assert restored.load_checkpoint(str(tmp_path), mmap_mode=mmap_mode) == {'note': 'round trip'}
+    
+    expected = trained_engine.forecast(list(METRICS), START, horizon=48)
+    actual = restored.forecast(list(METRICS), START, horizon=48)
+    assert actual['forecasts'] == expected['forecasts']
+    for metric in METRICS:
+        np.testing.assert_array_equal(restored.online_models[metric].theta, trained_engine.online_models[metric].theta)
+        assert restored.detect_anomaly(START, 9999.0, metric) == trained_engine.detect_anomaly(START, 9999.0, metric)
+    
+    # Memory-mapped arrays are read-only views of the checkpoint file
+    theta = restored.online_models['electricity'].theta
+    assert isinstance(theta, np.memmap) == (mmap_mode == 'r')
+    
+    # Online updates after a memory-mapped load replace the arrays instead of writing to them
+    restored.partial_update(make_history(301)[-1])
+    assert restored.online_models['electricity'].n_updates == trained_engine.online_models['electricity'].n_updates + 1
+
+
+def test_online_updates_do_not_wait_for_the_dump(tmp_path, monkeypatch):
+    engine = EcoVerseMlEngine()
+    history = make_history(260)
+    engine.train_usage_forecasting_model(history[:250], 'electricity')
+    before = engine.online_models['electricity'].n_updates
+    dump = joblib.dump
+    
+    def dump_during_updates(state, path):
+        # The lock is free while dumping, and updates leave the snapshot alone
+        assert engine._online_lock.acquire(timeout=1)
+        engine._online_lock.release()
+        for point in history[250:]:
+            engine.partial_update(point)
+        return dump(state, path)
+    
+    monkeypatch.setattr(ml_engine.joblib, 'dump', dump_during_updates)
+    engine.save_checkpoint(str(tmp_path) + '/')
+    
+    assert engine.online_models['electricity'].n_updates == before + 10
+    restored = EcoVerseMlEngine()
+    restored.load_checkpoint(str(tmp_path))
+    assert restored.online_models['electricity'].n_updates == before
+
+
+def test_missing_or_foreign_checkpoint_leaves_engine_untouched(tmp_path, trained_engine):
+    engine = EcoVerseMlEngine()
+    assert engine.load_checkpoint(str(tmp_path)) is None
+    
+    trained_engine.save_checkpoint(str(tmp_path) + '/')
+    other_backend = EcoVerseMlEngine(anomaly_backend='seasonal_ewma')
+    assert other_backend.load_checkpoint(str(tmp_path)) is None
+    assert other_backend.models == {}
+
+
+def test_api_server_warm_starts_on_import(tmp_path, monkeypatch):
+    model_path = str(tmp_path / 'models') + '/'
+    server = load_api_server(monkeypatch, model_path)
+    assert not server.ingest.models_trained
+    server.load_sample_data(seed=1)
+    
+    # The history is stored once, with the server's metadata
+    state = joblib.load(os.path.join(model_path, CHECKPOINT_FILE))
+    assert state['historical_data'] == []
+    assert len(state['metadata']['campus_data_history']) == 168
+    
+    restarted = load_api_server(monkeypatch, model_path)
+    assert restarted.ingest.models_trained
+    assert restarted.campus_data_history == server.campus_data_history
+    assert restarted.ml_engine.forecast(list(METRICS), START) == server.ml_engine.forecast(list(METRICS), START)
+
+
+def test_api_server_writes_no_checkpoint_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = load_api_server(monkeypatch)
+    
+    server.load_sample_data(seed=1)
+    assert server.ingest.models_trained
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Online forecasters: recursive least squares against a batch fit, refits on
+retrain and points ingested while a retrain is running
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ml_engine
+from ml_engine import EcoVerseMlEngine
+from online_models import OnlineLinearForecaster
+
+METRICS = ('electricity', 'water', 'waste')
+
+
+def make_history(hours, seed=7, start=datetime(2024, 1, 1)):
+    """Hourly campus totals with a daily cycle, a weekend dip and noise"""
+    rng = np.random.default_rng(seed)
+    points = []
+    for i in range(hours):
+        when = start + timedelta(hours=i)
+        daily = np.sin(2 * np.pi * when.hour / 24)
+        weekend = 0.7 if when.weekday() >= 5 else 1.0
+        points.append({
+            'timestamp': when.isoformat(),
+            'total_metrics': {
+                'electricity': float((2000 + 800 * daily) * weekend + rng.normal(0, 150)),
+                'water': float((8000 + 2000 * daily) * weekend + rng.normal(0, 500)),
+                'waste': float((300 + 100 * daily) * weekend + rng.normal(0, 25))
+            }
+        })
+    return points
+
+
+def mae(engine, points, metric):
+    X = engine.prepare_time_features([point['timestamp'] for point in points])
+    y = np.array([point['total_metrics'][metric] for point in points])
+    return float(np.mean(np.abs(engine._predict_scaled(metric, X) - y)))
+
+
+def test_rls_without_forgetting_matches_batch_fit():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 5))
+    y = X @ rng.normal(size=5) + 3 + rng.normal(0, 0.1, 300)
+    
+    online = OnlineLinearForecaster.from_batch(X[:100], y[:100], forgetting=1.0)
+    for x, target in zip(X[100:], y[100:]):
+        online.partial_update(x, target)
+    batch = OnlineLinearForecaster.from_batch(X, y, forgetting=1.0)
+    
+    np.testing.assert_allclose(online.theta, batch.theta, rtol=1e-6, atol=1e-8)
+    assert online.n_updates == 200
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_online_updates_track_a_batch_refit(metric):
+    history = make_history(1000 + 168)
+    train, stream, holdout = history[:500], history[500:1000], history[1000:]
+    
+    online = EcoVerseMlEngine()
+    online.train_usage_forecasting_model(train, metric)
+    for point in stream:
+        online.partial_update(point)
+    
+    batch = EcoVerseMlEngine(online=False)
+    batch.train_usage_forecasting_model(train + stream, metric)
+    
+    # Within 5% of the MAE of refitting on everything
+    assert mae(online, holdout, metric) <= 1.05 * mae(batch, holdout, metric)
+
+
+def test_retrain_refits_online_models_after_refit_points(monkeypatch):
+    monkeypatch.setattr(ml_engine, 'ONLINE_REFIT_POINTS', 20)
+    engine = EcoVerseMlEngine()
+    history = make_history(200)
+    engine.update_models(history[:100])
+    first = engine.online_models['electricity']
+    
+    # Fewer updates than ONLINE_REFIT_POINTS: the retrain keeps the online model
+    for point in history[100:110]:
+        engine.partial_update(point)
+    engine.update_models(history[100:110])
+    assert engine.online_models['electricity'] is first
+    assert first.n_updates == 10
+    
+    # Enough updates: the retrain refits it from the current window
+    for point in history[110:130]:
+        engine.partial_update(point)
+    engine.update_models(history[110:130])
+    refit = engine.online_models['electricity']
+    assert refit is not first
+    assert refit.n_updates == 0
+
+
+def test_points_ingested_during_a_retrain_are_kept():
+    engine = EcoVerseMlEngine()
+    history = make_history(400)
+    engine.train_usage_forecasting_model(history[:300], 'electricity')
+    for point in history[:300]:
+        engine.partial_update(point)
+    
+    # The retrain trains on a snapshot; later points reach partial_update before it swaps models
+    snapshot = list(history[:350])
+    for point in history[300:380]:
+        engine.partial_update(point)
+    engine.train_usage_forecasting_model(snapshot, 'electricity')
+    
+    scaler = engine.scalers['electricity']
+    X = scaler.transform(engine.prepare_time_features([point['timestamp'] for point in snapshot]))
+    y = np.array([point['total_metrics']['electricity'] for point in snapshot])
+    expected = OnlineLinearForecaster.from_batch(X, y, ml_engine.ONLINE_FORGETTING)
+    for point in history[350:380]:
+        x = scaler.transform(engine.prepare_time_features([point['timestamp']]))[0]
+        expected.partial_update(x, point['total_metrics']['electricity'])
+    
+    actual = engine.online_models['electricity']
+    assert actual.n_updates == 30
+    np.testing.assert_allclose(actual.theta, expected.theta, rtol=1e-9)
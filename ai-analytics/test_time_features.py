@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Time features use the wall-clock time of each ISO timestamp, whatever its
+precision or UTC offset, as datetime.fromisoformat does
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ml_engine import FEATURE_CACHE_MIN_ROWS, EcoVerseMlEngine
+
+TIMESTAMPS = [
+    '2024-03-10T05:06+05:30',
+    '2024-03-10T05:06-0800',
+    '2024-03-10T05:06',
+    '2024-03-10T05',
+    '2024-03-10T05:06:07.123456+01:00',
+    '2024-03-10T23:59:59Z',
+    '2024-03-10 05:06:07-03',
+    '2024-03-10',
+    '20240310T050607+0530'
+]
+
+
+def wall_clock(ts):
+    return datetime.fromisoformat(ts.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+@pytest.mark.parametrize('timestamp', TIMESTAMPS)
+def test_offsets_and_precision_keep_wall_clock_time(timestamp):
+    moment = EcoVerseMlEngine()._parse_timestamps([timestamp])[0].astype(datetime)
+    assert moment == wall_clock(timestamp).replace(microsecond=0)
+
+
+def test_features_match_datetime_fields():
+    # Long enough to go through the feature cache too
+    timestamps = TIMESTAMPS * (FEATURE_CACHE_MIN_ROWS // len(TIMESTAMPS) + 1)
+    features = EcoVerseMlEngine().prepare_time_features(timestamps)
+    expected = [[wall_clock(ts).hour, wall_clock(ts).weekday(), wall_clock(ts).month] for ts in timestamps]
+    np.testing.assert_array_equal(features[:, :3], expected)
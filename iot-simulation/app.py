@@ -3,22 +3,56 @@ EcoVerse IoT Simulation API
 Flask web service for IoT data simulation and management
 """
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import threading
-import time
+import io
 import json
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import os
+import numpy as np
+from backfill import HistoricalBackfill, batch_columns, batch_record_dtype, batch_records, columns_to_json
 from campus_simulator import CampusDataSimulator
+from simulation_scheduler import SimulationScheduler, DEFAULT_SIMULATION
+from snapshot_stream import STREAM_FORMATS
 
 app = Flask(__name__)
 CORS(app)
 
-# Global simulator instance
-simulator = None
-simulation_thread = None
-simulation_active = False
+# Named simulations; each has its own thread, recent-snapshot ring buffer and
+# push stream shared by all subscribers
+scheduler = SimulationScheduler(
+    buffer_size=int(os.environ.get('SNAPSHOT_BUFFER_SIZE', 1000)),
+    stream_queue=int(os.environ.get('STREAM_QUEUE_SIZE', 100)),
+    max_subscribers=int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 1000)),
+    max_simulations=int(os.environ.get('MAX_SIMULATIONS', 16)),
+    record_dir=os.environ.get('SIMULATION_RECORD_DIR') or None
+)
+STREAM_KEEPALIVE_SECONDS = float(os.environ.get('STREAM_KEEPALIVE_SECONDS', 15))
+
+# Bulk /api/data/snapshot requests
+SNAPSHOT_FORMATS = ('json', 'ndjson', 'columnar', 'npy')
+BULK_MAX_SNAPSHOTS = int(os.environ.get('BULK_MAX_SNAPSHOTS', 1000000))
+BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 1000))
+
+def get_simulator():
+    """Simulator of the default simulation (created on first use)"""
+    return scheduler.get_or_create(DEFAULT_SIMULATION).simulator
+
+def find_simulation():
+    """Simulation named by ?simulation= (the default one is created on first use), or None"""
+    name = request.args.get('simulation', DEFAULT_SIMULATION)
+    if name == DEFAULT_SIMULATION:
+        return scheduler.get_or_create(name)
+    return scheduler.get(name)
+
+def simulation_not_found():
+    return jsonify({
+        'success': False,
+        'error': f"Unknown simulation '{request.args.get('simulation')}'"
+    }), 404
+
+def any_simulation_active():
+    return any(simulation.active for simulation in scheduler.simulations())
 
 @app.route('/', methods=['GET'])
 def root():
@@ -34,10 +68,14 @@ def root():
             'stop_simulation': '/api/simulation/stop',
             'status': '/api/simulation/status',
             'current_data': '/api/data/current',
+            'latest_data': '/api/data/latest',
+            'recent_data': '/api/data/recent',
             'generate_snapshot': '/api/data/snapshot',
+            'stream': '/api/stream',
+            'simulations': '/api/simulations',
             'buildings': '/api/buildings'
         },
-        'simulation_status': 'active' if simulation_active else 'inactive'
+        'simulation_status': 'active' if any_simulation_active() else 'inactive'
     })
 
 @app.route('/api/health', methods=['GET'])
@@ -47,31 +85,111 @@ def health_check():
         'status': 'healthy',
         'service': 'EcoVerse IoT Simulation API',
         'timestamp': datetime.now().isoformat(),
-        'simulation_active': simulation_active
+        'simulation_active': any_simulation_active()
     })
 
 @app.route('/api/buildings', methods=['GET'])
 def get_buildings():
     """Get list of monitored buildings"""
-    global simulator
-    if not simulator:
-        simulator = CampusDataSimulator()
+    simulator = get_simulator()
     
     return jsonify({
         'buildings': simulator.buildings,
         'building_profiles': simulator.building_profiles,
+        'campuses': simulator.registry.campus_names(),
         'total_buildings': len(simulator.buildings)
     })
 
+def bulk_simulator(seed=None):
+    """Private simulator for bulk requests, independent of the live stream and its sinks"""
+    shared = get_simulator()
+    return CampusDataSimulator(shared.registry, seed=seed, usage_profiles=shared.usage_profiles)
+
+def stream_snapshot_batches(batches, fmt, count, formatter):
+    """Encode snapshot batches chunk by chunk in the requested format"""
+    if fmt == 'npy':
+        dtype = None
+        for batch in batches:
+            if dtype is None:
+                dtype = batch_record_dtype(batch)
+                header = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,)}
+                buffer = io.BytesIO()
+                np.lib.format.write_array_header_2_0(buffer, header)
+                yield buffer.getvalue()
+            yield batch_records(batch, dtype).tobytes()
+        return
+    
+    if fmt == 'json':
+        yield f'{{"success":true,"count":{count},"data":['
+    
+    first = True
+    for batch in batches:
+        if fmt == 'columnar':
+            yield json.dumps(columns_to_json(batch_columns(batch)), separators=(',', ':')) + '\n'
+            continue
+        
+        lines = [json.dumps(snapshot, separators=(',', ':')) for snapshot in formatter.snapshots_from_batch(batch)]
+        if fmt == 'ndjson':
+            yield '\n'.join(lines) + '\n'
+        else:
+            yield ('' if first else ',') + ','.join(lines)
+            first = False
+    
+    if fmt == 'json':
+        yield f'],"generated_at":"{datetime.now().isoformat()}"}}'
+
 @app.route('/api/data/snapshot', methods=['GET'])
 def generate_data_snapshot():
-    """Generate a single data snapshot"""
-    global simulator
-    if not simulator:
-        simulator = CampusDataSimulator()
+    """
+    Generate data snapshots.
+    
+    Without parameters returns one snapshot of the live simulator. With
+    ?count=N&start=ISO&step=SECONDS&format=json|ndjson|columnar|npy&seed=S,
+    streams N snapshots generated in chunks:
+      json      {"success", "count", "data": [snapshot, ...]}
+      ndjson    one snapshot per line
+      columnar  one line per chunk of column arrays (see backfill.batch_columns)
+      npy       a .npy structured array, one record per snapshot; building
+                columns follow the /api/buildings order
+    """
+    if any(key in request.args for key in ('count', 'start', 'step', 'format', 'seed')):
+        try:
+            count = int(request.args.get('count', 1))
+            step = int(request.args.get('step', 300))
+            start = request.args.get('start')
+            start = datetime.fromisoformat(start.replace('Z', '+00:00')) if start else datetime.now()
+            seed = request.args.get('seed')
+            seed = int(seed) if seed is not None else None
+        except ValueError as e:
+            return jsonify({'success': False, 'error': f'Invalid parameter: {e}'}), 400
+        
+        fmt = request.args.get('format', 'json')
+        if fmt not in SNAPSHOT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': f"Unknown format '{fmt}', use one of {list(SNAPSHOT_FORMATS)}"
+            }), 400
+        if not 1 <= count <= BULK_MAX_SNAPSHOTS or step < 1:
+            return jsonify({
+                'success': False,
+                'error': f'count must be between 1 and {BULK_MAX_SNAPSHOTS} and step at least 1 second'
+            }), 400
+        
+        backfill = HistoricalBackfill(bulk_simulator(seed), chunk_size=BULK_CHUNK_SIZE)
+        if start.tzinfo is not None:
+            start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        batches = backfill.iter_batches(start, start + count * timedelta(seconds=step), step)
+        mimetypes = {'json': 'application/json', 'ndjson': 'application/x-ndjson',
+                     'columnar': 'application/x-ndjson', 'npy': 'application/octet-stream'}
+        return Response(stream_snapshot_batches(batches, fmt, count, backfill.simulator),
+                        mimetype=mimetypes[fmt])
+    
+    simulation = find_simulation()
+    if simulation is None:
+        return simulation_not_found()
     
     try:
-        campus_data = simulator.generate_campus_snapshot()
+        campus_data = simulation.simulator.generate_campus_snapshot()
         return jsonify({
             'success': True,
             'data': campus_data,
@@ -86,175 +204,335 @@ def generate_data_snapshot():
 
 @app.route('/api/data/current', methods=['GET'])
 def get_current_data():
-    """Get current simulation data"""
-    global simulator
-    if not simulator:
+    """Get current simulation data (?simulation=name, default simulation otherwise)"""
+    simulation = find_simulation()
+    if simulation is None:
+        return simulation_not_found()
+    
+    if not simulation.active:
         return jsonify({
             'success': False,
-            'error': 'Simulator not initialized'
+            'error': 'Simulation not active. Start simulation first.'
         }), 400
     
-    if not simulation_active:
+    # Latest snapshot emitted by the simulation (the one sent to Firebase)
+    campus_data = simulation.recent.latest()
+    if campus_data is None:
         return jsonify({
             'success': False,
-            'error': 'Simulation not active. Start simulation first.'
-        }), 400
+            'error': 'No data emitted yet. Retry shortly.'
+        }), 503
     
-    # Generate fresh data
-    campus_data = simulator.generate_campus_snapshot()
     return jsonify({
         'success': True,
         'data': campus_data,
-        'simulation_active': simulation_active
+        'simulation_active': simulation.active
     })
 
-@app.route('/api/simulation/start', methods=['POST'])
-def start_simulation():
-    """Start the IoT data simulation"""
-    global simulator, simulation_thread, simulation_active
+@app.route('/api/data/latest', methods=['GET'])
+def get_latest_data():
+    """Get the most recently emitted snapshot"""
+    simulation = find_simulation()
+    if simulation is None:
+        return simulation_not_found()
     
-    if simulation_active:
+    campus_data = simulation.recent.latest()
+    if campus_data is None:
         return jsonify({
             'success': False,
-            'message': 'Simulation already running',
-            'status': 'active'
+            'error': 'No data emitted yet'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'data': campus_data,
+        'simulation_active': simulation.active
+    })
+
+@app.route('/api/data/recent', methods=['GET'])
+def get_recent_data():
+    """Get the last N emitted snapshots, oldest first (?count=N)"""
+    simulation = find_simulation()
+    if simulation is None:
+        return simulation_not_found()
+    
+    try:
+        count = int(request.args.get('count', 10))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'count must be an integer'
         }), 400
     
+    count = max(1, min(count, simulation.recent.capacity))
+    snapshots = simulation.recent.recent(count)
+    return jsonify({
+        'success': True,
+        'data': snapshots,
+        'count': len(snapshots),
+        'buffer_capacity': simulation.recent.capacity,
+        'simulation_active': simulation.active
+    })
+
+@app.route('/api/stream', methods=['GET'])
+def stream_data():
+    """Push live simulation snapshots (Server-Sent Events, or NDJSON with ?format=ndjson)"""
+    fmt = request.args.get('format', 'sse')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({
+            'success': False,
+            'error': f"Unknown format '{fmt}', use one of {list(STREAM_FORMATS)}"
+        }), 400
+    
+    simulation = find_simulation()
+    if simulation is None:
+        return simulation_not_found()
+    
     try:
-        # Get interval from request (default 300 seconds = 5 minutes)
-        data = request.get_json() or {}
-        interval = data.get('interval_seconds', 300)
-        
-        if not simulator:
-            simulator = CampusDataSimulator()
-        
-        # Start simulation in background thread
-        def run_simulation():
-            global simulation_active
-            simulation_active = True
-            simulator.simulate_realtime_data(interval_seconds=interval)
-            simulation_active = False
+        subscription = simulation.broadcaster.subscribe()
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e)}), 503
+    
+    mimetype = 'text/event-stream' if fmt == 'sse' else 'application/x-ndjson'
+    return Response(
+        simulation.broadcaster.stream(subscription, fmt, STREAM_KEEPALIVE_SECONDS),
+        mimetype=mimetype,
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/stream/stats', methods=['GET'])
+def stream_stats():
+    """Get push stream subscriber statistics"""
+    simulation = find_simulation()
+    if simulation is None:
+        return simulation_not_found()
+    
+    return jsonify({
+        'success': True,
+        'stream': simulation.broadcaster.stats(),
+        'simulation_active': simulation.active
+    })
+
+def is_integer(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def start_from_body(data, start):
+    """
+    Start the simulation described by a /api/simulation/start body with
+    `start` (scheduler.start, or scheduler.start_async in async serving).
+    
+    Returns:
+        (response payload, HTTP status)
+    """
+    # Get interval from request (default 300 seconds = 5 minutes)
+    name = data.get('name', DEFAULT_SIMULATION)
+    interval = data.get('interval_seconds', 300)
+    seed = data.get('seed')
+    max_snapshots = data.get('max_snapshots')
+    
+    error = None
+    if not is_number(interval) or interval <= 0:
+        error = 'interval_seconds must be a positive number'
+    elif seed is not None and not is_integer(seed):
+        error = 'seed must be an integer'
+    elif max_snapshots is not None and (not is_integer(max_snapshots) or max_snapshots < 1):
+        error = 'max_snapshots must be a positive integer'
+    if error:
+        return {
+            'success': False,
+            'error': error
+        }, 400
+    
+    try:
+        existing = scheduler.get(name)
+        if existing is not None and existing.active:
+            return {
+                'success': False,
+                'message': 'Simulation already running',
+                'status': 'active'
+            }, 400
         
-        simulation_thread = threading.Thread(target=run_simulation, daemon=True)
-        simulation_thread.start()
+        simulation = start(
+            name,
+            interval_seconds=interval,
+            max_snapshots=max_snapshots,
+            campus=data.get('campus'),
+            seed=seed,
+            firebase=data.get('firebase', True),
+            record_file=data.get('record_file')
+        )
         
-        return jsonify({
+        return {
             'success': True,
             'message': 'IoT simulation started successfully',
+            'name': name,
             'interval_seconds': interval,
-            'buildings_monitored': len(simulator.buildings),
+            'buildings_monitored': len(simulation.simulator.buildings),
             'status': 'active'
-        })
+        }, 200
         
+    except (RuntimeError, ValueError) as e:
+        # Lost a start race, unknown campus or simulation limit reached
+        return {
+            'success': False,
+            'message': str(e),
+            'status': 'inactive'
+        }, 400
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e),
             'timestamp': datetime.now().isoformat()
-        }), 500
+        }, 500
 
-@app.route('/api/simulation/stop', methods=['POST'])
-def stop_simulation():
-    """Stop the IoT data simulation"""
-    global simulator, simulation_active
+def start_demo_from_body(data, start):
+    """Start a demo run (see start_from_body); returns (response payload, HTTP status)"""
+    name = data.get('name', DEFAULT_SIMULATION)
     
-    if not simulation_active:
-        return jsonify({
+    existing = scheduler.get(name)
+    if existing is not None and existing.active:
+        return {
             'success': False,
-            'message': 'Simulation not running',
-            'status': 'inactive'
-        }), 400
+            'message': 'Simulation already running',
+            'status': 'active'
+        }, 400
     
     try:
-        if simulator:
-            simulator.stop()
-            simulation_active = False
+        # Demo: 30-second intervals for 5 minutes (10 data points)
+        start(name, interval_seconds=30, max_snapshots=10)
         
-        return jsonify({
+        return {
             'success': True,
-            'message': 'IoT simulation stopped successfully',
-            'status': 'inactive',
-            'timestamp': datetime.now().isoformat()
-        })
+            'message': 'Demo simulation started (30s intervals, 5 minutes)',
+            'name': name,
+            'demo_duration': '5 minutes',
+            'interval_seconds': 30,
+            'data_points': 10,
+            'status': 'active'
+        }, 200
         
+    except RuntimeError as e:
+        return {
+            'success': False,
+            'message': str(e),
+            'status': 'active'
+        }, 400
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, 500
+
+@app.route('/api/simulation/start', methods=['POST'])
+def start_simulation():
+    """
+    Start an IoT data simulation.
+    
+    JSON body (all optional): name (default 'default'), interval_seconds,
+    max_snapshots, and, applied when the named simulation is created,
+    campus, seed, firebase (false disables Firebase writes) and record_file
+    (file name of a snapshot log in SIMULATION_RECORD_DIR, for record/replay).
+    """
+    payload, status = start_from_body(request.get_json(silent=True) or {}, scheduler.start)
+    return jsonify(payload), status
+
+@app.route('/api/simulation/stop', methods=['POST'])
+def stop_simulation():
+    """Stop an IoT data simulation (JSON body: name, default 'default')"""
+    data = request.get_json(silent=True) or {}
+    name = data.get('name', DEFAULT_SIMULATION)
+    
+    try:
+        stopped = scheduler.stop(name)
+    except KeyError:
+        stopped = False
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e),
             'timestamp': datetime.now().isoformat()
         }), 500
+    
+    if not stopped:
+        return jsonify({
+            'success': False,
+            'message': 'Simulation not running',
+            'status': 'inactive'
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'message': 'IoT simulation stopped successfully',
+        'name': name,
+        'status': 'inactive',
+        'timestamp': datetime.now().isoformat()
+    })
 
 @app.route('/api/simulation/status', methods=['GET'])
 def simulation_status():
-    """Get simulation status and statistics"""
-    global simulator, simulation_active
+    """Get simulation status and statistics (?simulation=name, default simulation otherwise)"""
+    simulation = scheduler.get(request.args.get('simulation', DEFAULT_SIMULATION))
     
     status_info = {
-        'simulation_active': simulation_active,
-        'simulator_initialized': simulator is not None,
+        'simulation_active': simulation is not None and simulation.active,
+        'simulator_initialized': simulation is not None,
         'timestamp': datetime.now().isoformat()
     }
     
-    if simulator:
+    if simulation:
         status_info.update({
-            'buildings_monitored': len(simulator.buildings),
-            'buildings': simulator.buildings,
-            'firebase_url': simulator.firebase_url
+            'buildings_monitored': len(simulation.simulator.buildings),
+            'buildings': simulation.simulator.buildings,
+            'firebase_url': simulation.simulator.firebase_url,
+            'stats': simulation.stats()
         })
     
+    status_info['simulations'] = {other.name: other.active for other in scheduler.simulations()}
     return jsonify(status_info)
 
-@app.route('/api/demo/start', methods=['POST'])
-def start_demo():
-    """Start a short demo simulation (30-second intervals for 5 minutes)"""
-    global simulator, simulation_thread, simulation_active
-    
-    if simulation_active:
+@app.route('/api/simulations', methods=['GET'])
+def list_simulations():
+    """Get stats of every named simulation"""
+    simulations = scheduler.stats()
+    return jsonify({
+        'success': True,
+        'simulations': simulations,
+        'active': sum(1 for stats in simulations.values() if stats['active']),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/simulations/<name>', methods=['GET', 'DELETE'])
+def manage_simulation(name):
+    """Get stats of a named simulation, or stop and remove it (DELETE)"""
+    simulation = scheduler.get(name)
+    if simulation is None:
         return jsonify({
             'success': False,
-            'message': 'Simulation already running',
-            'status': 'active'
-        }), 400
+            'error': f"Unknown simulation '{name}'"
+        }), 404
     
-    try:
-        if not simulator:
-            simulator = CampusDataSimulator()
-        
-        # Demo: 30-second intervals for 5 minutes (10 data points)
-        def run_demo():
-            global simulation_active
-            simulation_active = True
-            demo_count = 0
-            max_demo_cycles = 10
-            
-            while simulation_active and demo_count < max_demo_cycles:
-                campus_data = simulator.generate_campus_snapshot()
-                simulator.send_to_firebase(campus_data)
-                demo_count += 1
-                
-                if demo_count < max_demo_cycles:
-                    time.sleep(30)  # 30-second intervals
-            
-            simulation_active = False
-        
-        simulation_thread = threading.Thread(target=run_demo, daemon=True)
-        simulation_thread.start()
-        
+    if request.method == 'DELETE':
+        scheduler.remove(name)
         return jsonify({
             'success': True,
-            'message': 'Demo simulation started (30s intervals, 5 minutes)',
-            'demo_duration': '5 minutes',
-            'interval_seconds': 30,
-            'data_points': 10,
-            'status': 'active'
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e),
+            'message': f"Simulation '{name}' removed",
             'timestamp': datetime.now().isoformat()
-        }), 500
+        })
+    
+    return jsonify({
+        'success': True,
+        'simulation': simulation.stats()
+    })
+
+@app.route('/api/demo/start', methods=['POST'])
+def start_demo():
+    """Start a short demo simulation (30-second intervals for 5 minutes)"""
+    payload, status = start_demo_from_body(request.get_json(silent=True) or {}, scheduler.start)
+    return jsonify(payload), status
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,198 @@
+"""
+EcoVerse IoT Simulation API - async serving mode
+ASGI entry point with the same endpoint contract as app.py
+
+Push streams (/api/stream) and background simulations started through
+/api/simulation/start and /api/demo/start run on the event loop; every other
+endpoint is served by the Flask app in app.py through asgiref's WSGI adapter.
+
+Production launch:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --workers 4
+or
+    python asgi_app.py   (reads PORT and ASGI_WORKERS)
+
+Each worker process has its own simulations, ring buffers and streams. With
+more than one worker, set SIMULATION_AUTOSTART_INTERVAL so every worker runs
+the default simulation from startup (with SIMULATION_SEED set, all workers
+generate the same values), or route control and dashboard traffic to a
+single worker.
+"""
+
+import asyncio
+import json
+import os
+from typing import Dict
+from urllib.parse import parse_qs
+
+# Optional ASGI dependencies - async mode needs asgiref, `python asgi_app.py` needs uvicorn
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError:
+    WsgiToAsgi = None
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+import app as flask_api
+from simulation_scheduler import DEFAULT_SIMULATION
+from snapshot_stream import STREAM_FORMATS
+
+scheduler = flask_api.scheduler
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+
+async def read_json(receive) -> Dict:
+    """Read and decode a JSON request body ({} when empty or invalid)"""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def send_json(send, payload: Dict, status: int = 200):
+    """Send a complete JSON response"""
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())] + CORS_HEADERS
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def wait_for_disconnect(receive):
+    """Return once the client has gone away"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def start_simulation(scope, receive, send):
+    """POST /api/simulation/start, running the simulation as an event-loop task"""
+    payload, status = flask_api.start_from_body(await read_json(receive), scheduler.start_async)
+    await send_json(send, payload, status)
+
+
+async def start_demo(scope, receive, send):
+    """POST /api/demo/start, running the demo as an event-loop task"""
+    payload, status = flask_api.start_demo_from_body(await read_json(receive), scheduler.start_async)
+    await send_json(send, payload, status)
+
+
+async def stream_data(scope, receive, send):
+    """GET /api/stream: live snapshots as SSE or NDJSON, served on the event loop"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    fmt = query.get('format', ['sse'])[0]
+    name = query.get('simulation', [DEFAULT_SIMULATION])[0]
+
+    if fmt not in STREAM_FORMATS:
+        await send_json(send, {
+            'success': False,
+            'error': f"Unknown format '{fmt}', use one of {list(STREAM_FORMATS)}"
+        }, 400)
+        return
+
+    simulation = scheduler.get_or_create(name) if name == DEFAULT_SIMULATION else scheduler.get(name)
+    if simulation is None:
+        await send_json(send, {'success': False, 'error': f"Unknown simulation '{name}'"}, 404)
+        return
+
+    try:
+        subscription = simulation.broadcaster.subscribe(asyncio.get_running_loop())
+    except RuntimeError as e:
+        await send_json(send, {'success': False, 'error': str(e)}, 503)
+        return
+
+    mimetype = b'text/event-stream' if fmt == 'sse' else b'application/x-ndjson'
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', mimetype), (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no')] + CORS_HEADERS
+    })
+
+    chunks = simulation.broadcaster.astream(subscription, fmt, flask_api.STREAM_KEEPALIVE_SECONDS)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        async for chunk in chunks:
+            if disconnected.done():
+                break
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        disconnected.cancel()
+        await chunks.aclose()
+
+
+# Endpoints handled natively on the event loop; everything else goes to Flask
+ASYNC_ROUTES = {
+    ('GET', '/api/stream'): stream_data,
+    ('POST', '/api/simulation/start'): start_simulation,
+    ('POST', '/api/demo/start'): start_demo
+}
+
+
+async def lifespan(receive, send):
+    """Start the autostart simulation on boot and stop all simulations on shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            autostart = os.environ.get('SIMULATION_AUTOSTART_INTERVAL')
+            if autostart:
+                scheduler.start_async(DEFAULT_SIMULATION, interval_seconds=float(autostart))
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await asyncio.gather(*(simulation.stop_async() for simulation in scheduler.simulations()))
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def create_app():
+    """Build the ASGI application around the Flask app"""
+    if WsgiToAsgi is None:
+        raise RuntimeError("Async serving needs asgiref: pip install asgiref uvicorn")
+    wsgi_app = WsgiToAsgi(flask_api.app)
+
+    async def asgi_app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = ASYNC_ROUTES.get((scope['method'], scope['path']))
+        if handler is not None:
+            await handler(scope, receive, send)
+        else:
+            await wsgi_app(scope, receive, send)
+
+    return asgi_app
+
+
+app = create_app()
+
+
+if __name__ == '__main__':
+    if uvicorn is None:
+        raise SystemExit("uvicorn is not installed: pip install uvicorn")
+
+    port = int(os.environ.get('PORT', 5000))
+    workers = int(os.environ.get('ASGI_WORKERS', 1))
+
+    print("🌱 EcoVerse IoT Simulation API Starting (async mode)...")
+    print(f"🚀 Server running on port {port} with {workers} worker(s)")
+
+    uvicorn.run('asgi_app:app', host='0.0.0.0', port=port, workers=workers)
@@ -0,0 +1,147 @@
+"""
+EcoVerse Historical Backfill
+Generates months or years of campus snapshots on a simulated clock
+"""
+
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator
+
+import numpy as np
+
+from campus_simulator import CampusDataSimulator
+
+
+def batch_columns(batch: Dict) -> Dict[str, np.ndarray]:
+    """Flatten a snapshot batch into named columns (nested keys joined with '.')"""
+    columns = {
+        'timestamps': batch['timestamps'],
+        'buildings': np.array(batch['buildings']),
+        'electricity_kwh': batch['electricity_kwh'],
+        'water_liters': batch['water_liters'],
+        'waste_kg': batch['waste_kg']
+    }
+    for group in ('campus_air_quality', 'total_metrics'):
+        for key, values in batch[group].items():
+            columns[f'{group}.{key}'] = values
+    return columns
+
+
+def columns_to_json(columns: Dict[str, np.ndarray]) -> Dict:
+    """JSON-serializable form of batch_columns output (ISO timestamps, nested lists)"""
+    encoded = {key: values.tolist() for key, values in columns.items()}
+    encoded['timestamps'] = [timestamp.isoformat()
+                             for timestamp in columns['timestamps'].astype('datetime64[us]').tolist()]
+    return encoded
+
+
+def batch_record_dtype(batch: Dict) -> np.dtype:
+    """Structured dtype with one record per snapshot of a batch (see batch_records)"""
+    n_buildings = len(batch['buildings'])
+    fields = [('timestamp', 'datetime64[us]')]
+    fields += [(key, 'f8', (n_buildings,)) for key in ('electricity_kwh', 'water_liters', 'waste_kg')]
+    fields += [(f'{group}.{key}', 'f8') for group in ('campus_air_quality', 'total_metrics')
+               for key in batch[group]]
+    return np.dtype(fields)
+
+
+def batch_records(batch: Dict, dtype: np.dtype = None) -> np.ndarray:
+    """Pack a batch into a structured array, one record per snapshot"""
+    dtype = dtype or batch_record_dtype(batch)
+    records = np.empty(len(batch['timestamps']), dtype=dtype)
+    for key, values in batch_columns(batch).items():
+        if key == 'timestamps':
+            records['timestamp'] = values
+        elif key != 'buildings':
+            records[key] = values
+    return records
+
+
+class HistoricalBackfill:
+    """
+    Streams historical snapshots for a date range.
+
+    Snapshots are generated in chunks of at most `chunk_size` with the
+    vectorized simulator, so memory stays bounded however long the range is.
+    """
+
+    def __init__(self, simulator: CampusDataSimulator = None, chunk_size: int = 10000):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.simulator = simulator or CampusDataSimulator()
+        self.chunk_size = chunk_size
+
+    def count_snapshots(self, start: datetime, end: datetime, interval_seconds: int) -> int:
+        """Number of snapshots in [start, end) at the given sampling interval"""
+        if interval_seconds <= 0:
+            raise ValueError("interval_seconds must be positive")
+        return max(0, -(-int((end - start).total_seconds()) // interval_seconds))
+
+    def iter_batches(self, start: datetime, end: datetime, interval_seconds: int = 300) -> Iterator[Dict]:
+        """Yield snapshot batches covering [start, end)"""
+        total = self.count_snapshots(start, end, interval_seconds)
+        step = timedelta(seconds=interval_seconds)
+
+        for offset in range(0, total, self.chunk_size):
+            n = min(self.chunk_size, total - offset)
+            yield self.simulator.generate_campus_snapshots(n, start + offset * step, step)
+
+    def iter_snapshots(self, start: datetime, end: datetime, interval_seconds: int = 300) -> Iterator[Dict]:
+        """Yield individual snapshot dicts covering [start, end)"""
+        for batch in self.iter_batches(start, end, interval_seconds):
+            yield from self.simulator.snapshots_from_batch(batch)
+
+    def write_ndjson(self, path: str, start: datetime, end: datetime, interval_seconds: int = 300) -> int:
+        """Write snapshots as newline-delimited JSON (gzipped if path ends in .gz)"""
+        opener = gzip.open if path.endswith('.gz') else open
+        written = 0
+
+        with opener(path, 'wt', encoding='utf-8') as f:
+            for batch in self.iter_batches(start, end, interval_seconds):
+                lines = [json.dumps(snapshot, separators=(',', ':'))
+                         for snapshot in self.simulator.snapshots_from_batch(batch)]
+                f.write('\n'.join(lines) + '\n')
+                written += len(lines)
+
+        return written
+
+    def write_columnar(self, directory: str, start: datetime, end: datetime, interval_seconds: int = 300) -> int:
+        """Write one compressed .npz column file per chunk into `directory`"""
+        os.makedirs(directory, exist_ok=True)
+        written = 0
+
+        for part, batch in enumerate(self.iter_batches(start, end, interval_seconds)):
+            np.savez_compressed(os.path.join(directory, f'part-{part:05d}.npz'), **batch_columns(batch))
+            written += len(batch['timestamps'])
+
+        return written
+
+
+def main():
+    """Command line entry point for historical backfill"""
+    parser = argparse.ArgumentParser(description='Generate historical EcoVerse campus data')
+    parser.add_argument('--start', required=True, type=datetime.fromisoformat, help='First timestamp (ISO format)')
+    parser.add_argument('--end', required=True, type=datetime.fromisoformat, help='End timestamp, exclusive (ISO format)')
+    parser.add_argument('--interval', type=int, default=300, help='Sampling interval in seconds (default 300)')
+    parser.add_argument('--format', choices=['ndjson', 'npz'], default='ndjson', help='Output format')
+    parser.add_argument('--output', required=True, help='NDJSON file (.gz allowed) or npz output directory')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Snapshots generated per chunk')
+    args = parser.parse_args()
+
+    backfill = HistoricalBackfill(chunk_size=args.chunk_size)
+    total = backfill.count_snapshots(args.start, args.end, args.interval)
+    print(f"⏪ Backfilling {total} snapshots from {args.start} to {args.end}")
+
+    if args.format == 'ndjson':
+        written = backfill.write_ndjson(args.output, args.start, args.end, args.interval)
+    else:
+        written = backfill.write_columnar(args.output, args.start, args.end, args.interval)
+
+    print(f"✅ Wrote {written} snapshots to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
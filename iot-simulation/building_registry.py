@@ -0,0 +1,222 @@
+"""
+EcoVerse Building Registry
+Loadable registry of campus buildings, their base usage profiles and sensors
+"""
+
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+# Optional YAML support - JSON registries work without it
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+METRICS = ('electricity', 'water', 'waste')
+
+DEFAULT_CAMPUS = 'Main'
+
+# Base consumption patterns (hourly averages) of the reference campus
+DEFAULT_BUILDING_PROFILES = {
+    'Engineering': {'electricity': 800, 'water': 1200, 'waste': 50},
+    'Science': {'electricity': 600, 'water': 800, 'waste': 30},
+    'Library': {'electricity': 300, 'water': 200, 'waste': 10},
+    'Dormitory_A': {'electricity': 400, 'water': 2000, 'waste': 80},
+    'Dormitory_B': {'electricity': 420, 'water': 2100, 'waste': 85},
+    'Admin': {'electricity': 250, 'water': 300, 'waste': 15},
+    'Cafeteria': {'electricity': 500, 'water': 1500, 'waste': 120}
+}
+
+# Building types with their own default usage profile (see usage_profiles.TYPE_PROFILES),
+# inferred from the building name when the registry does not give one
+DEFAULT_BUILDING_TYPE = 'general'
+BUILDING_TYPE_KEYWORDS = {
+    'academic': ('engineering', 'science', 'lecture', 'classroom', 'lab'),
+    'library': ('library',),
+    'residential': ('dorm', 'residence', 'housing'),
+    'office': ('admin', 'office'),
+    'dining': ('cafeteria', 'dining', 'canteen')
+}
+
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'buildings.json')
+
+
+def infer_building_type(name: str) -> str:
+    """Building type whose keywords appear in the name, else the general type"""
+    lowered = name.lower()
+    for building_type, keywords in BUILDING_TYPE_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return building_type
+    return DEFAULT_BUILDING_TYPE
+
+
+def resolve_registry_path(path: str) -> str:
+    """Registry path with relative paths taken from this directory, not the working directory"""
+    return os.path.join(os.path.dirname(DEFAULT_REGISTRY_PATH), os.path.expanduser(path))
+
+
+class BuildingRegistry:
+    """
+    Buildings and sensors of one or more campuses.
+
+    Profiles are kept as a (buildings, metrics) array in METRICS order and
+    sensors as parallel index arrays, so generators can work on whole
+    columns instead of per-building dict lookups. Each building also has a
+    type selecting its default usage profile shape.
+    """
+
+    def __init__(self, names: List[str], profiles, campuses: List[str] = None, sensors: List[Dict] = None,
+                 types: List[str] = None):
+        self.names = list(names)
+        self.profiles = np.asarray(profiles, dtype=float).reshape(len(self.names), len(METRICS))
+        self.campuses = np.array(campuses if campuses is not None else [DEFAULT_CAMPUS] * len(self.names))
+        self.types = np.array(types if types is not None else [infer_building_type(name) for name in self.names],
+                              dtype=object)
+
+        if len(set(self.names)) != len(self.names):
+            raise ValueError("Building names must be unique")
+        if len(self.campuses) != len(self.names):
+            raise ValueError("Every building needs exactly one campus")
+        if len(self.types) != len(self.names):
+            raise ValueError("Every building needs exactly one type")
+
+        if sensors is None:
+            # One meter per building and metric
+            sensors = [{'id': f'{name}-{metric}', 'building': name, 'metric': metric}
+                       for name in self.names for metric in METRICS]
+
+        index = {name: i for i, name in enumerate(self.names)}
+        self.sensor_ids = [sensor['id'] for sensor in sensors]
+        self.sensor_building = np.array([index[sensor['building']] for sensor in sensors], dtype=np.int64)
+        self.sensor_metric = np.array([METRICS.index(sensor['metric']) for sensor in sensors], dtype=np.int64)
+
+        # Fraction of the building's metric usage measured by each sensor
+        meters = self.sensor_building * len(METRICS) + self.sensor_metric
+        self.sensor_share = 1.0 / np.bincount(meters, minlength=len(self.names) * len(METRICS))[meters]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def default(cls) -> 'BuildingRegistry':
+        """Registry from buildings.json, or the built-in reference campus"""
+        path = resolve_registry_path(os.getenv('BUILDING_REGISTRY_PATH', DEFAULT_REGISTRY_PATH))
+        if os.path.exists(path):
+            return cls.from_file(path)
+        return cls.from_dict({'buildings': [dict(name=name, **profile)
+                                            for name, profile in DEFAULT_BUILDING_PROFILES.items()]})
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> 'BuildingRegistry':
+        """
+        Build a registry from a config mapping.
+
+        Expected layout::
+
+            {"buildings": [{"name": "Library", "campus": "Main", "type": "library",
+                            "electricity": 300, "water": 200, "waste": 10,
+                            "sensors": [{"id": "lib-e1", "metric": "electricity"}]}]}
+
+        `campus` defaults to "Main", `type` to the type inferred from the
+        name and `sensors` to one meter per metric.
+        """
+        names, profiles, campuses, types, sensors = [], [], [], [], []
+        explicit_sensors = False
+
+        for building in config.get('buildings', []):
+            name = building['name']
+            names.append(name)
+            profiles.append([float(building[metric]) for metric in METRICS])
+            campuses.append(building.get('campus', DEFAULT_CAMPUS))
+            types.append(building.get('type') or infer_building_type(name))
+
+            if 'sensors' in building:
+                explicit_sensors = True
+                sensors.extend(dict(sensor, building=name) for sensor in building['sensors'])
+            else:
+                sensors.extend({'id': f'{name}-{metric}', 'building': name, 'metric': metric}
+                               for metric in METRICS)
+
+        if not names:
+            raise ValueError("Building registry config has no buildings")
+
+        return cls(names, profiles, campuses, sensors if explicit_sensors else None, types)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'BuildingRegistry':
+        """Load a registry from a JSON or YAML file"""
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith(('.yaml', '.yml')):
+                if yaml is None:
+                    raise ImportError("PyYAML is required to load YAML building registries")
+                config = yaml.safe_load(f)
+            else:
+                config = json.load(f)
+
+        return cls.from_dict(config)
+
+    @classmethod
+    def synthetic(cls, n_buildings: int, n_campuses: int = 1, sensors_per_metric: int = 1,
+                  seed: int = None) -> 'BuildingRegistry':
+        """Generate a registry of n_buildings modelled on the reference campus profiles"""
+        rng = np.random.default_rng(seed)
+        templates = np.array([[profile[metric] for metric in METRICS]
+                              for profile in DEFAULT_BUILDING_PROFILES.values()], dtype=float)
+        kinds = list(DEFAULT_BUILDING_PROFILES)
+
+        choice = rng.integers(0, len(templates), n_buildings)
+        profiles = np.round(templates[choice] * rng.uniform(0.7, 1.3, (n_buildings, len(METRICS))), 1)
+        campuses = [f'Campus_{i % n_campuses + 1}' for i in range(n_buildings)]
+        names = [f'{campuses[i]}_{kinds[choice[i]]}_{i:05d}' for i in range(n_buildings)]
+
+        sensors = [{'id': f'{name}-{metric}-{k}', 'building': name, 'metric': metric}
+                   for name in names for metric in METRICS for k in range(sensors_per_metric)]
+
+        return cls(names, profiles, campuses, sensors)
+
+    def subset(self, campus: str) -> 'BuildingRegistry':
+        """Registry restricted to the buildings of one campus"""
+        keep = np.flatnonzero(self.campuses == campus)
+        if len(keep) == 0:
+            raise ValueError(f"Unknown campus: {campus}")
+        return self.select(keep)
+
+    def select(self, indices) -> 'BuildingRegistry':
+        """Registry restricted to the buildings at the given indices"""
+        indices = np.asarray(indices, dtype=np.int64)
+        keep = np.zeros(len(self.names), dtype=bool)
+        keep[indices] = True
+        sensor_mask = keep[self.sensor_building]
+
+        sensors = [{'id': self.sensor_ids[s], 'building': self.names[self.sensor_building[s]],
+                    'metric': METRICS[self.sensor_metric[s]]}
+                   for s in np.flatnonzero(sensor_mask)]
+
+        return BuildingRegistry([self.names[i] for i in indices], self.profiles[indices],
+                                self.campuses[indices].tolist(), sensors, self.types[indices].tolist())
+
+    def campus_names(self) -> List[str]:
+        """Distinct campus names in registry order"""
+        return list(dict.fromkeys(self.campuses.tolist()))
+
+    def profile_dict(self) -> Dict[str, Dict[str, float]]:
+        """Profiles as {building: {metric: base_usage}}"""
+        return {name: dict(zip(METRICS, row)) for name, row in zip(self.names, self.profiles.tolist())}
+
+    def to_dict(self) -> Dict:
+        """Serializable config accepted by from_dict"""
+        sensors_by_building = {name: [] for name in self.names}
+        for sensor_id, b, m in zip(self.sensor_ids, self.sensor_building.tolist(), self.sensor_metric.tolist()):
+            sensors_by_building[self.names[b]].append({'id': sensor_id, 'metric': METRICS[m]})
+
+        return {
+            'buildings': [
+                dict(name=name, campus=campus, type=building_type, sensors=sensors_by_building[name],
+                     **dict(zip(METRICS, row)))
+                for name, campus, building_type, row in zip(self.names, self.campuses.tolist(), self.types.tolist(),
+                                                            self.profiles.tolist())
+            ]
+        }
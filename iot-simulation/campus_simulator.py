@@ -2,11 +2,17 @@ import random
 import time
 import json
 import requests
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import numpy as np
 from typing import Dict, List
 import threading
 import os
+import zlib
+from building_registry import BuildingRegistry, METRICS
+from fault_injection import FAULT_TYPES
+from firebase_writer import FirebaseBatchWriter
+from snapshot_log import SnapshotRecorder
+from usage_profiles import UsageProfiles, PROFILE_JITTER, SEASONAL_JITTER
 
 # Optional dotenv import - graceful fallback if not available
 try:
@@ -18,168 +24,409 @@ except ImportError:
     def load_dotenv():
         pass
 
+# Uniform draws per snapshot for each building stream and for the campus stream.
+# Multiples of 4 keep every snapshot on whole Philox blocks, so a stream can be
+# jumped to any snapshot index with advance().
+BUILDING_DRAWS = 8
+CAMPUS_DRAWS = 8
+
 class CampusDataSimulator:
     """
     EcoVerse IoT Data Simulator
     Generates realistic campus resource usage data
     """
     
-    def __init__(self):
+    def __init__(self, registry: BuildingRegistry = None, campus: str = None,
+                 firebase_writer: FirebaseBatchWriter = None, seed: int = None,
+                 usage_profiles: UsageProfiles = None, recorder: SnapshotRecorder = None):
         self.firebase_url = os.getenv('FIREBASE_URL', 'https://ecoverse-default-rtdb.firebaseio.com')
-        self.buildings = ['Engineering', 'Science', 'Library', 'Dormitory_A', 'Dormitory_B', 'Admin', 'Cafeteria']
         self.running = False
+        self.stop_event = threading.Event()  # set by stop(), wakes the simulation loop
+        self.snapshots_sent = 0
+        self.send_failures = 0
         
-        # Base consumption patterns (hourly averages)
-        self.building_profiles = {
-            'Engineering': {'electricity': 800, 'water': 1200, 'waste': 50},
-            'Science': {'electricity': 600, 'water': 800, 'waste': 30},
-            'Library': {'electricity': 300, 'water': 200, 'waste': 10},
-            'Dormitory_A': {'electricity': 400, 'water': 2000, 'waste': 80},
-            'Dormitory_B': {'electricity': 420, 'water': 2100, 'waste': 85},
-            'Admin': {'electricity': 250, 'water': 300, 'waste': 15},
-            'Cafeteria': {'electricity': 500, 'water': 1500, 'waste': 120}
-        }
+        # Seeded random streams: identical seeds give identical output
+        if seed is None and os.getenv('SIMULATION_SEED'):
+            seed = int(os.getenv('SIMULATION_SEED'))
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.random = random.Random(int(self.seed_sequence.generate_state(1)[0]))
+        self.position = 0  # index of the next batch snapshot in the seeded streams
+        self._streams = None
+        self._streams_position = None
+        
+        # Sinks are passed in (see from_env); without a writer snapshots are only printed
+        self.firebase_writer = firebase_writer
+        
+        # Callbacks receiving every emitted snapshot (recorders, buffers, streams)
+        self.listeners = []
+        self.recorder = recorder
+        if recorder is not None:
+            self.add_listener(recorder)
+        
+        # Buildings, base consumption patterns (hourly averages) and sensors
+        self.registry = registry or BuildingRegistry.default()
+        if campus:
+            self.registry = self.registry.subset(campus)
+        self.buildings = self.registry.names
+        self.building_profiles = self.registry.profile_dict()
+        
+        # Diurnal/weekly/seasonal usage factor tables, precomputed once
+        if usage_profiles is None:
+            if os.getenv('USAGE_PROFILE_PATH'):
+                usage_profiles = UsageProfiles.load(os.getenv('USAGE_PROFILE_PATH'))
+            else:
+                usage_profiles = UsageProfiles.default(int(os.getenv('USAGE_PROFILE_RESOLUTION', '60')))
+        self.usage_profiles = usage_profiles
+        self.profile_rows = usage_profiles.rows_for(self.buildings, self.registry.types)
+        self.profile_row_by_name = dict(zip(self.buildings, self.profile_rows.tolist()))  # for per-reading lookups
+        
+        # Optional FaultInjector adding labelled faults to generated data
+        self.fault_injector = None
     
-    def get_time_factor(self) -> float:
-        """Generate time-based usage variation (24-hour cycle)"""
-        hour = datetime.now().hour
+    @classmethod
+    def from_env(cls, *args, firebase: bool = True, record: bool = True, **kwargs) -> 'CampusDataSimulator':
+        """
+        Simulator with the sinks configured in the environment, for long-running
+        services: the batched Firebase writer when FIREBASE_WRITE_ENABLED is
+        true (and `firebase`), and a snapshot recorder at SIMULATION_RECORD_PATH
+        (when set and `record`). Other arguments go to the constructor.
+        """
+        if firebase and os.getenv('FIREBASE_WRITE_ENABLED', 'false').lower() == 'true':
+            kwargs['firebase_writer'] = FirebaseBatchWriter(
+                os.getenv('FIREBASE_URL', 'https://ecoverse-default-rtdb.firebaseio.com'),
+                batch_size=int(os.getenv('FIREBASE_BATCH_SIZE', '50')),
+                flush_interval=float(os.getenv('FIREBASE_FLUSH_INTERVAL', '2.0')),
+                max_buffer=int(os.getenv('FIREBASE_MAX_BUFFER', '1000')),
+                auth_token=os.getenv('FIREBASE_AUTH_TOKEN')
+            )
+        if record and os.getenv('SIMULATION_RECORD_PATH'):
+            kwargs['recorder'] = SnapshotRecorder(os.getenv('SIMULATION_RECORD_PATH'))
+        return cls(*args, **kwargs)
+    
+    def _stream_key(self, name: str) -> np.ndarray:
+        """Philox key of a named stream, stable across processes and registry subsets"""
+        sequence = np.random.SeedSequence(self.seed_sequence.entropy, spawn_key=(zlib.crc32(name.encode('utf-8')),))
+        return sequence.generate_state(2, np.uint64)
+    
+    def _open_stream(self, name: str, draws: int, position: int) -> np.random.Generator:
+        """Generator for a named stream, positioned at snapshot index `position`"""
+        bit_generator = np.random.Philox(key=self._stream_key(name))
+        bit_generator.advance(position * draws // 4)
+        return np.random.Generator(bit_generator)
+    
+    def _draw_uniforms(self, n: int, position: int):
+        """
+        Uniforms for n snapshots starting at `position`.
         
-        # Peak hours: 8-18, Low hours: 22-6
-        if 8 <= hour <= 18:
-            return random.uniform(0.8, 1.3)  # Peak usage
-        elif 19 <= hour <= 21:
-            return random.uniform(0.6, 0.9)  # Evening
-        else:
-            return random.uniform(0.3, 0.6)  # Night
-    
-    def get_seasonal_factor(self) -> float:
-        """Generate seasonal variation"""
-        month = datetime.now().month
-        
-        # Summer months need more cooling
-        if month in [6, 7, 8]:
-            return random.uniform(1.1, 1.4)
-        # Winter months need more heating
-        elif month in [12, 1, 2]:
-            return random.uniform(1.0, 1.3)
-        else:
-            return random.uniform(0.9, 1.1)
+        Each building has its own stream (keyed by name) and air quality has
+        a campus stream, so the values for a snapshot index do not depend on
+        batch sizes or on how buildings are split across processes.
+        
+        Returns:
+            (building_uniforms of shape (n, buildings, BUILDING_DRAWS),
+             campus_uniforms of shape (n, CAMPUS_DRAWS))
+        """
+        if self._streams is None or self._streams_position != position:
+            self._streams = ([self._open_stream(name, BUILDING_DRAWS, position) for name in self.buildings],
+                             self._open_stream('__campus__', CAMPUS_DRAWS, position))
+        building_streams, campus_stream = self._streams
+        
+        building_uniforms = np.empty((n, len(building_streams), BUILDING_DRAWS))
+        for b, stream in enumerate(building_streams):
+            building_uniforms[:, b, :] = stream.random((n, BUILDING_DRAWS))
+        campus_uniforms = campus_stream.random((n, CAMPUS_DRAWS))
+        
+        self._streams_position = position + n
+        return building_uniforms, campus_uniforms
     
-    def generate_electricity_data(self, building: str) -> float:
+    def get_usage_factor(self, building: str, metric: str, when: datetime = None) -> float:
+        """Usage multiplier of a building at `when`: profile table value plus noise"""
+        when = when or datetime.now()
+        row = self.profile_row_by_name[building]
+        factor = self.usage_profiles.factor(row, metric, when)
+        factor *= 1 + self.random.uniform(-PROFILE_JITTER, PROFILE_JITTER)
+        if metric == 'electricity':
+            factor *= 1 + self.random.uniform(-SEASONAL_JITTER, SEASONAL_JITTER)
+        return factor
+    
+    def generate_electricity_data(self, building: str, when: datetime = None) -> float:
         """Generate realistic electricity consumption (kWh)"""
         base = self.building_profiles[building]['electricity']
-        time_factor = self.get_time_factor()
-        seasonal_factor = self.get_seasonal_factor()
-        random_factor = random.uniform(0.85, 1.15)
+        usage_factor = self.get_usage_factor(building, 'electricity', when)
+        random_factor = self.random.uniform(0.85, 1.15)
         
-        consumption = base * time_factor * seasonal_factor * random_factor
+        consumption = base * usage_factor * random_factor
         return round(consumption, 2)
     
-    def generate_water_data(self, building: str) -> float:
+    def generate_water_data(self, building: str, when: datetime = None) -> float:
         """Generate realistic water consumption (Liters)"""
         base = self.building_profiles[building]['water']
-        time_factor = self.get_time_factor()
-        random_factor = random.uniform(0.8, 1.2)
+        usage_factor = self.get_usage_factor(building, 'water', when)
+        random_factor = self.random.uniform(0.8, 1.2)
         
         # Water usage less affected by seasons but more by occupancy
-        consumption = base * time_factor * random_factor
+        consumption = base * usage_factor * random_factor
         return round(consumption, 2)
     
-    def generate_waste_data(self, building: str) -> float:
+    def generate_waste_data(self, building: str, when: datetime = None) -> float:
         """Generate realistic waste production (kg)"""
         base = self.building_profiles[building]['waste']
-        time_factor = self.get_time_factor()
-        random_factor = random.uniform(0.7, 1.3)
+        usage_factor = self.get_usage_factor(building, 'waste', when)
+        random_factor = self.random.uniform(0.7, 1.3)
         
-        waste = base * time_factor * random_factor
+        waste = base * usage_factor * random_factor
         return round(waste, 2)
     
-    def generate_air_quality_data(self) -> Dict:
+    def generate_sensor_reading(self, sensor: int, when: datetime = None) -> Dict:
+        """Generate one reading of a registry sensor (its share of the building's usage)"""
+        when = when or datetime.now()
+        building = self.buildings[self.registry.sensor_building[sensor]]
+        metric = METRICS[self.registry.sensor_metric[sensor]]
+        
+        if metric == 'electricity':
+            value = self.generate_electricity_data(building, when)
+        elif metric == 'water':
+            value = self.generate_water_data(building, when)
+        else:
+            value = self.generate_waste_data(building, when)
+        
+        return {
+            'sensor_id': self.registry.sensor_ids[sensor],
+            'building': building,
+            'metric': metric,
+            'value': round(value * float(self.registry.sensor_share[sensor]), 3),
+            'timestamp': when.isoformat()
+        }
+    
+    def generate_air_quality_data(self, when: datetime = None) -> Dict:
         """Generate air quality metrics (AQI, pollutants)"""
         # Simulate realistic AQI values
-        base_aqi = random.uniform(50, 150)
+        base_aqi = self.random.uniform(50, 150)
         
         # Add some correlation with time of day (higher during rush hours)
-        hour = datetime.now().hour
+        hour = (when or datetime.now()).hour
         if hour in [7, 8, 9, 17, 18, 19]:  # Rush hours
-            base_aqi += random.uniform(10, 30)
+            base_aqi += self.random.uniform(10, 30)
         
         aqi = min(300, max(0, base_aqi))
         
         return {
             'aqi': round(aqi, 1),
-            'pm25': round(aqi * 0.5 + random.uniform(-10, 10), 1),
-            'pm10': round(aqi * 0.8 + random.uniform(-15, 15), 1),
-            'co2': round(400 + random.uniform(-50, 100), 1),
-            'temperature': round(20 + random.uniform(-5, 15), 1),
-            'humidity': round(50 + random.uniform(-20, 30), 1)
+            'pm25': round(aqi * 0.5 + self.random.uniform(-10, 10), 1),
+            'pm10': round(aqi * 0.8 + self.random.uniform(-15, 15), 1),
+            'co2': round(400 + self.random.uniform(-50, 100), 1),
+            'temperature': round(20 + self.random.uniform(-5, 15), 1),
+            'humidity': round(50 + self.random.uniform(-20, 30), 1)
         }
     
     def send_to_firebase(self, data: Dict) -> bool:
         """Send data to Firebase Realtime Database"""
         try:
-            # For now, we'll just print the data (Firebase integration can be added)
-            print(f"📊 Sending data to Firebase: {json.dumps(data, indent=2)}")
+            if self.firebase_writer:
+                # Buffered; blocks while the writer is saturated (backpressure)
+                return self.firebase_writer.write(data)
             
-            # Uncomment when Firebase is configured:
-            # response = requests.put(f"{self.firebase_url}/sensor_data/{data['timestamp']}.json", 
-            #                        json=data)
-            # return response.status_code == 200
+            # No writer configured, just print the data
+            print(f"📊 Sending data to Firebase: {json.dumps(data, indent=2)}")
             return True
             
         except Exception as e:
             print(f"❌ Error sending data to Firebase: {e}")
             return False
     
-    def generate_campus_snapshot(self) -> Dict:
-        """Generate complete campus data snapshot"""
-        timestamp = datetime.now().isoformat()
+    def generate_campus_snapshots(self, n: int, start: datetime = None,
+                                  step=timedelta(minutes=5), position: int = None) -> Dict:
+        """
+        Generate n campus snapshots for all buildings at once.
+        
+        Usage factors are looked up in the precomputed profile tables for
+        all timestamps at once; only the noise is drawn per reading.
+        
+        Args:
+            n: Number of snapshots
+            start: Timestamp of the first snapshot (defaults to now)
+            step: Spacing between snapshots (timedelta or seconds)
+            position: Index of the first snapshot in the seeded streams
+                (defaults to continuing after the previous batch)
+            
+        Returns:
+            Dict of arrays: 'timestamps' (n,), per-building metrics (n, buildings),
+            'campus_air_quality' and 'total_metrics' columns of shape (n,)
+        """
+        if start is None:
+            start = datetime.now()
+        if start.tzinfo is not None:
+            start = start.astimezone(timezone.utc).replace(tzinfo=None)
+        if not isinstance(step, timedelta):
+            step = timedelta(seconds=step)
+        
+        timestamps = np.datetime64(start, 'us') + np.arange(n) * np.timedelta64(step)
+        hours = (timestamps - timestamps.astype('datetime64[D]')).astype('timedelta64[h]').astype(int)
+        
+        if position is None:
+            position = self.position
+        u, c = self._draw_uniforms(n, position)
+        self.position = position + n
+        base = self.registry.profiles
+        
+        factors = self.usage_profiles.lookup(timestamps, self.profile_rows)
+        
+        # Every metric gets its own profile noise, as in the per-building generators
+        electricity = (base[:, 0] * factors[..., 0]
+                       * (1 + PROFILE_JITTER * (2 * u[..., 0] - 1))
+                       * (1 + SEASONAL_JITTER * (2 * u[..., 1] - 1))
+                       * (0.85 + 0.3 * u[..., 2]))
+        water = (base[:, 1] * factors[..., 1]
+                 * (1 + PROFILE_JITTER * (2 * u[..., 3] - 1))
+                 * (0.8 + 0.4 * u[..., 4]))
+        waste = (base[:, 2] * factors[..., 2]
+                 * (1 + PROFILE_JITTER * (2 * u[..., 5] - 1))
+                 * (0.7 + 0.6 * u[..., 6]))
+        
+        electricity = np.round(electricity, 2)
+        water = np.round(water, 2)
+        waste = np.round(waste, 2)
+        
+        # Campus air quality, with the rush-hour bump
+        rush = np.isin(hours, [7, 8, 9, 17, 18, 19])
+        aqi = 50 + 100 * c[:, 0] + np.where(rush, 10 + 20 * c[:, 1], 0.0)
+        aqi = np.clip(aqi, 0, 300)
         
-        campus_data = {
-            'timestamp': timestamp,
-            'buildings': {},
-            'campus_air_quality': self.generate_air_quality_data(),
+        batch = {
+            'timestamps': timestamps,
+            'position': position,
+            'buildings': list(self.buildings),
+            'electricity_kwh': electricity,
+            'water_liters': water,
+            'waste_kg': waste,
+            'campus_air_quality': {
+                'aqi': np.round(aqi, 1),
+                'pm25': np.round(aqi * 0.5 - 10 + 20 * c[:, 2], 1),
+                'pm10': np.round(aqi * 0.8 - 15 + 30 * c[:, 3], 1),
+                'co2': np.round(350 + 150 * c[:, 4], 1),
+                'temperature': np.round(15 + 20 * c[:, 5], 1),
+                'humidity': np.round(30 + 50 * c[:, 6], 1)
+            },
             'total_metrics': {
-                'electricity': 0,
-                'water': 0,
-                'waste': 0
+                'electricity': np.round(electricity.sum(axis=1), 2),
+                'water': np.round(water.sum(axis=1), 2),
+                'waste': np.round(waste.sum(axis=1), 2)
             }
         }
         
-        # Generate data for each building
-        for building in self.buildings:
-            building_data = {
-                'electricity_kwh': self.generate_electricity_data(building),
-                'water_liters': self.generate_water_data(building),
-                'waste_kg': self.generate_waste_data(building)
+        if self.fault_injector:
+            self.fault_injector.apply(batch, base)
+        
+        return batch
+    
+    def snapshots_from_batch(self, batch: Dict):
+        """Yield snapshot dicts (generate_campus_snapshot format) from a batch"""
+        buildings = batch['buildings']
+        timestamps = batch['timestamps'].astype('datetime64[us]').tolist()
+        labelled = 'fault_codes' in batch
+        
+        def column(values):
+            # Readings lost to an injected dropout become JSON nulls
+            if labelled:
+                values = np.where(np.isnan(values), None, values)
+            return values.tolist()
+        
+        electricity = column(batch['electricity_kwh'])
+        water = column(batch['water_liters'])
+        waste = column(batch['waste_kg'])
+        air_quality = {key: values.tolist() for key, values in batch['campus_air_quality'].items()}
+        totals = {key: values.tolist() for key, values in batch['total_metrics'].items()}
+        
+        for i, timestamp in enumerate(timestamps):
+            snapshot = {
+                'timestamp': timestamp.isoformat(),
+                'buildings': {
+                    building: {
+                        'electricity_kwh': electricity[i][j],
+                        'water_liters': water[i][j],
+                        'waste_kg': waste[i][j]
+                    }
+                    for j, building in enumerate(buildings)
+                },
+                'campus_air_quality': {key: values[i] for key, values in air_quality.items()},
+                'total_metrics': {key: values[i] for key, values in totals.items()}
             }
             
-            campus_data['buildings'][building] = building_data
+            if labelled:
+                # Ground-truth labels of injected faults
+                snapshot['faults'] = []
+                for j in np.flatnonzero(batch['fault_codes'][i]):
+                    fault = FAULT_TYPES[batch['fault_codes'][i, j] - 1]
+                    metrics = [metric for m, metric in enumerate(METRICS) if batch['fault_metrics'][i, j, m]]
+                    snapshot['buildings'][buildings[j]]['fault'] = fault
+                    snapshot['faults'].append({'building': buildings[j], 'type': fault, 'metrics': metrics})
             
-            # Add to totals
-            campus_data['total_metrics']['electricity'] += building_data['electricity_kwh']
-            campus_data['total_metrics']['water'] += building_data['water_liters']
-            campus_data['total_metrics']['waste'] += building_data['waste_kg']
+            yield snapshot
+    
+    def add_listener(self, listener):
+        """Register a callback invoked with every emitted snapshot"""
+        self.listeners.append(listener)
+    
+    def remove_listener(self, listener):
+        """Unregister a snapshot listener"""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+    
+    def emit_snapshot(self, data: Dict) -> bool:
+        """Send a snapshot to Firebase and hand it to all listeners"""
+        success = self.send_to_firebase(data)
+        if success:
+            self.snapshots_sent += 1
+        else:
+            self.send_failures += 1
         
-        # Round totals
-        for metric in campus_data['total_metrics']:
-            campus_data['total_metrics'][metric] = round(campus_data['total_metrics'][metric], 2)
+        for listener in list(self.listeners):
+            try:
+                listener(data)
+            except Exception as e:
+                print(f"❌ Error in snapshot listener: {e}")
+        
+        return success
+    
+    def generate_campus_snapshot(self, when: datetime = None) -> Dict:
+        """Generate complete campus data snapshot (at the simulated time `when`, default now)"""
+        when = when or datetime.now()
+        
+        # Single-row batch keeps the cost vectorized in the number of buildings
+        batch = self.generate_campus_snapshots(1, when)
+        campus_data = next(self.snapshots_from_batch(batch))
+        campus_data['timestamp'] = when.isoformat()
         
         return campus_data
     
-    def simulate_realtime_data(self, interval_seconds: int = 300):
-        """Start real-time data simulation (every 5 minutes by default)"""
+    def simulate_realtime_data(self, interval_seconds: int = 300, stop_event: threading.Event = None,
+                               max_snapshots: int = None) -> int:
+        """
+        Start real-time data simulation (every 5 minutes by default).
+        
+        Runs until `stop_event` (default: the simulator's own, set by stop())
+        is set or max_snapshots have been emitted. Waits on the event between
+        snapshots, so stopping takes effect immediately.
+        
+        Returns:
+            Number of snapshots emitted
+        """
         print(f"🚀 Starting EcoVerse IoT Simulation...")
         print(f"📡 Generating data every {interval_seconds} seconds")
         print(f"🏢 Monitoring buildings: {', '.join(self.buildings)}")
         
+        if stop_event is None:
+            stop_event = self.stop_event
+            stop_event.clear()
         self.running = True
+        emitted = 0
         
-        while self.running:
+        while not stop_event.is_set():
             try:
                 # Generate and send data
                 campus_data = self.generate_campus_snapshot()
-                success = self.send_to_firebase(campus_data)
+                success = self.emit_snapshot(campus_data)
+                emitted += 1
                 
                 if success:
                     print(f"✅ Data sent successfully at {campus_data['timestamp']}")
@@ -192,24 +439,34 @@ class CampusDataSimulator:
                 
                 print("-" * 50)
                 
-                # Wait for next interval
-                time.sleep(interval_seconds)
+                if max_snapshots is not None and emitted >= max_snapshots:
+                    break
+                
+                # Wait for next interval (returns early when stopped)
+                stop_event.wait(interval_seconds)
                 
             except KeyboardInterrupt:
                 print("\n🛑 Simulation stopped by user")
-                self.running = False
                 break
             except Exception as e:
                 print(f"❌ Error in simulation loop: {e}")
-                time.sleep(10)  # Wait before retrying
+                stop_event.wait(10)  # Wait before retrying
+        
+        self.running = False
+        return emitted
     
     def stop(self):
         """Stop the simulation"""
         self.running = False
+        self.stop_event.set()
+        if self.firebase_writer:
+            self.firebase_writer.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
 def main():
     """Main function to run the IoT simulator"""
-    simulator = CampusDataSimulator()
+    simulator = CampusDataSimulator.from_env()
     
     print("🌱 EcoVerse Campus IoT Data Simulator")
     print("=====================================")
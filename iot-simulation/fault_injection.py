@@ -0,0 +1,166 @@
+"""
+EcoVerse Fault Injection
+Injects labelled faults (leaks, stuck meters, spikes, drift, HVAC failures,
+sensor dropouts) into simulated snapshot batches
+"""
+
+import random
+from typing import Dict, List
+
+import numpy as np
+
+from building_registry import METRICS
+
+FAULT_TYPES = ('leak', 'stuck_meter', 'spike', 'drift', 'hvac_failure', 'dropout')
+
+# Metric a fault affects when none is given (None = every metric)
+DEFAULT_FAULT_METRIC = {
+    'leak': 'water',
+    'stuck_meter': 'electricity',
+    'spike': 'electricity',
+    'drift': 'electricity',
+    'hvac_failure': 'electricity',
+    'dropout': None
+}
+
+# Default magnitude per fault type (see FaultEvent.apply)
+DEFAULT_MAGNITUDE = {
+    'leak': 1.0,
+    'stuck_meter': None,
+    'spike': 4.0,
+    'drift': 1.5,
+    'hvac_failure': 2.5,
+    'dropout': None
+}
+
+_METRIC_KEYS = ('electricity_kwh', 'water_liters', 'waste_kg')
+
+
+class FaultEvent:
+    """
+    One injected fault on one building.
+
+    `start` and `duration` are snapshot indexes in the simulator's stream
+    (the batch 'position'), so an event can span several batches.
+
+    Effects on the affected metric:
+        leak          adds magnitude x the building's base usage
+        stuck_meter   holds the first affected reading
+        spike         multiplies readings by magnitude
+        drift         ramps readings up to (1 + magnitude)x over the duration
+        hvac_failure  multiplies readings by magnitude (runaway consumption)
+        dropout       replaces every metric of the building with NaN
+    """
+
+    def __init__(self, kind: str, building: str, start: int, duration: int = 1,
+                 metric: str = None, magnitude: float = None):
+        if kind not in FAULT_TYPES:
+            raise ValueError(f"Unknown fault type: {kind}")
+        self.kind = kind
+        self.building = building
+        self.start = start
+        self.duration = max(1, duration)
+        self.metric = metric if metric is not None else DEFAULT_FAULT_METRIC[kind]
+        self.magnitude = magnitude if magnitude is not None else DEFAULT_MAGNITUDE[kind]
+        self._stuck_value = None
+
+    @property
+    def end(self) -> int:
+        return self.start + self.duration
+
+    @property
+    def metrics(self) -> List[str]:
+        """Metrics whose readings this fault changes"""
+        return list(METRICS) if self.metric is None else [self.metric]
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': self.kind,
+            'building': self.building,
+            'metric': self.metric,
+            'start': self.start,
+            'duration': self.duration,
+            'magnitude': self.magnitude
+        }
+
+    def apply(self, values: np.ndarray, rows: slice, ramp: np.ndarray, base: float):
+        """Apply the fault to the affected rows of one building/metric column"""
+        if self.kind == 'leak':
+            values[rows] += self.magnitude * base
+        elif self.kind == 'stuck_meter':
+            if self._stuck_value is None:
+                self._stuck_value = values[rows][0]
+            values[rows] = self._stuck_value
+        elif self.kind in ('spike', 'hvac_failure'):
+            values[rows] *= self.magnitude
+        elif self.kind == 'drift':
+            values[rows] *= 1 + self.magnitude * ramp
+        elif self.kind == 'dropout':
+            values[rows] = np.nan
+
+
+class FaultInjector:
+    """
+    Applies fault events to snapshot batches and labels them.
+
+    apply() adds ground truth to the batch:
+        'fault_codes'    (n, buildings) int8, 0 = healthy, i + 1 = FAULT_TYPES[i]
+        'fault_metrics'  (n, buildings, metrics) bool, readings changed by a fault
+        'anomaly_labels' {metric: (n,) bool}, snapshots whose totals include a fault
+    """
+
+    def __init__(self, events: List[FaultEvent] = None):
+        self.events = list(events or [])
+
+    @classmethod
+    def random_scenarios(cls, buildings: List[str], start: int, n_snapshots: int, n_events: int,
+                         kinds=FAULT_TYPES, max_duration: int = 12, seed: int = None) -> 'FaultInjector':
+        """Scatter n_events random faults over [start, start + n_snapshots)"""
+        rng = random.Random(seed)
+        events = []
+        for _ in range(n_events):
+            kind = rng.choice(list(kinds))
+            duration = 1 if kind == 'spike' else rng.randint(2, max_duration)
+            events.append(FaultEvent(kind, rng.choice(buildings),
+                                     start + rng.randrange(max(1, n_snapshots - duration)), duration))
+        return cls(sorted(events, key=lambda event: event.start))
+
+    def add(self, event: FaultEvent):
+        self.events.append(event)
+
+    def apply(self, batch: Dict, base_profiles: np.ndarray = None) -> Dict:
+        """Inject all events overlapping the batch (modifies the batch in place)"""
+        n = len(batch['timestamps'])
+        position = batch.get('position', 0)
+        index = {name: i for i, name in enumerate(batch['buildings'])}
+
+        codes = np.zeros((n, len(index)), dtype=np.int8)
+        affected = np.zeros((n, len(index), len(METRICS)), dtype=bool)
+
+        for event in self.events:
+            b = index.get(event.building)
+            first, last = max(event.start, position), min(event.end, position + n)
+            if b is None or first >= last:
+                continue
+
+            rows = slice(first - position, last - position)
+            ramp = (np.arange(first, last) - event.start + 1) / event.duration
+            codes[rows, b] = FAULT_TYPES.index(event.kind) + 1
+
+            for metric in event.metrics:
+                m = METRICS.index(metric)
+                base = base_profiles[b, m] if base_profiles is not None else np.nanmean(batch[_METRIC_KEYS[m]][:, b])
+                event.apply(batch[_METRIC_KEYS[m]][:, b], rows, ramp, base)
+                affected[rows, b, m] = True
+
+        for key in _METRIC_KEYS:
+            batch[key] = np.round(batch[key], 2)
+
+        batch['total_metrics'] = {
+            metric: np.round(np.nansum(batch[key], axis=1), 2)
+            for metric, key in zip(METRICS, _METRIC_KEYS)
+        }
+        batch['fault_codes'] = codes
+        batch['fault_metrics'] = affected
+        batch['anomaly_labels'] = {metric: affected[:, :, m].any(axis=1) for m, metric in enumerate(METRICS)}
+        return batch
@@ -0,0 +1,183 @@
+"""
+EcoVerse Firebase Batch Writer
+Buffers campus snapshots and writes them to the Realtime Database in batches
+"""
+
+import queue
+import random
+import threading
+import time
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Characters the Realtime Database does not allow in keys
+_INVALID_KEY_CHARS = str.maketrans({char: '_' for char in '.$#[]/'})
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def firebase_key(timestamp: str) -> str:
+    """Turn an ISO timestamp into a valid Realtime Database key"""
+    return timestamp.translate(_INVALID_KEY_CHARS)
+
+
+class FirebaseBatchWriter:
+    """
+    Background writer for the Firebase Realtime Database REST API.
+
+    Snapshots are buffered in a bounded queue and written with one multi-path
+    PATCH per batch over a pooled keep-alive session. A batch goes out when it
+    reaches `batch_size` or when its oldest snapshot is `flush_interval`
+    seconds old. Failed batches are retried with exponential backoff. When the
+    buffer is full, write() blocks the producer (backpressure) instead of
+    growing memory.
+    """
+
+    def __init__(self, firebase_url: str, path: str = 'sensor_data', batch_size: int = 50,
+                 flush_interval: float = 2.0, max_buffer: int = 1000, max_retries: int = 5,
+                 backoff_seconds: float = 0.5, timeout: float = 10, auth_token: str = None,
+                 pool_size: int = 4, session: requests.Session = None):
+        self.url = f"{firebase_url.rstrip('/')}/{path.strip('/')}.json"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        self.params = {'auth': auth_token} if auth_token else None
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self.buffer = queue.Queue(maxsize=max_buffer)
+        self._running = False
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            'snapshots_written': 0,
+            'snapshots_dropped': 0,
+            'batches_written': 0,
+            'batches_failed': 0,
+            'retries': 0,
+            'backpressure_waits': 0
+        }
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def start(self):
+        """Start the background flush thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, snapshot: Dict, block: bool = True, timeout: float = None) -> bool:
+        """Buffer a snapshot; blocks while the buffer is full unless block=False"""
+        if not self._running:
+            self.start()
+
+        try:
+            self.buffer.put_nowait(snapshot)
+            return True
+        except queue.Full:
+            if not block:
+                self._count('snapshots_dropped')
+                return False
+
+        self._count('backpressure_waits')
+        try:
+            self.buffer.put(snapshot, timeout=timeout)
+            return True
+        except queue.Full:
+            self._count('snapshots_dropped')
+            return False
+
+    def flush(self):
+        """Block until every buffered snapshot has been written or dropped"""
+        self.buffer.join()
+
+    def close(self):
+        """Flush remaining snapshots and stop the writer"""
+        if self._running:
+            self.flush()
+            self._running = False
+            self._thread.join()
+        self.session.close()
+
+    def _next_batch(self) -> List[Dict]:
+        """Collect up to batch_size snapshots, waiting at most flush_interval after the first"""
+        try:
+            batch = [self.buffer.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.buffer.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _flush_loop(self):
+        """Background loop writing batches until the writer is closed"""
+        while self._running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            try:
+                if self._write_batch(batch):
+                    self._count('snapshots_written', len(batch))
+                    self._count('batches_written')
+                else:
+                    self._count('snapshots_dropped', len(batch))
+                    self._count('batches_failed')
+            finally:
+                for _ in batch:
+                    self.buffer.task_done()
+
+    def _write_batch(self, batch: List[Dict]) -> bool:
+        """Write one batch as a multi-path PATCH, retrying transient failures"""
+        update = {firebase_key(snapshot['timestamp']): snapshot for snapshot in batch}
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self._count('retries')
+                time.sleep(self.backoff_seconds * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+            try:
+                response = self.session.patch(self.url, json=update, params=self.params, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                print(f"⚠️ Firebase write failed (attempt {attempt + 1}): {e}")
+                continue
+
+            if response.status_code == 200:
+                return True
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                print(f"❌ Firebase rejected batch of {len(batch)} with status {response.status_code}")
+                return False
+
+            print(f"⚠️ Firebase responded with status {response.status_code} (attempt {attempt + 1})")
+
+        print(f"❌ Giving up on batch of {len(batch)} snapshots after {self.max_retries} retries")
+        return False
+
+    def get_stats(self) -> Dict:
+        """Writer counters plus the current buffer depth"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['buffered'] = self.buffer.qsize()
+        return stats
@@ -0,0 +1,158 @@
+"""
+EcoVerse Virtual Sensor Runtime
+Runs thousands of independently scheduled virtual sensors on one asyncio event loop
+"""
+
+import argparse
+import asyncio
+import inspect
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from building_registry import BuildingRegistry
+from campus_simulator import CampusDataSimulator
+
+
+class VirtualSensorRuntime:
+    """
+    Asyncio runtime where every registry sensor emits readings on its own schedule.
+
+    Each sensor is one task that reads at `interval_seconds` (a float, or a
+    per-sensor list) with +/- `jitter` relative jitter per tick. Schedules are
+    anchored to the loop clock, so jitter does not accumulate as drift.
+
+    Readings go to `sink` (a plain or async callable). Without a sink they are
+    put on the bounded `queue`; readings that do not fit are counted as dropped.
+    """
+
+    def __init__(self, simulator: CampusDataSimulator = None, sink: Callable = None,
+                 interval_seconds=1.0, jitter: float = 0.1, sensors: List[int] = None,
+                 max_queue: int = 10000, seed: int = None):
+        self.simulator = simulator or CampusDataSimulator(seed=seed)
+        self.random = random.Random(seed)
+        self.sink = sink
+        self.sink_is_async = sink is not None and inspect.iscoroutinefunction(sink)
+        self.jitter = jitter
+        self.sensors = list(sensors) if sensors is not None else list(range(len(self.simulator.registry.sensor_ids)))
+
+        if isinstance(interval_seconds, (int, float)):
+            self.intervals = [float(interval_seconds)] * len(self.sensors)
+        else:
+            self.intervals = [float(interval) for interval in interval_seconds]
+            if len(self.intervals) != len(self.sensors):
+                raise ValueError("interval_seconds needs one entry per sensor")
+
+        self.queue = asyncio.Queue(maxsize=max_queue) if sink is None else None
+        self._tasks = []
+        self._stopping = False
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.readings_emitted = 0
+        self.readings_dropped = 0
+        self.sink_errors = 0
+        self.max_lag_seconds = 0.0
+        self.started_at = None
+
+    async def _emit(self, reading: Dict):
+        """Hand one reading to the sink or the queue"""
+        if self.sink is None:
+            try:
+                self.queue.put_nowait(reading)
+            except asyncio.QueueFull:
+                self.readings_dropped += 1
+                return
+        else:
+            try:
+                if self.sink_is_async:
+                    await self.sink(reading)
+                else:
+                    self.sink(reading)
+            except Exception as e:
+                self.sink_errors += 1
+                if self.sink_errors == 1:
+                    print(f"❌ Sensor sink error: {e}")
+                return
+
+        self.readings_emitted += 1
+
+    async def _run_sensor(self, sensor: int, interval: float):
+        """Emission loop of a single virtual sensor"""
+        loop = asyncio.get_running_loop()
+        # Stagger start times so sensors do not fire in lockstep
+        next_at = loop.time() + self.random.uniform(0, interval)
+
+        while not self._stopping:
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.max_lag_seconds = max(self.max_lag_seconds, -delay)
+
+            reading = self.simulator.generate_sensor_reading(sensor, datetime.now())
+            await self._emit(reading)
+
+            next_at += interval * (1 + self.random.uniform(-self.jitter, self.jitter))
+
+    async def run(self, duration_seconds: float = None):
+        """Run all sensors until stop() is called or duration_seconds elapses"""
+        self._reset_stats()
+        self._stopping = False
+        self.started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._run_sensor(sensor, interval))
+                       for sensor, interval in zip(self.sensors, self.intervals)]
+
+        try:
+            if duration_seconds is None:
+                await asyncio.gather(*self._tasks)
+            else:
+                await asyncio.wait(self._tasks, timeout=duration_seconds)
+        finally:
+            self.stop()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self):
+        """Cancel all sensor tasks"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+
+    def stats(self) -> Dict:
+        """Emission statistics of the current or last run"""
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'sensors': len(self.sensors),
+            'readings_emitted': self.readings_emitted,
+            'readings_dropped': self.readings_dropped,
+            'sink_errors': self.sink_errors,
+            'readings_per_second': round(self.readings_emitted / elapsed, 1) if elapsed else 0.0,
+            'max_lag_seconds': round(self.max_lag_seconds, 4),
+            'elapsed_seconds': round(elapsed, 2)
+        }
+
+
+def main():
+    """Stress-run synthetic virtual sensors and report throughput"""
+    parser = argparse.ArgumentParser(description='Run EcoVerse virtual sensors on one event loop')
+    parser.add_argument('--buildings', type=int, default=500, help='Synthetic buildings to simulate')
+    parser.add_argument('--campuses', type=int, default=1, help='Campuses to spread buildings over')
+    parser.add_argument('--sensors-per-metric', type=int, default=2, help='Meters per building and metric')
+    parser.add_argument('--interval', type=float, default=0.5, help='Seconds between readings of one sensor')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Relative jitter of each interval')
+    parser.add_argument('--duration', type=float, default=10, help='Run time in seconds')
+    args = parser.parse_args()
+
+    registry = BuildingRegistry.synthetic(args.buildings, args.campuses, args.sensors_per_metric)
+    runtime = VirtualSensorRuntime(CampusDataSimulator(registry), sink=lambda reading: None,
+                                   interval_seconds=args.interval, jitter=args.jitter)
+
+    print(f"📡 Running {len(runtime.sensors)} virtual sensors for {args.duration}s "
+          f"(every {args.interval}s ±{args.jitter:.0%})")
+    asyncio.run(runtime.run(args.duration))
+    print(f"✅ {runtime.stats()}")
+
+
+if __name__ == "__main__":
+    main()
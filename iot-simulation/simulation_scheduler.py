@@ -0,0 +1,287 @@
+"""
+EcoVerse Simulation Scheduler
+Runs several named campus simulations side by side, each on its own thread
+or as a task on an asyncio event loop
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from building_registry import BuildingRegistry
+from campus_simulator import CampusDataSimulator
+from snapshot_log import SnapshotRecorder
+from snapshot_stream import SnapshotBroadcaster, SnapshotRingBuffer
+
+DEFAULT_SIMULATION = 'default'
+
+
+class ManagedSimulation:
+    """
+    One named simulation: a simulator, its sinks, and the recent-snapshot
+    buffer and push broadcaster fed by it.
+
+    The buffer and broadcaster outlive individual runs, so readers and stream
+    subscribers stay attached across stop/start.
+    """
+
+    def __init__(self, name: str, simulator: CampusDataSimulator, sinks: List[Callable] = None,
+                 buffer_size: int = 1000, stream_queue: int = 100, max_subscribers: int = 1000):
+        self.name = name
+        self.simulator = simulator
+        self.campus = None
+        self.recent = SnapshotRingBuffer(buffer_size)
+        self.broadcaster = SnapshotBroadcaster(stream_queue, max_subscribers)
+        simulator.add_listener(self.recent)
+        simulator.add_listener(self.broadcaster)
+        for sink in sinks or []:
+            simulator.add_listener(sink)
+
+        self.interval_seconds = None
+        self.max_snapshots = None
+        self.runs = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.last_run_snapshots = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self._lock = threading.Lock()
+
+    def _running(self) -> bool:
+        return ((self._thread is not None and self._thread.is_alive())
+                or (self._task is not None and not self._task.done()))
+
+    @property
+    def active(self) -> bool:
+        return self._running() and not self._stop_event.is_set()
+
+    def _begin_run(self, interval_seconds: float, max_snapshots: int):
+        if self._running():
+            raise RuntimeError(f"Simulation '{self.name}' is already running")
+        self.interval_seconds = interval_seconds
+        self.max_snapshots = max_snapshots
+        self.runs += 1
+        self.started_at = datetime.now()
+        self.stopped_at = None
+        self._stop_event = threading.Event()
+
+    def start(self, interval_seconds: float = 300, max_snapshots: int = None):
+        """Start a run on a background thread"""
+        with self._lock:
+            self._begin_run(interval_seconds, max_snapshots)
+            self._thread = threading.Thread(target=self._run, args=(self._stop_event,),
+                                            name=f"simulation-{self.name}", daemon=True)
+            self._thread.start()
+
+    def start_async(self, interval_seconds: float = 300, max_snapshots: int = None):
+        """Start a run as a task on the running event loop (call from a coroutine)"""
+        with self._lock:
+            self._begin_run(interval_seconds, max_snapshots)
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._run_async(self._stop_event, self._wake))
+
+    async def _run_async(self, stop_event: threading.Event, wake: asyncio.Event):
+        """Event-loop version of simulate_realtime_data"""
+        simulator = self.simulator
+        simulator.running = True
+        emitted = 0
+        try:
+            while not stop_event.is_set():
+                try:
+                    campus_data = simulator.generate_campus_snapshot()
+                    # Firebase writes may block under backpressure, so emit off the loop
+                    await asyncio.to_thread(simulator.emit_snapshot, campus_data)
+                    emitted += 1
+                    if self.max_snapshots is not None and emitted >= self.max_snapshots:
+                        break
+                    delay = self.interval_seconds
+                except Exception as e:
+                    print(f"❌ Error in simulation '{self.name}': {e}")
+                    delay = 10
+
+                # Wait for next interval (stop() wakes the task early)
+                try:
+                    await asyncio.wait_for(wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            simulator.running = False
+            self.last_run_snapshots = emitted
+            stop_event.set()
+            self.stopped_at = datetime.now()
+
+    def _run(self, stop_event: threading.Event):
+        try:
+            self.last_run_snapshots = self.simulator.simulate_realtime_data(
+                self.interval_seconds, stop_event=stop_event, max_snapshots=self.max_snapshots)
+        finally:
+            stop_event.set()
+            self.stopped_at = datetime.now()
+
+    def stop(self, timeout: float = None) -> bool:
+        """Stop the current run; returns False if it was not running"""
+        with self._lock:
+            thread = self._thread if self._thread is not None and self._thread.is_alive() else None
+            task = self._task if self._task is not None and not self._task.done() else None
+            was_active = self.active
+            self._stop_event.set()
+
+        if task is not None:
+            # Async runs are woken on their loop; they finish on its next iteration
+            self._loop.call_soon_threadsafe(self._wake.set)
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        return was_active
+
+    async def stop_async(self) -> bool:
+        """Stop the current run and wait for an async run's task to finish"""
+        task = self._task
+        was_active = self.stop()
+        if task is not None:
+            await asyncio.gather(task, return_exceptions=True)
+        return was_active
+
+    def close(self):
+        """Stop and release the simulator's sinks"""
+        self.stop()
+        self.simulator.stop()
+        for listener in self.simulator.listeners:
+            if hasattr(listener, 'close'):
+                listener.close()
+
+    def stats(self) -> Dict:
+        """Run state and counters of this simulation"""
+        latest = self.recent.latest()
+        return {
+            'name': self.name,
+            'active': self.active,
+            'campus': self.campus,
+            'interval_seconds': self.interval_seconds,
+            'max_snapshots': self.max_snapshots,
+            'runs': self.runs,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'stopped_at': self.stopped_at.isoformat() if self.stopped_at else None,
+            'buildings_monitored': len(self.simulator.buildings),
+            'snapshots_emitted': self.recent.total_appended,
+            'snapshots_sent': self.simulator.snapshots_sent,
+            'send_failures': self.simulator.send_failures,
+            'last_snapshot_at': latest['timestamp'] if latest else None,
+            'stream': self.broadcaster.stats()
+        }
+
+
+class SimulationScheduler:
+    """
+    Thread-safe registry of named simulations.
+
+    Each simulation has its own simulator (optionally restricted to one
+    campus), interval, sinks and stats. Starting a running simulation raises
+    RuntimeError instead of starting a second loop, and stop() interrupts the
+    wait between snapshots immediately. Per-simulation recordings are only
+    written inside `record_dir`.
+    """
+
+    def __init__(self, registry: BuildingRegistry = None, buffer_size: int = 1000, stream_queue: int = 100,
+                 max_subscribers: int = 1000, max_simulations: int = 16, record_dir: str = None):
+        self.registry = registry or BuildingRegistry.default()
+        self.record_dir = record_dir
+        self.buffer_size = buffer_size
+        self.stream_queue = stream_queue
+        self.max_subscribers = max_subscribers
+        self.max_simulations = max_simulations
+        self._simulations = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str = DEFAULT_SIMULATION) -> ManagedSimulation:
+        """Existing simulation by name, or None"""
+        with self._lock:
+            return self._simulations.get(name)
+
+    def record_path(self, record_file: str) -> str:
+        """Path of a per-simulation recording; record_file must be a bare file name"""
+        if self.record_dir is None:
+            raise ValueError("Per-simulation recording is disabled (SIMULATION_RECORD_DIR is not set)")
+        if (not isinstance(record_file, str) or record_file in ('', '.', '..') or '\0' in record_file
+                or '/' in record_file or '\\' in record_file or os.path.basename(record_file) != record_file):
+            raise ValueError("record_file must be a plain file name")
+        return os.path.join(self.record_dir, record_file)
+
+    def get_or_create(self, name: str = DEFAULT_SIMULATION, campus: str = None, seed: int = None,
+                      sinks: List[Callable] = None, firebase: bool = True,
+                      record_file: str = None) -> ManagedSimulation:
+        """
+        Return the named simulation, creating it (idle) on first use.
+
+        campus, seed, sinks, firebase and record_file (a snapshot log in
+        record_dir) only apply when the simulation is created; asking for a
+        different campus than an existing simulation uses raises ValueError.
+        """
+        with self._lock:
+            simulation = self._simulations.get(name)
+            if simulation is not None:
+                if campus is not None and campus != simulation.campus:
+                    raise ValueError(f"Simulation '{name}' already runs campus {simulation.campus or 'all'}")
+                return simulation
+
+            if len(self._simulations) >= self.max_simulations:
+                raise RuntimeError(f"Simulation limit reached ({self.max_simulations})")
+            path = self.record_path(record_file) if record_file is not None else None
+
+            # Environment-configured sinks: Firebase unless disabled, the recording for the default simulation
+            simulator = CampusDataSimulator.from_env(self.registry, campus=campus, seed=seed, firebase=firebase,
+                                                     record=name == DEFAULT_SIMULATION and path is None)
+            if path is not None:
+                # Opened once the simulator exists, so a rejected campus leaves no open log behind
+                simulator.recorder = SnapshotRecorder(path)
+                simulator.add_listener(simulator.recorder)
+            simulation = ManagedSimulation(name, simulator, sinks, self.buffer_size,
+                                           self.stream_queue, self.max_subscribers)
+            simulation.campus = campus
+            self._simulations[name] = simulation
+            return simulation
+
+    def start(self, name: str = DEFAULT_SIMULATION, interval_seconds: float = 300, max_snapshots: int = None,
+              **config) -> ManagedSimulation:
+        """Create the simulation if needed and start a run"""
+        simulation = self.get_or_create(name, **config)
+        simulation.start(interval_seconds, max_snapshots)
+        return simulation
+
+    def start_async(self, name: str = DEFAULT_SIMULATION, interval_seconds: float = 300,
+                    max_snapshots: int = None, **config) -> ManagedSimulation:
+        """Like start(), but runs the simulation as a task on the running event loop"""
+        simulation = self.get_or_create(name, **config)
+        simulation.start_async(interval_seconds, max_snapshots)
+        return simulation
+
+    def stop(self, name: str = DEFAULT_SIMULATION, timeout: float = None) -> bool:
+        """Stop a simulation; returns False if it was not running"""
+        simulation = self.get(name)
+        if simulation is None:
+            raise KeyError(name)
+        return simulation.stop(timeout)
+
+    def stop_all(self, timeout: float = None):
+        """Stop every running simulation"""
+        for simulation in self.simulations():
+            simulation.stop(timeout)
+
+    def remove(self, name: str):
+        """Stop a simulation and forget it"""
+        with self._lock:
+            simulation = self._simulations.pop(name)
+        simulation.close()
+
+    def simulations(self) -> List[ManagedSimulation]:
+        with self._lock:
+            return list(self._simulations.values())
+
+    def stats(self) -> Dict[str, Dict]:
+        """Stats of every simulation by name"""
+        return {simulation.name: simulation.stats() for simulation in self.simulations()}
@@ -0,0 +1,249 @@
+"""
+EcoVerse Snapshot Stream
+Shares the emitted snapshot stream with API readers: a ring buffer of recent
+snapshots and fan-out to push subscribers (SSE / NDJSON)
+"""
+
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+STREAM_FORMATS = ('sse', 'ndjson')
+
+
+def format_sse(payload: str, event: str = None, event_id: int = None) -> str:
+    """Frame a payload as one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in payload.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+class SnapshotRingBuffer:
+    """
+    Fixed-size buffer of the most recently emitted snapshots.
+
+    Appending evicts the oldest snapshot once `capacity` is reached. Instances
+    are callable, so a buffer can be registered directly as a simulator
+    listener.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.total_appended = 0
+
+    def append(self, snapshot: Dict):
+        """Add a snapshot, evicting the oldest when full"""
+        with self._lock:
+            self._buffer.append(snapshot)
+            self.total_appended += 1
+
+    __call__ = append
+
+    def latest(self) -> Optional[Dict]:
+        """Most recent snapshot, or None before the first one"""
+        with self._lock:
+            return self._buffer[-1] if self._buffer else None
+
+    def recent(self, count: int) -> List[Dict]:
+        """Up to `count` most recent snapshots, oldest first"""
+        with self._lock:
+            snapshots = list(islice(reversed(self._buffer), max(0, count)))
+        snapshots.reverse()
+        return snapshots
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+
+class SnapshotSubscription:
+    """One subscriber's bounded queue of serialized snapshots"""
+
+    def __init__(self, max_queue: int):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = False
+        self.delivered = 0
+        self.connected_at = time.time()
+
+    def offer(self, message) -> bool:
+        """Queue a message without blocking; False when the queue is full"""
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            return False
+
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+
+class AsyncSnapshotSubscription:
+    """
+    Subscriber consumed by a coroutine on an asyncio event loop.
+
+    offer() may be called from any thread; it appends to a deque and wakes
+    the consumer through the loop.
+    """
+
+    def __init__(self, max_queue: int, loop: asyncio.AbstractEventLoop):
+        self.max_queue = max_queue
+        self.loop = loop
+        self.messages = deque()
+        self.ready = asyncio.Event()
+        self.dropped = False
+        self.delivered = 0
+        self.connected_at = time.time()
+
+    def offer(self, message) -> bool:
+        if len(self.messages) >= self.max_queue:
+            return False
+        self.messages.append(message)
+        self.loop.call_soon_threadsafe(self.ready.set)
+        return True
+
+    def depth(self) -> int:
+        return len(self.messages)
+
+
+class SnapshotBroadcaster:
+    """
+    Publishes each snapshot once to every subscriber.
+
+    Snapshots are serialized once per publish and shared by all subscribers.
+    Each subscriber has its own bounded queue; a subscriber whose queue is
+    full is dropped instead of slowing the publisher or other subscribers.
+    Instances are callable, so a broadcaster can be registered directly as a
+    simulator listener.
+    """
+
+    def __init__(self, max_queue: int = 100, max_subscribers: int = 1000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.sequence = 0
+        self.published = 0
+        self.slow_consumers_dropped = 0
+
+    def publish(self, snapshot: Dict):
+        """Queue a snapshot for every subscriber"""
+        payload = json.dumps(snapshot, separators=(',', ':'))
+        with self._lock:
+            self.sequence += 1
+            self.published += 1
+            message = (self.sequence, payload)
+            for subscription in list(self._subscribers):
+                if not subscription.offer(message):
+                    subscription.dropped = True
+                    self._subscribers.discard(subscription)
+                    self.slow_consumers_dropped += 1
+
+    __call__ = publish
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop = None):
+        """Register a new subscriber (an asyncio one when `loop` is given)"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise RuntimeError(f"Subscriber limit reached ({self.max_subscribers})")
+            if loop is None:
+                subscription = SnapshotSubscription(self.max_queue)
+            else:
+                subscription = AsyncSnapshotSubscription(self.max_queue, loop)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: SnapshotSubscription):
+        """Remove a subscriber (no-op if it was already dropped)"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription: SnapshotSubscription, fmt: str = 'sse',
+               keepalive_seconds: float = 15.0) -> Iterator[str]:
+        """
+        Yield a subscriber's snapshots as SSE messages or NDJSON lines.
+
+        Sends a keepalive (SSE comment or empty NDJSON line) when no snapshot
+        arrives for keepalive_seconds, and ends the stream with a 'dropped'
+        notice if the subscriber fell too far behind.
+        """
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format: {fmt}")
+
+        try:
+            if fmt == 'sse':
+                yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event_id, payload = subscription.queue.get(timeout=keepalive_seconds)
+                except queue.Empty:
+                    if subscription.dropped:
+                        break
+                    yield ": keepalive\n\n" if fmt == 'sse' else "\n"
+                    continue
+
+                subscription.delivered += 1
+                yield format_sse(payload, 'snapshot', event_id) if fmt == 'sse' else payload + '\n'
+
+                if subscription.dropped and subscription.queue.empty():
+                    break
+
+            yield self._dropped_notice(fmt)
+        finally:
+            self.unsubscribe(subscription)
+
+    async def astream(self, subscription: AsyncSnapshotSubscription, fmt: str = 'sse',
+                      keepalive_seconds: float = 15.0):
+        """Async counterpart of stream() for subscriptions created with a loop"""
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format: {fmt}")
+
+        try:
+            if fmt == 'sse':
+                yield "retry: 5000\n\n"
+            while True:
+                if not subscription.messages:
+                    if subscription.dropped:
+                        break
+                    try:
+                        await asyncio.wait_for(subscription.ready.wait(), keepalive_seconds)
+                    except asyncio.TimeoutError:
+                        yield ": keepalive\n\n" if fmt == 'sse' else "\n"
+                        continue
+                    finally:
+                        subscription.ready.clear()
+
+                while subscription.messages:
+                    event_id, payload = subscription.messages.popleft()
+                    subscription.delivered += 1
+                    yield format_sse(payload, 'snapshot', event_id) if fmt == 'sse' else payload + '\n'
+
+            yield self._dropped_notice(fmt)
+        finally:
+            self.unsubscribe(subscription)
+
+    @staticmethod
+    def _dropped_notice(fmt: str) -> str:
+        notice = json.dumps({'error': 'Subscriber too slow, stream closed'})
+        return format_sse(notice, 'dropped') if fmt == 'sse' else notice + '\n'
+
+    def stats(self) -> Dict:
+        """Fan-out statistics"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'snapshots_published': self.published,
+            'slow_consumers_dropped': self.slow_consumers_dropped,
+            'max_queue': self.max_queue,
+            'max_queue_depth': max((s.depth() for s in subscribers), default=0)
+        }
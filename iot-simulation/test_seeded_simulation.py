@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Seeded simulator output must not depend on how generation is split up:
+batch sizes, shard counts or sharding by campus
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from building_registry import BuildingRegistry
+from campus_simulator import CampusDataSimulator
+from sharded_simulation import ShardedSimulator
+
+START = datetime(2024, 1, 1)
+STEP = timedelta(minutes=5)
+COLUMNS = ('electricity_kwh', 'water_liters', 'waste_kg')
+
+
+def concat_batches(batches):
+    """Join consecutive batches along the time axis"""
+    merged = {key: np.concatenate([batch[key] for batch in batches]) for key in COLUMNS + ('timestamps',)}
+    merged['buildings'] = list(batches[0]['buildings'])
+    for metric in ('electricity', 'water', 'waste'):
+        merged[metric] = np.concatenate([batch['total_metrics'][metric] for batch in batches])
+    merged['aqi'] = np.concatenate([batch['campus_air_quality']['aqi'] for batch in batches])
+    return merged
+
+
+def assert_same_output(expected, actual):
+    assert actual['buildings'] == expected['buildings']
+    np.testing.assert_array_equal(actual['timestamps'], expected['timestamps'])
+    for key in COLUMNS + ('electricity', 'water', 'waste', 'aqi'):
+        np.testing.assert_array_equal(actual[key], expected[key], err_msg=key)
+
+
+@pytest.fixture(scope='module')
+def registry():
+    # Four campuses, interleaved in registry order
+    return BuildingRegistry.synthetic(24, 4, seed=3)
+
+
+@pytest.fixture(scope='module')
+def reference(registry):
+    batch = CampusDataSimulator(registry, seed=42).generate_campus_snapshots(60, START, STEP)
+    return concat_batches([batch])
+
+
+def test_same_seed_gives_identical_output(registry, reference):
+    batch = CampusDataSimulator(registry, seed=42).generate_campus_snapshots(60, START, STEP)
+    assert_same_output(reference, concat_batches([batch]))
+
+
+def test_different_seeds_differ(registry, reference):
+    batch = CampusDataSimulator(registry, seed=43).generate_campus_snapshots(60, START, STEP)
+    assert not np.array_equal(batch['electricity_kwh'], reference['electricity_kwh'])
+
+
+@pytest.mark.parametrize('sizes', [(1, 59), (25, 25, 10), (7,) * 8 + (4,)])
+def test_batch_splits_match_one_batch(registry, reference, sizes):
+    simulator = CampusDataSimulator(registry, seed=42)
+    batches, offset = [], 0
+    for n in sizes:
+        batches.append(simulator.generate_campus_snapshots(n, START + offset * STEP, STEP))
+        offset += n
+    assert_same_output(reference, concat_batches(batches))
+
+
+def test_explicit_positions_match_one_batch(registry, reference):
+    # Out-of-order chunks jump their streams to the requested snapshot index
+    simulator = CampusDataSimulator(registry, seed=42)
+    second = simulator.generate_campus_snapshots(30, START + 30 * STEP, STEP, position=30)
+    first = simulator.generate_campus_snapshots(30, START, STEP, position=0)
+    assert_same_output(reference, concat_batches([first, second]))
+
+
+@pytest.mark.parametrize('shard_by,workers,chunk_size', [('range', 2, 25), ('range', 3, 60), ('campus', 2, 16)])
+def test_sharded_output_matches_single_process(registry, reference, shard_by, workers, chunk_size):
+    with ShardedSimulator(registry, workers, shard_by, seed=42, chunk_size=chunk_size) as simulator:
+        batches = list(simulator.iter_batches(60, START, STEP))
+    assert_same_output(reference, concat_batches(batches))
@@ -0,0 +1,278 @@
+"""
+EcoVerse Usage Profiles
+Precomputed diurnal, weekly and seasonal usage factor tables for the simulator
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from building_registry import BuildingRegistry, DEFAULT_BUILDING_TYPE, METRICS, infer_building_type
+
+_SNAPSHOT_KEYS = ('electricity_kwh', 'water_liters', 'waste_kg')
+
+# Mean factor of each hour in the original step profile (peak 8-18, evening 19-21, night otherwise)
+HOURLY_FACTORS = np.array([0.45] * 8 + [1.05] * 11 + [0.75] * 3 + [0.45] * 2)
+
+# Mean factor of each month per metric (cooling in summer, heating in winter); water
+# and waste follow occupancy only
+MONTHLY_FACTORS = np.array([
+    [1.15, 1.15, 1.0, 1.0, 1.0, 1.25, 1.25, 1.25, 1.0, 1.0, 1.0, 1.15],
+    [1.0] * 12,
+    [1.0] * 12
+])
+
+# Share of the weekday daytime rise above the night level that remains on weekends
+WEEKEND_OCCUPANCY = 0.6
+
+# Mean hourly factor and weekend occupancy of each building type (see building_registry.BUILDING_TYPE_KEYWORDS)
+TYPE_PROFILES = {
+    DEFAULT_BUILDING_TYPE: (HOURLY_FACTORS, WEEKEND_OCCUPANCY),
+    'academic': (np.array([0.35] * 7 + [0.6] + [1.15] * 10 + [0.8] + [0.6] * 3 + [0.4] * 2), 0.3),
+    'library': (np.array([0.3] * 7 + [0.5] + [1.0] * 14 + [0.7, 0.45]), 0.7),
+    'residential': (np.array([0.55] * 6 + [1.15] * 3 + [0.55] * 8 + [1.25] * 6 + [0.85]), 1.1),
+    'office': (np.array([0.3] * 7 + [0.6] + [1.25] * 9 + [0.8] + [0.35] * 6), 0.15),
+    'dining': (np.array([0.3] * 6 + [0.6] + [1.2] * 3 + [0.8] + [1.5] * 3 + [0.7] * 3 + [1.35] * 3 + [0.7]
+                        + [0.35] * 3), 0.6)
+}
+
+# Upper limit of the fitted factor tables; finer resolutions over many buildings need a coarser slot size
+MAX_TABLE_BYTES = 256 * 1024 ** 2
+
+# Relative noise applied on top of the table value (uniform +/- jitter)
+PROFILE_JITTER = 0.15
+SEASONAL_JITTER = 0.05
+
+
+def _circular_smooth(values: np.ndarray, sigma: float, axis: int = -1) -> np.ndarray:
+    """Gaussian smoothing of a periodic series (wraps around midnight / new year)"""
+    n = values.shape[axis]
+    frequencies = np.fft.rfftfreq(n)
+    kernel = np.exp(-2 * (np.pi * frequencies * sigma) ** 2)
+    shape = [1] * values.ndim
+    shape[axis] = len(kernel)
+    return np.fft.irfft(np.fft.rfft(values, axis=axis) * kernel.reshape(shape), n=n, axis=axis)
+
+
+def _ratio(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """sums / counts, NaN where there are no samples"""
+    return np.divide(sums, counts, out=np.full(np.broadcast(sums, counts).shape, np.nan), where=counts > 0)
+
+
+class UsageProfiles:
+    """
+    Smooth usage factor tables, looked up instead of evaluated per reading.
+
+    `factors[p, metric, weekday, slot, month]` is the mean usage multiplier of
+    profile row p, with weekday 0 = Monday and `slots_per_hour` slots per hour
+    (1 for hourly tables, 60 for minute resolution). `type_rows` maps building
+    types to their default profile row and `building_rows` maps buildings with
+    their own fitted profile to their row; row 0 is used for anything else.
+    """
+
+    def __init__(self, factors: np.ndarray, building_rows: Dict[str, int] = None, slots_per_hour: int = 1,
+                 type_rows: Dict[str, int] = None):
+        self.factors = np.ascontiguousarray(factors, dtype=float)
+        if self.factors.ndim != 5 or self.factors.shape[1:] != (len(METRICS), 7, 24 * slots_per_hour, 12):
+            raise ValueError(f"Profile tables need shape (profiles, {len(METRICS)}, 7, {24 * slots_per_hour}, 12)")
+        self.factors.setflags(write=False)
+        self.building_rows = dict(building_rows or {})
+        self.type_rows = dict(type_rows or {DEFAULT_BUILDING_TYPE: 0})
+        self.slots_per_hour = slots_per_hour
+        self.resolution_minutes = 60 // slots_per_hour
+
+    @staticmethod
+    def _slots_per_hour(resolution_minutes: int) -> int:
+        if resolution_minutes < 1 or 60 % resolution_minutes:
+            raise ValueError("resolution_minutes must divide 60")
+        return 60 // resolution_minutes
+
+    @staticmethod
+    def _type_factors(hourly: np.ndarray, weekend_occupancy: float, slots_per_hour: int) -> np.ndarray:
+        """Smoothed (metrics, 7, slots, 12) table of one step profile"""
+        hours = (np.arange(24 * slots_per_hour) + 0.5) / slots_per_hour
+        daily = np.interp(hours, np.arange(24) + 0.5, hourly, period=24)
+        daily = _circular_smooth(daily, sigma=1.0 * slots_per_hour)
+
+        night = daily.min()
+        weekend = night + weekend_occupancy * (daily - night)
+        weekly = np.stack([daily] * 5 + [weekend] * 2)
+
+        monthly = _circular_smooth(MONTHLY_FACTORS, sigma=0.75)
+        return weekly[None, :, :, None] * monthly[:, None, None, :]
+
+    @classmethod
+    def default(cls, resolution_minutes: int = 60) -> 'UsageProfiles':
+        """Smoothed step profiles, one per building type (row 0 is the general campus profile)"""
+        slots_per_hour = cls._slots_per_hour(resolution_minutes)
+        factors = np.stack([cls._type_factors(hourly, weekend, slots_per_hour)
+                            for hourly, weekend in TYPE_PROFILES.values()])
+        type_rows = {building_type: row for row, building_type in enumerate(TYPE_PROFILES)}
+        return cls(factors, slots_per_hour=slots_per_hour, type_rows=type_rows)
+
+    @classmethod
+    def from_snapshots(cls, snapshots: Iterable[Dict], registry: BuildingRegistry = None,
+                       resolution_minutes: int = 60, smoothing_slots: float = 1.0,
+                       max_table_bytes: int = MAX_TABLE_BYTES) -> 'UsageProfiles':
+        """
+        Fit one profile per building from recorded snapshots.
+
+        Readings are divided by the building's registry base usage, or by its
+        recorded mean when the building is not in `registry`. Bins without
+        samples fall back to the building's average over months, then over
+        weekdays, then to the default profile of the building's type.
+
+        Sums and counts are only kept for bins that have samples; the dense
+        tables are built once at the end and raise ValueError beyond
+        `max_table_bytes` (use a coarser `resolution_minutes`).
+        """
+        slots_per_hour = cls._slots_per_hour(resolution_minutes)
+        slots = 24 * slots_per_hour
+        cells = len(METRICS) * 7 * slots * 12
+        bases = registry.profile_dict() if registry is not None else {}
+        registry_types = dict(zip(registry.names, registry.types.tolist())) if registry is not None else {}
+
+        rows = {}
+        sums, counts = defaultdict(float), defaultdict(int)
+        for snapshot in snapshots:
+            when = datetime.fromisoformat(snapshot['timestamp'].replace('Z', '+00:00'))
+            slot = (when.hour * 60 + when.minute) // resolution_minutes
+            cell = (when.weekday() * slots + slot) * 12 + when.month - 1
+
+            for building, readings in snapshot.get('buildings', {}).items():
+                row = rows.setdefault(building, len(rows))
+                for m, key in enumerate(_SNAPSHOT_KEYS):
+                    value = readings.get(key)
+                    if value is not None:
+                        index = (row * len(METRICS) + m) * 7 * slots * 12 + cell
+                        sums[index] += value
+                        counts[index] += 1
+
+        defaults = cls.default(resolution_minutes)
+        if not rows:
+            return defaults
+
+        table_bytes = (len(defaults.factors) + len(rows)) * cells * 8
+        if table_bytes > max_table_bytes:
+            raise ValueError(f"Fitted profile tables for {len(rows)} buildings need {table_bytes / 1024 ** 2:.0f} MB "
+                             f"(limit {max_table_bytes / 1024 ** 2:.0f} MB); use a coarser resolution_minutes")
+
+        shape = (len(rows), len(METRICS), 7, slots, 12)
+        indices = np.fromiter(sums.keys(), dtype=np.int64, count=len(sums))
+        values = np.fromiter(sums.values(), dtype=float, count=len(sums))
+        samples = np.fromiter((counts[index] for index in sums), dtype=float, count=len(sums))
+        row_metric = indices // (7 * slots * 12)
+
+        scales = np.ones((len(rows), len(METRICS)))
+        means = _ratio(np.bincount(row_metric, values, scales.size), np.bincount(row_metric, samples, scales.size))
+        for building, row in rows.items():
+            if building in bases:
+                scales[row] = [bases[building][metric] for metric in METRICS]
+            else:
+                scales[row] = means.reshape(scales.shape)[row]
+        values = values / np.where(scales > 0, scales, 1.0).ravel()[row_metric]
+
+        sum_table = np.zeros(shape)
+        count_table = np.zeros(shape)
+        sum_table.ravel()[indices] = values
+        count_table.ravel()[indices] = samples
+
+        fitted = _ratio(sum_table, count_table)
+        for axes in ((4,), (2, 4)):
+            fallback = _ratio(sum_table.sum(axis=axes, keepdims=True), count_table.sum(axis=axes, keepdims=True))
+            np.copyto(fitted, np.broadcast_to(fallback, shape), where=np.isnan(fitted))
+        del sum_table, count_table
+
+        type_rows = [defaults.type_rows.get(registry_types.get(building) or infer_building_type(building), 0)
+                     for building in rows]
+        np.copyto(fitted, defaults.factors[type_rows], where=np.isnan(fitted))
+
+        if smoothing_slots:
+            fitted = _circular_smooth(fitted, sigma=smoothing_slots, axis=3)
+
+        factors = np.concatenate([defaults.factors, fitted])
+        return cls(factors, {building: row + len(defaults.factors) for building, row in rows.items()},
+                   slots_per_hour, defaults.type_rows)
+
+    @classmethod
+    def from_snapshot_log(cls, path: str, registry: BuildingRegistry = None, resolution_minutes: int = 60,
+                          max_table_bytes: int = MAX_TABLE_BYTES) -> 'UsageProfiles':
+        """Fit profiles from a log written by SnapshotRecorder"""
+        from snapshot_log import read_snapshot_log
+        return cls.from_snapshots(read_snapshot_log(path), registry, resolution_minutes,
+                                  max_table_bytes=max_table_bytes)
+
+    @classmethod
+    def load(cls, path: str) -> 'UsageProfiles':
+        """Load tables written by save()"""
+        with np.load(path) as data:
+            names = data['building_names'].tolist()
+            type_rows = None
+            if 'type_names' in data.files:  # tables saved before per-type defaults have only row 0
+                type_rows = dict(zip(data['type_names'].tolist(), data['type_rows'].tolist()))
+            return cls(data['factors'], dict(zip(names, data['building_rows'].tolist())),
+                       int(data['slots_per_hour']), type_rows)
+
+    def save(self, path: str):
+        """Write the tables to a .npz file"""
+        np.savez_compressed(path, factors=self.factors, slots_per_hour=self.slots_per_hour,
+                            building_names=np.array(list(self.building_rows), dtype=str),
+                            building_rows=np.array(list(self.building_rows.values()), dtype=int),
+                            type_names=np.array(list(self.type_rows), dtype=str),
+                            type_rows=np.array(list(self.type_rows.values()), dtype=int))
+
+    def rows_for(self, buildings: List[str], types: List[str] = None) -> np.ndarray:
+        """Profile row of each building: its fitted row, else its type's row, else row 0"""
+        if types is None:
+            types = [infer_building_type(name) for name in buildings]
+        return np.array([self.building_rows.get(name, self.type_rows.get(building_type, 0))
+                         for name, building_type in zip(buildings, types)], dtype=np.intp)
+
+    def lookup(self, timestamps: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Table factors for datetime64 timestamps.
+
+        Returns an array of shape (n, buildings, metrics); when every building
+        uses the same profile the building axis has length 1 and broadcasts.
+        """
+        days = timestamps.astype('datetime64[D]')
+        weekdays = (days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        minutes = (timestamps - days).astype('timedelta64[m]').astype(np.int64)
+        slots = minutes // self.resolution_minutes
+        months = timestamps.astype('datetime64[M]').astype(np.int64) % 12
+
+        unique_rows = np.unique(rows)
+        if len(unique_rows) == 1:
+            return self.factors[unique_rows[0]][:, weekdays, slots, months].T[:, None, :]
+        # Only gather the profiles in use, not every fitted building's table
+        factors = self.factors[unique_rows][:, :, weekdays, slots, months]  # (used profiles, metrics, n)
+        return factors[np.searchsorted(unique_rows, rows)].transpose(2, 0, 1)
+
+    def factor(self, row: int, metric: str, when: datetime) -> float:
+        """Table factor of one profile row and metric at `when`"""
+        slot = (when.hour * 60 + when.minute) // self.resolution_minutes
+        return float(self.factors[row, METRICS.index(metric), when.weekday(), slot, when.month - 1])
+
+
+def main():
+    """Fit usage profiles from a recorded snapshot log"""
+    parser = argparse.ArgumentParser(description='Fit EcoVerse usage profiles from recorded snapshots')
+    parser.add_argument('log', help='Snapshot log written by SnapshotRecorder')
+    parser.add_argument('output', help='Output .npz file (set USAGE_PROFILE_PATH to use it)')
+    parser.add_argument('--resolution-minutes', type=int, default=60, help='Table resolution within a day')
+    parser.add_argument('--max-table-mb', type=int, default=MAX_TABLE_BYTES // 1024 ** 2,
+                        help='Upper limit of the fitted tables')
+    args = parser.parse_args()
+
+    profiles = UsageProfiles.from_snapshot_log(args.log, BuildingRegistry.default(), args.resolution_minutes,
+                                               args.max_table_mb * 1024 ** 2)
+    profiles.save(args.output)
+    print(f"✅ Fitted profiles for {len(profiles.building_rows)} buildings "
+          f"at {profiles.resolution_minutes}-minute resolution -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()